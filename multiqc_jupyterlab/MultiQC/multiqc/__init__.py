@@ -5,7 +5,8 @@
 Initialises when multiqc module is loaded.
 
 Makes the following available under the main multiqc namespace:
-- load(), show(), get_samples()
+- load(), show(), show_assets(), get_samples(), find_samples(), get_sources(),
+  show_general_stats(), get_general_stats_columns()
 - config
 - config.logger
 - __version__
@@ -13,7 +14,19 @@ Makes the following available under the main multiqc namespace:
 
 import logging
 from .utils import config
-from .multiqc import add, init, load, show, get_samples, get_modules
+from .multiqc import (
+    add,
+    init,
+    load,
+    show,
+    show_assets,
+    get_samples,
+    get_modules,
+    find_samples,
+    get_sources,
+    show_general_stats,
+    get_general_stats_columns,
+)
 
 config.logger = logging.getLogger(__name__)
 
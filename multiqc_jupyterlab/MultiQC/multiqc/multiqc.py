@@ -2,11 +2,10 @@
 # -*- coding: utf-8 -*-
 
 import base64
-from copy import deepcopy
-from distutils.dir_util import copy_tree
+import concurrent.futures
 import io
 import jinja2
-import json
+import multiprocessing
 import os
 import re
 import rich
@@ -15,8 +14,8 @@ import sys
 import tempfile
 from collections import defaultdict
 
-from .plots import table
-from .utils import report, plugin_hooks, config, log
+from .plots import mpl_render, table
+from .utils import report, plugin_hooks, config, log, jupyterlab_catalog, jupyterlab_data
 
 try:
     # Python 3 imports
@@ -32,6 +31,11 @@ except ImportError:
 # console initialization
 console = rich.console.Console(stderr=True, highlight=False, force_terminal=log.force_term_colors())
 
+logger = config.logger
+
+# compiled report template and contents of included files, shared by show() calls
+template_cache = {'template': None, 'base_fn': None, 'env': None, 'files': dict(), 'assets_shown': False}
+
 
 def init():
     """
@@ -47,7 +51,7 @@ def init():
     config.data_sources_dir = os.path.join(config.jupyterlab_dir, 'data_sources')
 
 
-def load(analysis_dir, file_list, overwrite):
+def load(analysis_dir, file_list, overwrite, workers=None, incremental=False):
     """
     Loads data from the given directory. Iterates through files and creates data for each module for further usage.
 
@@ -55,6 +59,8 @@ def load(analysis_dir, file_list, overwrite):
     analysis_dir: Directory with data to load
     file_list: True if more than one analysis_dir is given
     overwrite: True if user wants to overwrite al of the previous data
+    workers: number of processes running modules at the same time, modules are run one by one if None or 1
+    incremental: True if only files that are new or modified since the previous load should be parsed
 
     Returns:
     True or an appropriate comment if something went wrong
@@ -109,99 +115,177 @@ def load(analysis_dir, file_list, overwrite):
     run_module_names = [list(m.keys())[0] for m in run_modules]
     report.get_filelist(run_module_names)
 
+    # skip files that didn't change since they were loaded before, files only touched get their new mtime
+    loaded = dict()
+    if incremental:
+        manifest = dict() if overwrite else jupyterlab_data.read_manifest(config.jupyterlab_dir)
+        report.files = jupyterlab_data.changed_files(report.files, manifest, loaded)
+
     # get only modules that are not empty for this data
     non_empty_modules = {key.split('/')[0].lower() for key, files in report.files.items() if len(files) > 0}
     run_modules = [m for m in run_modules if list(m.keys())[0].lower() in non_empty_modules]
     report.modules_output = list()
 
-    # run the modules for the loaded data
-    for mod_idx, mod_dict in enumerate(run_modules):
-        this_module = list(mod_dict.keys())[0]
+    # run the modules for the loaded data, either one after another or in a pool of worker processes
+    parallel = workers is not None and workers > 1 and len(run_modules) > 1
+    if parallel and 'fork' in multiprocessing.get_all_start_methods():
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(run_modules)),
+                                                          mp_context=multiprocessing.get_context('fork'))
+        modules_results = executor.map(run_module, run_modules)
+    else:
+        if parallel:
+            logger.warning('Parallel module execution is not supported on this platform, running serially.')
+        executor = None
+        modules_results = map(run_module, run_modules)
+
+    # merge results back in the order of run_modules, so the output doesn't depend on the number of workers
+    data_sources = defaultdict(lambda: defaultdict(lambda: defaultdict()))
+    general_stats_data = list()
+    general_stats_headers = list()
+    try:
+        for result in modules_results:
+            for mod, sections in result['data_sources'].items():
+                for section, sources in sections.items():
+                    data_sources[mod][section].update(sources)
+            general_stats_data.extend(result['general_stats_data'])
+            general_stats_headers.extend(result['general_stats_headers'])
+            report.modules_output.extend(result['module_outputs'])
+            save_module_output(result, overwrite, incremental)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        mpl_render.shutdown()
+
+    report.data_sources = data_sources
+    report.general_stats_data = general_stats_data
+    report.general_stats_headers = general_stats_headers
+
+    # remember loaded files, so the next incremental load can skip them, keeping files loaded by other kernels,
+    # their contents are hashed only by incremental loads
+    jupyterlab_data.update_manifest(loaded, report.files, report.data_sources, incremental)
+    with jupyterlab_data.locked(config.jupyterlab_dir):
+        manifest = dict() if overwrite else jupyterlab_data.read_manifest(config.jupyterlab_dir)
+        manifest.update(loaded)
+        jupyterlab_data.write_manifest(config.jupyterlab_dir, manifest)
+
+    if not run_modules:
+        logger.info('No new or modified files found.')
+        shutil.rmtree(tmp_dir)
+        return True
+
+    # write data sources to file
+    with jupyterlab_data.locked(config.jupyterlab_dir):
+        jupyterlab_data.write_data_source(config.data_sources_dir, report.data_sources, overwrite)
+        jupyterlab_catalog.update_catalog(config.jupyterlab_dir)
+        jupyterlab_catalog.add_general_stats(config.jupyterlab_dir, report.general_stats_data,
+                                             report.general_stats_headers, overwrite)
+
+    shutil.rmtree(tmp_dir)
+    return True
+
 
+def run_module(mod_dict):
+    """
+    Runs a single module on the files found by report.get_filelist() and collects everything it added to the report.
+    Called directly or in a worker process, so the returned dictionary has to be picklable.
+
+    Parameters:
+    mod_dict: single entry of config.module_order, {module_name: module_custom_config}
+
+    Returns:
+    dictionary with the module name, module outputs, plot data, data sources and general statistics
+
+    """
+    this_module = list(mod_dict.keys())[0]
+    mod_cust_config = list(mod_dict.values())[0]
+    if mod_cust_config is None:
+        mod_cust_config = {}
+
+    # clear data that is collected per module
+    report.plot_data = dict()
+    report.data_sources = defaultdict(lambda: defaultdict(lambda: defaultdict()))
+    report.general_stats_data = list()
+    report.general_stats_headers = list()
+
+    mod = config.avail_modules[this_module].load()
+    mod.mod_cust_config = mod_cust_config
+    output = mod()
+    if type(output) != list:
+        output = [output]
+
+    module_outputs = list()
+    for m in output:
+        module_output = dict()
+        # copy below attributes, tables are kept as data in report.plot_data and built again by combine_output,
+        # figures of flat plots rendered in worker processes are put in place of their placeholders
+        module_output['sections'] = [
+            dict(section,
+                 plot=jupyterlab_data.strip_tables(mpl_render.insert_figures(section.get('plot'))),
+                 content=jupyterlab_data.strip_tables(mpl_render.insert_figures(section.get('content'))))
+            for section in m.sections]
+        module_output['anchor'] = m.anchor
+        module_output['name'] = m.name
+        module_output['intro'] = mpl_render.insert_figures(m.intro)
+        if hasattr(m, 'js'):
+            module_output['js'] = m.js
+        if hasattr(m, 'css'):
+            module_output['css'] = m.css
+        if hasattr(m, 'content'):
+            module_output['content'] = m.css
+        module_outputs.append(module_output)
+
+    # worker processes of load() don't keep their own pool rendering figures, exported figures are saved here
+    if multiprocessing.current_process().name != 'MainProcess':
+        mpl_render.shutdown()
+
+    # general statistics headers can hold lambda functions, which can't be sent between processes
+    general_stats_data = list()
+    general_stats_headers = list()
+    for data, headers in zip(report.general_stats_data, report.general_stats_headers):
+        data, headers = jupyterlab_data.apply_modify(data, headers)
+        general_stats_data.append(data)
+        general_stats_headers.append(headers)
+
+    return {
+        'name': this_module,
+        'module_outputs': module_outputs,
+        'plot_data': report.plot_data,
+        'data_sources': {mod: {section: dict(sources) for section, sources in sections.items()}
+                         for mod, sections in report.data_sources.items()},
+        'general_stats_data': general_stats_data,
+        'general_stats_headers': general_stats_headers,
+    }
+
+
+def save_module_output(result, overwrite, replace_samples=False):
+    """
+    Saves module outputs and plot data returned by run_module() in the module directory in jupyterlab_data.
+
+    Parameters:
+    result: dictionary returned by run_module()
+    overwrite: True if user wants to overwrite al of the previous data
+    replace_samples: True if samples in result replace the same samples saved before
+
+    """
+    with jupyterlab_data.locked(config.jupyterlab_dir):
         # create a directory for the running module if doesn't exist yet
-        this_module_dir = os.path.join(config.jupyterlab_dir, this_module.lower())
+        this_module_dir = os.path.join(config.jupyterlab_dir, result['name'].lower())
         if not os.path.exists(this_module_dir):
             os.makedirs(this_module_dir)
 
-        mod_cust_config = list(mod_dict.values())[0]
-        if mod_cust_config is None:
-            mod_cust_config = {}
-
-        report.plot_data = dict()  # clear data dictionary
-
-        mod = config.avail_modules[this_module].load()
-        mod.mod_cust_config = mod_cust_config
-        output = mod()
-        if type(output) != list:
-            output = [output]
-
-        # check if file with data for plots exists or if overwrite is True
-        if not os.path.exists(os.path.join(this_module_dir, 'module_output' + '.json')) \
-                or overwrite:
-            # if above condition is true, create directory for every module and plot's create data
-            for i, m in enumerate(output):
-                module_output = dict()
-                # copy below attributes
-                module_output['sections'] = m.sections
-                module_output['anchor'] = m.anchor
-                module_output['name'] = m.name
-                module_output['intro'] = m.intro
-                if hasattr(m, 'js'):
-                    module_output['js'] = m.js
-                if hasattr(m, 'css'):
-                    module_output['css'] = m.css
-                if hasattr(m, 'content'):
-                    module_output['content'] = m.css
-                report.modules_output.append(m)
-                with open(os.path.join(this_module_dir, 'module_output' + '.json'), 'a') as module_output_file:
-                    json.dump(module_output, module_output_file)  # write plot's create data to a single file
-                    # if not last output
-                    if i != len(output) - 1:
-                        module_output_file.write(',\n')
+        # save module outputs with anchors that are not saved yet, or all of them if overwrite is True
+        jupyterlab_data.write_module_outputs(this_module_dir, result['module_outputs'], overwrite)
 
         # save data from analysis_dir for this module
         plot_data_dir = os.path.join(this_module_dir, 'plot_data')
-        base = os.path.basename('data')
-        plot_data = os.path.join(plot_data_dir, base)
-
         if overwrite and os.path.exists(plot_data_dir):
-            os.remove(plot_data_dir)
-        else:
-            plot_data_num = 1
-            # iterate through numbers until we get a filename that is free
-            while os.path.exists(plot_data + '.json'):
-                plot_data = os.path.join(plot_data_dir, '{}_{}'.format(base, plot_data_num))
-                plot_data_num += 1
-            plot_data_name = os.path.basename(plot_data)
-
-        if not os.path.exists(plot_data_dir):
-            os.makedirs(plot_data_dir)
+            shutil.rmtree(plot_data_dir)
+        index_path = os.path.join(this_module_dir, jupyterlab_data.INDEX_FN)
+        if overwrite and os.path.exists(index_path):
+            os.remove(index_path)
 
         # write data to file
-        with open(os.path.join(plot_data_dir, plot_data_name + '.json'), 'a') as plot_data_file:
-            json.dump(report.plot_data, plot_data_file)
-
-    # write data sources to file
-    base = os.path.basename('data_source')
-    data_source = os.path.join(config.data_sources_dir, base)
-
-    if overwrite and os.path.exists(config.data_sources_dir):
-        os.remove(config.data_sources_dir)
-    else:
-        data_source_num = 1
-        # iterate through numbers until we get a filename that is free
-        while os.path.exists(data_source + '.json'):
-            data_source = os.path.join(config.data_sources_dir, '{}_{}'.format(base, data_source_num))
-            data_source_num += 1
-        data_source_name = os.path.basename(data_source)
-    if not os.path.exists(config.data_sources_dir):
-        os.makedirs(config.data_sources_dir)
-
-    with open(os.path.join(config.data_sources_dir, data_source_name + '.json'), 'a') as data_source_file:
-        json.dump(report.data_sources, data_source_file)
-
-    shutil.rmtree(tmp_dir)
-    return True
+        jupyterlab_data.write_plot_data(this_module_dir, result['plot_data'], replace_samples)
 
 
 def add(multiqc_data):
@@ -223,136 +307,161 @@ def add(multiqc_data):
         os.makedirs(config.jupyterlab_dir)
     report.modules_output = list()
 
-    # read whole content of the multiqc_data file if exists
+    # check if the multiqc_data file exists
     if not os.path.exists(os.path.join(multiqc_data, 'multiqc_data.json')):
         return ('No MultiQC data in this directory found.')
 
+    # read multiqc_data.json member by member, writing plot data of every module as soon as it's complete
+    multiqc_data_file = dict()
+    this_module_name = ''
+    this_module_dict = dict()
     with open(os.path.join(multiqc_data, 'multiqc_data.json'), 'r') as multiqc_data_f:
-        multiqc_data_file = json.load(multiqc_data_f)  # read multiqc data to multiqc_data_file
+        multiqc_data_stream = jupyterlab_data.JSONObjectStream(multiqc_data_f)
+        for key in multiqc_data_stream.keys():
+            if key != 'report_plot_data':
+                # other members, e.g. report_saved_raw_data of every module, are skipped without decoding
+                if key in ['report_data_sources', 'report_general_stats_data', 'report_general_stats_headers']:
+                    multiqc_data_file[key] = multiqc_data_stream.decode()
+                else:
+                    multiqc_data_stream.skip()
+                continue
 
-    # prepare helper variables for saving to file
-    previous_module_name = ''
-    this_module_dict = dict()
+            for module_plot_name in multiqc_data_stream.keys():
+                full_section_name = module_plot_name.replace('-', '_').split('_')  # extract section name
 
-    # iterate through the loaded data
-    for module_plot_name, module_plot_content in multiqc_data_file['report_plot_data'].items():
-        full_section_name = module_plot_name.replace('-', '_').split('_')  # extract section name
-
-        # extract module name (take care of exceptions like two-part names)
-        if full_section_name[0] == 'fastq':
-            module_name = full_section_name[0] + '_' + full_section_name[1]
-        else:
-            module_name = full_section_name[0]
-
-        # check if module is ready to write to file
-        if (previous_module_name != module_name and previous_module_name != '') or module_plot_name == \
-                list(multiqc_data_file['report_plot_data'].keys())[-1]:
-            # open this module dir
-            this_module_dir = os.path.join(config.jupyterlab_dir, previous_module_name.lower())
-
-            # create a directory if doesn't exist yet
-            if not os.path.exists(this_module_dir):
-                os.makedirs(this_module_dir)
-
-            # save data from this module
-            plot_data_dir = os.path.join(this_module_dir, 'plot_data')
-            base = os.path.basename('data')
-            plot_data = os.path.join(plot_data_dir, base)
-            plot_data_num = 1
-            # iterate through numbers until we get a filename that is free
-            while os.path.exists(plot_data + '.json'):
-                plot_data = os.path.join(plot_data_dir, '{}_{}'.format(base, plot_data_num))
-                plot_data_num += 1
-            plot_data_name = os.path.basename(plot_data)
-
-            if not os.path.exists(plot_data_dir):
-                os.makedirs(plot_data_dir)
-
-            # write data to file
-            with open(os.path.join(plot_data_dir, plot_data_name + '.json'), 'a') as plot_data_file:
-                json.dump(this_module_dict, plot_data_file)
-
-            # clear temporary dictionary for new module
-            this_module_dict = dict()
-
-        this_module_dict[module_plot_name] = module_plot_content
-        previous_module_name = module_name
+                # extract module name (take care of exceptions like two-part names)
+                if full_section_name[0] == 'fastq':
+                    module_name = full_section_name[0] + '_' + full_section_name[1]
+                else:
+                    module_name = full_section_name[0]
 
-    # write data sources to file
-    base = os.path.basename('data_source')
-    data_source = os.path.join(config.data_sources_dir, base)
+                # plots of the previous module are complete
+                if module_name != this_module_name and this_module_dict:
+                    add_module_plot_data(this_module_name, this_module_dict)
+                    this_module_dict = dict()
 
-    data_source_num = 1
-    # iterate through numbers until we get a filename that is free
-    while os.path.exists(data_source + '.json'):
-        data_source = os.path.join(config.data_sources_dir, '{}_{}'.format(base, data_source_num))
-        data_source_num += 1
-    data_source_name = os.path.basename(data_source)
-    if not os.path.exists(config.data_sources_dir):
-        os.makedirs(config.data_sources_dir)
+                this_module_dict[module_plot_name] = multiqc_data_stream.decode()
+                this_module_name = module_name
 
-    with open(os.path.join(config.data_sources_dir, data_source_name + '.json'), 'a') as data_source_file:
-        json.dump(multiqc_data_file['report_data_sources'], data_source_file)
+    # save plots of the last module
+    if this_module_dict:
+        add_module_plot_data(this_module_name, this_module_dict)
+
+    # write data sources to file
+    with jupyterlab_data.locked(config.jupyterlab_dir):
+        jupyterlab_data.write_data_source(config.data_sources_dir, multiqc_data_file.get('report_data_sources', {}))
+        jupyterlab_catalog.update_catalog(config.jupyterlab_dir)
+
+    # 'modify' functions were saved by MultiQC as their value for 1, they are applied as multipliers
+    # and columns without them are marked, so that the read count presets aren't applied again
+    general_stats_data = list()
+    general_stats_headers = list()
+    for data, headers in zip(multiqc_data_file.get('report_general_stats_data', []),
+                             multiqc_data_file.get('report_general_stats_headers', [])):
+        for k, header in headers.items():
+            modify = header.get('modify')
+            if isinstance(modify, (int, float)) and not isinstance(modify, bool):
+                header['modify'] = lambda x, multiplier=modify: x * multiplier
+            elif modify is None:
+                header['modify'] = False
+        data, headers = jupyterlab_data.apply_modify(data, headers)
+        general_stats_data.append(data)
+        general_stats_headers.append(headers)
+    jupyterlab_catalog.add_general_stats(config.jupyterlab_dir, general_stats_data, general_stats_headers)
 
     shutil.rmtree(tmp_dir)
     return True
 
 
-def get_samples(module):
+def add_module_plot_data(module_name, plot_data):
+    """
+    Writes plot data of a single module read by add() to the module directory.
+
+    Parameters:
+    module_name: module name extracted from the plot ids
+    plot_data: dictionary with plot ids as keys
+
+    """
+    this_module_dir = os.path.join(config.jupyterlab_dir, module_name.lower())
+
+    # create a directory if doesn't exist yet
+    if not os.path.exists(this_module_dir):
+        os.makedirs(this_module_dir)
+
+    # save data from this module
+    jupyterlab_data.write_plot_data(this_module_dir, plot_data)
+
+
+def get_samples(module, pattern=None):
     """
-    Finds a directory with data sources and iterate through them to get every sample for a given module.
+    Gets every sample for a given module from the catalog of data sources.
 
     Parameters:
     module
+    pattern: glob pattern (e.g. 'SRR92176*') or prefix of sample names, all samples if None
 
     Returns:
     list of samples without duplicates for a given module or False if something went wrong
 
     """
-    samples = []
-    module = module.lower()
-
-    for data_source in os.listdir(config.data_sources_dir):
-        with open(os.path.join(config.data_sources_dir, data_source), 'r') as file:
-            data_sources = json.load(file)
-        for m in data_sources:
-            if module == m.lower():  # find module
-                for s in data_sources[m]:
-                    for sample in data_sources[m][s]:  # list all of the samples for a given module
-                        samples.append(sample)
-                break  # if module found, leave the loop because there will be no other entry for the same module
+    samples = jupyterlab_catalog.get_samples(config.jupyterlab_dir, module, pattern)
     if samples:
-        return list(set(samples))  # use set to get rid of duplicates
+        return samples
     return False
 
 
 def get_modules():
     """
-    Finds a directory with data sources and iterate through them to get every module.
+    Gets every module from the catalog of data sources.
 
     Returns:
     list of available modules without duplicates
 
     """
-    modules = []
-
-    for data_source in os.listdir(config.data_sources_dir):
-        with open(os.path.join(config.data_sources_dir, data_source), 'r') as file:
-            data_sources = json.load(file)
-        for m in data_sources:
-            modules.append(m)
+    modules = jupyterlab_catalog.get_modules(config.jupyterlab_dir)
     if modules:
-        return list(set(modules))  # use set to get rid of duplicates
+        return modules
     return False
 
 
-def show(module, samples):
+def find_samples(pattern, module=None):
+    """
+    Searches samples by name in the catalog of data sources.
+
+    Parameters:
+    pattern: glob pattern (e.g. 'SRR92176*') or prefix of sample names
+    module: module to search in, all modules if None
+
+    Returns:
+    list of (module, sample) tuples without duplicates
+
+    """
+    return jupyterlab_catalog.find_samples(config.jupyterlab_dir, pattern, module)
+
+
+def get_sources(sample, module=None):
+    """
+    Finds the files a sample was loaded from.
+
+    Parameters:
+    sample
+    module: module to search in, all modules if None
+
+    Returns:
+    list of (module, section, source path) tuples
+
+    """
+    return jupyterlab_catalog.get_sources(config.jupyterlab_dir, sample, module)
+
+
+def show(module, samples, anchor=None):
     """
     Shows plots for a given module and list of samples.
 
     Parameters:
     module
     samples: list of samples
+    anchor: anchor of a single output of the module (e.g. of a custom content section), all outputs if None
 
     Returns:
     report_output or an appropriate comment if something went wrong
@@ -360,64 +469,136 @@ def show(module, samples):
     """
     if len(module) != 1:
         return ('Please specify only one module.')
-    tmp_dir = tempfile.mkdtemp()
-    # load template
-    template_mod = config.avail_templates[config.template].load()
-    combine_output(module[0], samples)
+    combine_output(module[0], samples, anchor)
+    report.general_stats_html = ''  # General Statistics are shown by show_general_stats()
 
-    # copy over css & js files if requested by the theme (only for e.g. FastQC)
-    try:
-        for to, path in report.modules_output['css'].items():
-            copy_to = os.path.join(tmp_dir, to)
-            os.makedirs(os.path.dirname(copy_to))
-            shutil.copyfile(path, copy_to)
-    except:
-        pass
-    try:
-        for to, path in report.modules_output['js'].items():
-            copy_to = os.path.join(tmp_dir, to)
-            os.makedirs(os.path.dirname(copy_to))
-            shutil.copyfile(path, copy_to)
-    except:
-        pass
+    return render_report()
 
-    try:
-        parent_template = config.avail_templates[template_mod.template_parent].load()
-        copy_tree(parent_template.template_dir, tmp_dir)
-    except AttributeError:
-        pass  # not a child theme
 
-    copy_tree(template_mod.template_dir, tmp_dir)  # copy template files to temporary directory
+def show_general_stats(samples=None, columns=None):
+    """
+    Shows General Statistics of every load for a given list of samples, reading only the given columns.
 
-    # function to include file contents in Jinja template
-    def include_file(name, fdir=tmp_dir, b64=False):
-        try:
-            if fdir is None:
-                fdir = ''
-            if b64:
-                with io.open(os.path.join(fdir, name), 'rb') as f:
-                    return base64.b64encode(f.read()).decode('utf-8')
-            else:
-                with io.open(os.path.join(fdir, name), 'r', encoding='utf-8') as f:
-                    return f.read()
-        except (OSError, IOError) as e:
-            logger.error('Could not include file "{}": {}'.format(name, e))
+    Parameters:
+    samples: list of samples, all samples if None
+    columns: list of column keys (e.g. 'percent_gc' or 'FastQC.percent_gc'), all columns if None
 
+    Returns:
+    report_output or an appropriate comment if something went wrong
+
+    """
+    data, headers = jupyterlab_catalog.get_general_stats(config.jupyterlab_dir, samples, columns)
+    if not data:
+        return ('No General Statistics for given samples and columns found.')
+
+    report.plot_data = dict()  # a beeswarm plot is made instead of the table for many samples
+    report.modules_output = []
+    report.general_stats_html = table.plot_html(data, headers, {'id': 'general_stats_table',
+                                                               'table_title': 'General Statistics'})
+    report.plot_compressed_json = report.compress_json(report.plot_data)
+    return render_report()
+
+
+def get_general_stats_columns():
+    """
+    Gets every column of the stored General Statistics.
+
+    Returns:
+    list of (namespace, column key, title) tuples
+
+    """
+    return jupyterlab_catalog.get_general_stats_columns(config.jupyterlab_dir)
+
+
+def render_report():
+    """
+    Renders the report template with report.modules_output, report.plot_data and report.general_stats_html.
+
+    Returns:
+    report_output
+
+    """
     # load the report template
     try:
-        env = jinja2.Environment(loader=jinja2.FileSystemLoader(tmp_dir))
-        env.globals['include_file'] = include_file
-        j_template = env.get_template(template_mod.base_fn)
+        j_template = get_template()
     except:
-        raise IOError('Could not load {} template file "{}"'.format(config.template, template_mod.base_fn))
+        raise IOError('Could not load {} template file "{}"'.format(config.template, template_cache['base_fn']))
+
+    # static assets are printed only once per kernel if they are shared between reports
+    include_assets = not config.jupyterlab_shared_assets or not template_cache['assets_shown']
 
     # use Jinja2 to render the template
-    report_output = j_template.render(report=report, config=config)
-    shutil.rmtree(tmp_dir)
+    report_output = j_template.render(report=report, config=config, include_assets=include_assets)
+    template_cache['assets_shown'] = template_cache['assets_shown'] or include_assets
     return report_output
 
 
-def combine_output(module, samples_to_show):
+def show_assets():
+    """
+    Shows static assets (fonts, styles and JavaScript libraries) used by all reports. With config.jupyterlab_shared_assets
+    set, only the first report in a kernel includes them, so this is needed when its output was cleared.
+
+    Returns:
+    HTML with the assets
+
+    """
+    get_template()
+    assets_output = template_cache['env'].get_template('assets.html').render(report=report, config=config)
+    template_cache['assets_shown'] = True
+    return assets_output
+
+
+def get_template():
+    """
+    Gets the compiled report template. Jinja2 environment and the files included in the template
+    (fonts, images, scripts and styles) are kept in template_cache, so repeated show() calls only render the data.
+    Templates are recompiled by Jinja2 and included files are read again when their modification time changes.
+
+    Returns:
+    Jinja2 template
+
+    """
+    if template_cache['env'] is None or template_cache['template'] != config.template:
+        template_mod = config.avail_templates[config.template].load()
+        template_dirs = [template_mod.template_dir]  # files in the child template override the parent ones
+        try:
+            parent_template = config.avail_templates[template_mod.template_parent].load()
+            template_dirs.append(parent_template.template_dir)
+        except AttributeError:
+            pass  # not a child theme
+
+        # function to include file contents in Jinja template
+        def include_file(name, fdir=template_dirs, b64=False):
+            if fdir is None:
+                fdir = ''
+            if not isinstance(fdir, list):
+                fdir = [fdir]
+            path = next((os.path.join(d, name) for d in fdir if os.path.exists(os.path.join(d, name))),
+                        os.path.join(fdir[0], name))
+            try:
+                mtime = os.path.getmtime(path)
+                cached = template_cache['files'].get((path, b64))
+                if cached is not None and cached[0] == mtime:
+                    return cached[1]
+                if b64:
+                    with io.open(path, 'rb') as f:
+                        content = base64.b64encode(f.read()).decode('utf-8')
+                else:
+                    with io.open(path, 'r', encoding='utf-8') as f:
+                        content = f.read()
+                template_cache['files'][(path, b64)] = (mtime, content)
+                return content
+            except (OSError, IOError) as e:
+                logger.error('Could not include file "{}": {}'.format(name, e))
+
+        env = jinja2.Environment(loader=jinja2.FileSystemLoader(template_dirs), auto_reload=True)
+        env.globals['include_file'] = include_file
+        template_cache.update(template=config.template, base_fn=template_mod.base_fn, env=env, files=dict())
+
+    return template_cache['env'].get_template(template_cache['base_fn'])
+
+
+def combine_output(module, samples_to_show, anchor=None):
     """
     Searches data for given samples and combines data for a given module into one consistent report.
     Creates report.modules_output and report.plot_data instances for the report.
@@ -425,108 +606,118 @@ def combine_output(module, samples_to_show):
     Parameters:
     module
     samples_to_show: list of samples
+    anchor: anchor of a single output of the module, all outputs if None
 
     """
     module = module.lower()
     # find directory for a given module
     this_module_dir = os.path.join(config.jupyterlab_dir, module)
-    with open(os.path.join(this_module_dir, 'module_output.json'), 'r') as module_output_file:
-        report.modules_output = json.load(module_output_file)  # read module output to report.modules_output
-
-    plot_data_dir = os.path.join(this_module_dir, 'plot_data')
+    # read module outputs to report.modules_output, only HTML of the printed sections is read
+    report.modules_output = jupyterlab_data.read_module_outputs(this_module_dir, anchor)
 
+    samples_to_show = set(samples_to_show)
+    module_samples = None  # samples of the module from the catalog, read with the first heatmap
     result = dict()
-    for plot_data in os.listdir(plot_data_dir):  # for every data file in the module directory
-        with open(os.path.join(plot_data_dir, plot_data), 'r') as file:
-            plot_content = json.load(file)  # load content for this module
+    kept = dict()  # samples already copied to result, for every plot and dataset
+    # read only the plots needed for samples_to_show, using the module's index, every content is decoded
+    # from its data file, so it's copied to the result without deepcopy
+    for plot, content in jupyterlab_data.read_plots(this_module_dir, samples_to_show):
         # copy samples to the result dictionary
-        for plot, content in plot_content.items():
-            if content['plot_type'] in ['bar_graph', 'beeswarm']:  # bar graph and beeswarm share the same logic
-                if plot not in result:  # if plot is not in the result yet, add it and clean samples and datasets
-                    result[plot] = deepcopy(content)
-                    result[plot]['samples'] = [[] for _ in range(len(result[plot]['samples']))]
-                    for dataset in result[plot]['datasets']:
-                        for el in dataset:
-                            el['data'] = []
-
-                for i, samples in enumerate(content['samples']):
-                    # get sample indices for samples in samples_to_show, but check if they are not already in result
-                    samples_indices = [idx for idx, sample in enumerate(samples) if
-                                       sample.split(' ')[0] in samples_to_show and sample not in
-                                       result[plot]['samples'][i]]
-                    if samples_indices:
-                        # append new samples to result samples
-                        result[plot]['samples'][i].extend(map(samples.__getitem__, samples_indices))
-
-                    for element, result_element in zip(content['datasets'][i], result[plot]['datasets'][i]):
-                        if samples_indices:
-                            # append new data to result data for every dataset
-                            result_element['data'].extend(map(element['data'].__getitem__, samples_indices))
-
-            elif content['plot_type'] in ['scatter', 'xy_line']:  # scatter and linear plots share the same logic
-                if plot not in result:
-                    result[plot] = deepcopy(content)
-
-                    # TO NIE DZIAŁAŁO, BO KAŻDA LISTA BYŁA KOPIĄ KOLEJNEJ I W REZULTACIE TO W SUMIE BYŁA JEDNA LISTA
-                    # result[plot]['datasets'] = [[]] * len(result[plot]['datasets'])
-                    # cleanup datasets section in result
-                    result[plot]['datasets'] = [[] for _ in range(len(result[plot]['datasets']))]
-
-                for i, dataset in enumerate(content['datasets']):
-                    # for every dataset append element which contains sample name that matches one from the samples_to_show
-                    for el in dataset:
-                        if el['name'].split(' ')[0] in samples_to_show and el not in result[plot]['datasets'][i]:
-                            result[plot]['datasets'][i].append(el)
-
-            elif content['plot_type'] == 'heatmap':
-
-                # heatmap supported for fastqc
-                if 'fastqc' in plot:
-                    if plot not in result:
-                        result[plot] = deepcopy(content)
-                        result[plot]['ycats'] = []
-                        result[plot]['data'] = []
-                        last_row_index = 0
-
-                    samples_indices = [idx for idx, sample in enumerate(content['ycats']) if
-                                       sample in samples_to_show and sample not in
-                                       result[plot]['ycats']]
-                    if samples_indices:
-                        result[plot]['ycats'].extend(map(content['ycats'].__getitem__, samples_indices))
-                        data_to_add, last_row_index = fastqc_heatmap(samples_indices, content['data'], last_row_index,
-                                                                     len(content['xcats']))
-                        result[plot]['data'].extend(data_to_add)
+        if content['plot_type'] in ['bar_graph', 'beeswarm']:  # bar graph and beeswarm share the same logic
+            if plot not in result:  # if plot is not in the result yet, add it and clean samples and datasets
+                result[plot] = dict(content)
+                result[plot]['samples'] = [[] for _ in range(len(content['samples']))]
+                if content['plot_type'] == 'beeswarm':  # beeswarm datasets are lists of values for every category
+                    result[plot]['datasets'] = [[] for _ in range(len(content['datasets']))]
                 else:
-                    if plot not in result:
-                        result[plot] = deepcopy(content)
-
-            else:  # show all of the samples - options that are not supported yet
-                if plot not in result:
-                    result[plot] = deepcopy(content)
-
+                    result[plot]['datasets'] = [[dict(el, data=[]) for el in dataset]
+                                                for dataset in content['datasets']]
+                kept[plot] = [set() for _ in range(len(result[plot]['samples']))]
+
+            for i, samples in enumerate(content['samples']):
+                # get sample indices for samples in samples_to_show, but check if they are not already in result
+                samples_indices = [idx for idx, sample in enumerate(samples) if
+                                   sample.split(' ')[0] in samples_to_show and sample not in kept[plot][i]]
+                if not samples_indices:
+                    continue
+                kept[plot][i].update(map(samples.__getitem__, samples_indices))
+                # append new samples to result samples and the same positions of every data list
+                result[plot]['samples'][i].extend(map(samples.__getitem__, samples_indices))
+                if content['plot_type'] == 'beeswarm':
+                    result[plot]['datasets'][i].extend(map(content['datasets'][i].__getitem__, samples_indices))
+                else:
+                    for element, result_element in zip(content['datasets'][i], result[plot]['datasets'][i]):
+                        result_element['data'].extend(map(element['data'].__getitem__, samples_indices))
+
+        elif content['plot_type'] in ['scatter', 'xy_line']:  # scatter and linear plots share the same logic
+            if plot not in result:
+                result[plot] = dict(content)
+                # cleanup datasets section in result
+                result[plot]['datasets'] = [[] for _ in range(len(content['datasets']))]
+                kept[plot] = [set() for _ in range(len(result[plot]['datasets']))]
+
+            for i, dataset in enumerate(content['datasets']):
+                # for every dataset append elements with sample names from samples_to_show, unless added from
+                # a previous file
+                elements = [el for el in dataset if
+                            el['name'].split(' ')[0] in samples_to_show and el['name'] not in kept[plot][i]]
+                result[plot]['datasets'][i].extend(elements)
+                kept[plot][i].update(el['name'] for el in elements)
+
+        elif content['plot_type'] == 'heatmap':
+            if plot not in result:
+                result[plot] = dict(content)
+                # rows and columns of samples are selected, other heatmaps are shown whole
+                if module_samples is None:
+                    module_samples = set(jupyterlab_catalog.get_samples(config.jupyterlab_dir, module))
+                keep = dict()
+                for axis in ['xcats', 'ycats']:
+                    samples_axis = any(str(category) in module_samples for category in content[axis])
+                    keep[axis] = samples_to_show.__contains__ if samples_axis else None
+                if keep['xcats'] is not None or keep['ycats'] is not None:
+                    result[plot].update(xcats=[], ycats=[], data=[])
+                    kept[plot] = {'keep': keep, 'xcats': dict(), 'ycats': dict(), 'cells': set()}
+
+            if plot in kept:
+                # map rows and columns to the result, cells of samples already in result are not added again
+                columns, rows = [jupyterlab_data.heatmap_positions(content[axis], kept[plot]['keep'][axis],
+                                                                   result[plot][axis], kept[plot][axis])
+                                 for axis in ['xcats', 'ycats']]
+                cells = kept[plot]['cells']
+                for x, y, value in content['data']:
+                    if y in rows and x in columns and (columns[x], rows[y]) not in cells:
+                        cells.add((columns[x], rows[y]))
+                        result[plot]['data'].append([columns[x], rows[y], value])
+
+        elif content['plot_type'] == 'table':
+            if plot not in result:
+                result[plot] = dict(content)
+                result[plot]['datasets'] = [dict() for _ in range(len(content['datasets']))]
+
+            for i, dataset in enumerate(content['datasets']):
+                # copy rows of samples from samples_to_show and columns that are not in result yet
+                for s_name, samp in dataset.items():
+                    if s_name in samples_to_show and s_name not in result[plot]['datasets'][i]:
+                        result[plot]['datasets'][i][s_name] = samp
+                for k, header in content['headers'][i].items():
+                    result[plot]['headers'][i].setdefault(k, header)
+
+        else:  # show all of the samples - options that are not supported yet
+            if plot not in result:
+                result[plot] = content
+
+    # read numeric series of the line graphs kept in result
+    jupyterlab_data.load_series(this_module_dir, result)
+
+    # build tables again only with the rows of samples_to_show, a beeswarm plot can add its data to report.plot_data
+    tables_data = {plot: result.pop(plot) for plot in list(result) if result[plot]['plot_type'] == 'table'}
     report.plot_data = result
-    report.plot_compressed_json = report.compress_json(report.plot_data)  # compress json file for Jinja2
-
+    tables = {plot: table.plot_html(content['datasets'], content['headers'], content['pconfig'])
+              for plot, content in tables_data.items()}
+    for module_output in report.modules_output:
+        for section in module_output['sections']:
+            section['plot'] = jupyterlab_data.insert_tables(section.get('plot'), tables)
+            section['content'] = jupyterlab_data.insert_tables(section.get('content'), tables)
 
-def fastqc_heatmap(samples_indices, data, last_row_index, num_xcats):
-    """
-    Supports heatmap for FastQC module.
-
-    Parameters:
-    samples_indices
-    data: list of cells with data for a heatmap
-    num_xcats: number of categories on X axis (11 for FastQC by default)
-
-    Returns:
-    result for the given samples indices
-
-    """
-    result = []
-    for i, sample_index in enumerate(samples_indices):
-        # extract indices for a given sample, find data for these indices and create cells with new positions
-        sample_data_indices = list(range(sample_index * num_xcats, sample_index * num_xcats + num_xcats))
-        cells = [[j, i + last_row_index, data[sample_index][2]] for j, sample_index in enumerate(sample_data_indices)]
-        result.extend(cells)
-    last_row_index += i + 1
+    report.plot_compressed_json = report.compress_json(report.plot_data)  # compress json file for Jinja2
 
-    return result, last_row_index
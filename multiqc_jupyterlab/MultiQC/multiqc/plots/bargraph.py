@@ -3,17 +3,17 @@
 """ MultiQC functions to plot a bargraph """
 
 from __future__ import print_function
-import base64
 from collections import OrderedDict
 import inspect
-import io
 import logging
 import math
-import os
 import random
 import re
 import sys
 
+import numpy as np
+
+from multiqc.plots import mpl_render
 from multiqc.utils import config, report, util_functions
 
 logger = logging.getLogger(__name__)
@@ -144,35 +144,11 @@ def plot(data, cats=None, pconfig=None):
             hc_samples = list(d.keys())
         else:
             hc_samples = sorted(list(d.keys()))
-        hc_data = list()
-        sample_dcount = dict()
-        for c in cats[idx].keys():
-            thisdata = list()
-            catcount = 0
-            for s in hc_samples:
-                if s not in sample_dcount:
-                    sample_dcount[s] = 0
-                try:
-                    thisdata.append(float(d[s][c]))
-                    catcount += 1
-                    sample_dcount[s] += 1
-                except (KeyError, ValueError):
-                    # Pad with NaNs when we have missing categories in a sample
-                    thisdata.append(float("nan"))
-            if catcount > 0:
-                if pconfig.get("hide_zero_cats", True) is False or max(x for x in thisdata if not math.isnan(x)) > 0:
-                    thisdict = {"name": cats[idx][c]["name"], "data": thisdata}
-                    if "color" in cats[idx][c]:
-                        thisdict["color"] = cats[idx][c]["color"]
-                    hc_data.append(thisdict)
-
-        # Remove empty samples
-        for s, c in sample_dcount.items():
-            if c == 0:
-                idx = hc_samples.index(s)
-                del hc_samples[idx]
-                for j, d in enumerate(hc_data):
-                    del hc_data[j]["data"][idx]
+        # Numeric data is put in a matrix, other data is converted value by value
+        series = numeric_category_series(d, hc_samples, cats[idx], pconfig)
+        if series is None:
+            series = category_series(d, hc_samples, cats[idx], pconfig)
+        hc_samples, hc_data = series
         if len(hc_data) > 0:
             plotsamples.append(hc_samples)
             plotdata.append(hc_data)
@@ -203,6 +179,96 @@ def plot(data, cats=None, pconfig=None):
             return highcharts_bargraph(plotdata, plotsamples, pconfig)
 
 
+def category_series(d, samples, cats, pconfig):
+    """
+    Build the series of a bar graph dataset value by value, one for every category with data,
+    and remove samples without data.
+    :param d: 2D dict of the dataset, first keys as sample names, then category:value pairs
+    :param samples: sample names, in the order of the plot
+    :param cats: OrderedDict with categories and their config
+    :param pconfig: plot config
+    :return: list of samples with data and list of series
+    """
+    hc_samples = list(samples)
+    hc_data = list()
+    sample_dcount = dict()
+    for c in cats.keys():
+        thisdata = list()
+        catcount = 0
+        for s in hc_samples:
+            if s not in sample_dcount:
+                sample_dcount[s] = 0
+            try:
+                thisdata.append(float(d[s][c]))
+                catcount += 1
+                sample_dcount[s] += 1
+            except (KeyError, ValueError):
+                # Pad with NaNs when we have missing categories in a sample
+                thisdata.append(float("nan"))
+        if catcount > 0:
+            if pconfig.get("hide_zero_cats", True) is False or max(x for x in thisdata if not math.isnan(x)) > 0:
+                thisdict = {"name": cats[c]["name"], "data": thisdata}
+                if "color" in cats[c]:
+                    thisdict["color"] = cats[c]["color"]
+                hc_data.append(thisdict)
+
+    # Remove empty samples
+    if 0 in sample_dcount.values():
+        with_data = [sample_dcount[s] > 0 for s in hc_samples]
+        hc_samples = [s for s, has_data in zip(hc_samples, with_data) if has_data]
+        for series in hc_data:
+            series["data"] = [x for x, has_data in zip(series["data"], with_data) if has_data]
+
+    return hc_samples, hc_data
+
+
+def numeric_category_series(d, samples, cats, pconfig):
+    """
+    Build the series of a bar graph dataset from a category x sample matrix, giving the same series
+    as category_series(). Categories to show and samples with data are selected with masks.
+    :param d: 2D dict of the dataset, first keys as sample names, then category:value pairs
+    :param samples: sample names, in the order of the plot
+    :param cats: OrderedDict with categories and their config
+    :param pconfig: plot config
+    :return: list of samples with data and list of series,
+        or None if some values are not numbers (e.g. strings or None), to use category_series() instead
+    """
+    nan = float("nan")
+    try:
+        rows = [d[s] for s in samples]
+        values = np.array([[row.get(c, nan) for row in rows] for c in cats])
+    except (AttributeError, TypeError):
+        return None
+    if values.dtype.kind not in "biuf":
+        return None
+    shape = (len(cats), len(rows))
+    values = values.reshape(shape).astype(float)
+
+    # Missing values are NaN in the matrix. If there are fewer other values than keys in the samples,
+    # samples have keys which are not categories or NaN values, so values given are found by the keys.
+    present = ~np.isnan(values)
+    if present.sum() != sum(map(len, rows)):
+        present = np.array([[c in row for row in rows] for c in cats], dtype=bool).reshape(shape)
+        # NaN values count as data in category_series(), which fails for categories with only NaN values
+        if np.isnan(values[present]).any():
+            return None
+
+    show_cats = present.any(axis=1)
+    if pconfig.get("hide_zero_cats", True) is not False:
+        show_cats &= np.where(present, values, -np.inf).max(axis=1, initial=-np.inf) > 0
+    with_data = present.any(axis=0)
+
+    hc_samples = [s for s, has_data in zip(samples, with_data) if has_data]
+    hc_data = list()
+    shown_cats = [c for c, show in zip(cats, show_cats) if show]
+    for c, cat_values in zip(shown_cats, values[show_cats][:, with_data]):
+        thisdict = {"name": cats[c]["name"], "data": cat_values.tolist()}
+        if "color" in cats[c]:
+            thisdict["color"] = cats[c]["color"]
+        hc_data.append(thisdict)
+    return hc_samples, hc_data
+
+
 def highcharts_bargraph(plotdata, plotsamples=None, pconfig=None):
     """
     Build the HTML needed for a HighCharts bar graph. Should be
@@ -333,20 +399,6 @@ def matplotlib_bargraph(plotdata, plotsamples, pconfig=None):
     )
     html += '<div class="mqc_mplplot_plotgroup" id="{}">'.format(pconfig["id"])
 
-    # Same defaults as HighCharts for consistency
-    default_colors = [
-        "#7cb5ec",
-        "#434348",
-        "#90ed7d",
-        "#f7a35c",
-        "#8085e9",
-        "#f15c80",
-        "#e4d354",
-        "#2b908f",
-        "#f45b5b",
-        "#91e8e1",
-    ]
-
     # Counts / Percentages Switch
     if pconfig.get("cpswitch") is not False and not config.simple_output:
         if pconfig.get("cpswitch_c_active", True) is True:
@@ -418,155 +470,160 @@ def matplotlib_bargraph(plotdata, plotsamples, pconfig=None):
                 if pconfig.get("cpswitch_c_active", True) is not True:
                     hide_plot = True
 
-            # Set up figure
-
-            # Height has a default, then adjusted by the number of samples
-            plt_height = len(plotsamples[pidx]) / 2.3  # Default in inches, empirically determined
-            plt_height = max(6, plt_height)  # At least 6" tall
-            plt_height = min(30, plt_height)  # Cap at 30" tall
-
-            # Use fixed height if pconfig['height'] is set (convert pixels -> inches)
-            if "height" in pconfig:
-                # Default interactive height in pixels = 512
-                # Not perfect replication, but good enough
-                plt_height = 6 * (pconfig["height"] / 512)
-
-            bar_width = 0.8
-
-            fig = plt.figure(figsize=(14, plt_height), frameon=False)
-            axes = fig.add_subplot(111)
-            y_ind = range(len(plotsamples[pidx]))
-
-            # Count totals for each sample
-            if plot_pct is True:
-                s_totals = [0 for _ in pdata[0]["data"]]
-                for series_idx, d in enumerate(pdata):
-                    for sample_idx, v in enumerate(d["data"]):
-                        s_totals[sample_idx] += v
-
-            # Plot bars
-            dlabels = []
-            prev_values = None
-            for idx, d in enumerate(pdata):
-                # Plot percentages
-                values = [x for x in d["data"]]
-                if len(values) < len(y_ind):
-                    values.extend([0] * (len(y_ind) - len(values)))
-                if plot_pct is True:
-                    for (key, var) in enumerate(values):
-                        s_total = s_totals[key]
-                        if s_total == 0:
-                            values[key] = 0
-                        else:
-                            values[key] = (float(var + 0.0) / float(s_total)) * 100
-
-                # Get offset for stacked bars
-                if idx == 0:
-                    prevdata = [0] * len(plotsamples[pidx])
-                else:
-                    for i, p in enumerate(prevdata):
-                        prevdata[i] += prev_values[i]
-                # Default colour index
-                cidx = idx
-                while cidx >= len(default_colors):
-                    cidx -= len(default_colors)
-                # Save the name of this series
-                dlabels.append(d["name"])
-                # Add the series of bars to the plot
-                axes.barh(
-                    y_ind,
-                    values,
-                    bar_width,
-                    left=prevdata,
-                    color=d.get("color", default_colors[cidx]),
-                    align="center",
-                    linewidth=pconfig.get("borderWidth", 0),
-                )
-                prev_values = values
-
-            # Tidy up axes
-            axes.tick_params(
-                labelsize=pconfig.get("labelSize", 8), direction="out", left=False, right=False, top=False, bottom=False
-            )
-            axes.set_xlabel(pconfig.get("ylab", ""))  # I know, I should fix the fact that the config is switched
-            axes.set_ylabel(pconfig.get("xlab", ""))
-            axes.set_yticks(y_ind)  # Specify where to put the labels
-            axes.set_yticklabels(plotsamples[pidx])  # Set y axis sample name labels
-            axes.set_ylim((-0.5, len(y_ind) - 0.5))  # Reduce padding around plot area
-            if plot_pct is True:
-                axes.set_xlim((0, 100))
-                # Add percent symbols
-                vals = axes.get_xticks()
-                axes.set_xticks(axes.get_xticks())
-                axes.set_xticklabels(["{:.0f}%".format(x) for x in vals])
-            else:
-                default_xlimits = axes.get_xlim()
-                axes.set_xlim((pconfig.get("ymin", default_xlimits[0]), pconfig.get("ymax", default_xlimits[1])))
-            if "title" in pconfig:
-                top_gap = 1 + (0.5 / plt_height)
-                plt.text(
-                    0.5, top_gap, pconfig["title"], horizontalalignment="center", fontsize=16, transform=axes.transAxes
-                )
-            axes.grid(True, zorder=0, which="both", axis="x", linestyle="-", color="#dedede", linewidth=1)
-            axes.set_axisbelow(True)
-            axes.spines["right"].set_visible(False)
-            axes.spines["top"].set_visible(False)
-            axes.spines["bottom"].set_visible(False)
-            axes.spines["left"].set_visible(False)
-            plt.gca().invert_yaxis()  # y axis is reverse sorted otherwise
-
-            # Hide some labels if we have a lot of samples
-            show_nth = max(1, math.ceil(len(pdata[0]["data"]) / 150))
-            for idx, label in enumerate(axes.get_yticklabels()):
-                if idx % show_nth != 0:
-                    label.set_visible(False)
-
-            # Legend
-            bottom_gap = -1 * (1 - ((plt_height - 1.5) / plt_height))
-            lgd = axes.legend(
-                dlabels,
-                loc="lower center",
-                bbox_to_anchor=(0, bottom_gap, 1, 0.102),
-                ncol=5,
-                mode="expand",
-                fontsize=pconfig.get("labelSize", 8),
-                frameon=False,
-            )
-
             # Should this plot be hidden on report load?
             hidediv = ""
             if pidx > 0 or hide_plot:
                 hidediv = ' style="display:none;"'
 
-            # Save the plot to the data directory if export is requested
-            if config.export_plots:
-                for fformat in config.export_plot_formats:
-                    # Make the directory if it doesn't already exist
-                    plot_dir = os.path.join(config.plots_dir, fformat)
-                    if not os.path.exists(plot_dir):
-                        os.makedirs(plot_dir)
-                    # Save the plot
-                    plot_fn = os.path.join(plot_dir, "{}.{}".format(pid, fformat))
-                    fig.savefig(plot_fn, format=fformat, bbox_extra_artists=(lgd,), bbox_inches="tight")
-
-            # Output the figure to a base64 encoded string
-            if getattr(get_template_mod(), "base64_plots", True) is True:
-                img_buffer = io.BytesIO()
-                fig.savefig(img_buffer, format="png", bbox_inches="tight")
-                b64_img = base64.b64encode(img_buffer.getvalue()).decode("utf8")
-                img_buffer.close()
-                html += '<div class="mqc_mplplot" id="{}"{}><img src="data:image/png;base64,{}" /></div>'.format(
-                    pid, hidediv, b64_img
-                )
-
-            # Link to the saved image
-            else:
-                plot_relpath = os.path.join(config.plots_dir_name, "png", "{}.png".format(pid))
-                html += '<div class="mqc_mplplot" id="{}"{}><img src="{}" /></div>'.format(pid, hidediv, plot_relpath)
-
-            plt.close(fig)
+            # Draw the figure, export it and embed or link it, here or in a worker process
+            spec = mpl_render.figure_spec(
+                "bar_graph",
+                pid,
+                (pdata, plotsamples[pidx], plot_pct, pconfig),
+                getattr(get_template_mod(), "base64_plots", True) is True,
+            )
+            html += mpl_render.add_figure(spec, hidediv)
 
     # Close wrapping div
     html += "</div>"
 
     return html
+
+
+def draw_bargraph(pdata, samples, plot_pct, pconfig):
+    """
+    Draw a single dataset of a flat bar graph. Called by mpl_render, possibly in a worker process.
+    :param pdata: list of series of the dataset
+    :param samples: sample names of the dataset
+    :param plot_pct: True to plot percentages instead of counts
+    :param pconfig: plot config
+    :return: MatPlotLib figure and the extra artists to fit in exported files (the legend)
+    """
+    # Same defaults as HighCharts for consistency
+    default_colors = [
+        "#7cb5ec",
+        "#434348",
+        "#90ed7d",
+        "#f7a35c",
+        "#8085e9",
+        "#f15c80",
+        "#e4d354",
+        "#2b908f",
+        "#f45b5b",
+        "#91e8e1",
+    ]
+
+    # Set up figure
+
+    # Height has a default, then adjusted by the number of samples
+    plt_height = len(samples) / 2.3  # Default in inches, empirically determined
+    plt_height = max(6, plt_height)  # At least 6" tall
+    plt_height = min(30, plt_height)  # Cap at 30" tall
+
+    # Use fixed height if pconfig['height'] is set (convert pixels -> inches)
+    if "height" in pconfig:
+        # Default interactive height in pixels = 512
+        # Not perfect replication, but good enough
+        plt_height = 6 * (pconfig["height"] / 512)
+
+    bar_width = 0.8
+
+    fig = plt.figure(figsize=(14, plt_height), frameon=False)
+    axes = fig.add_subplot(111)
+    y_ind = range(len(samples))
+
+    # Count totals for each sample
+    if plot_pct is True:
+        s_totals = [0 for _ in pdata[0]["data"]]
+        for series_idx, d in enumerate(pdata):
+            for sample_idx, v in enumerate(d["data"]):
+                s_totals[sample_idx] += v
+
+    # Plot bars
+    dlabels = []
+    prev_values = None
+    for idx, d in enumerate(pdata):
+        # Plot percentages
+        values = [x for x in d["data"]]
+        if len(values) < len(y_ind):
+            values.extend([0] * (len(y_ind) - len(values)))
+        if plot_pct is True:
+            for key, var in enumerate(values):
+                s_total = s_totals[key]
+                if s_total == 0:
+                    values[key] = 0
+                else:
+                    values[key] = (float(var + 0.0) / float(s_total)) * 100
+
+        # Get offset for stacked bars
+        if idx == 0:
+            prevdata = [0] * len(samples)
+        else:
+            for i, p in enumerate(prevdata):
+                prevdata[i] += prev_values[i]
+        # Default colour index
+        cidx = idx
+        while cidx >= len(default_colors):
+            cidx -= len(default_colors)
+        # Save the name of this series
+        dlabels.append(d["name"])
+        # Add the series of bars to the plot
+        axes.barh(
+            y_ind,
+            values,
+            bar_width,
+            left=prevdata,
+            color=d.get("color", default_colors[cidx]),
+            align="center",
+            linewidth=pconfig.get("borderWidth", 0),
+        )
+        prev_values = values
+
+    # Tidy up axes
+    axes.tick_params(
+        labelsize=pconfig.get("labelSize", 8), direction="out", left=False, right=False, top=False, bottom=False
+    )
+    axes.set_xlabel(pconfig.get("ylab", ""))  # I know, I should fix the fact that the config is switched
+    axes.set_ylabel(pconfig.get("xlab", ""))
+    axes.set_yticks(y_ind)  # Specify where to put the labels
+    axes.set_yticklabels(samples)  # Set y axis sample name labels
+    axes.set_ylim((-0.5, len(y_ind) - 0.5))  # Reduce padding around plot area
+    if plot_pct is True:
+        axes.set_xlim((0, 100))
+        # Add percent symbols
+        vals = axes.get_xticks()
+        axes.set_xticks(axes.get_xticks())
+        axes.set_xticklabels(["{:.0f}%".format(x) for x in vals])
+    else:
+        default_xlimits = axes.get_xlim()
+        axes.set_xlim((pconfig.get("ymin", default_xlimits[0]), pconfig.get("ymax", default_xlimits[1])))
+    if "title" in pconfig:
+        top_gap = 1 + (0.5 / plt_height)
+        plt.text(0.5, top_gap, pconfig["title"], horizontalalignment="center", fontsize=16, transform=axes.transAxes)
+    axes.grid(True, zorder=0, which="both", axis="x", linestyle="-", color="#dedede", linewidth=1)
+    axes.set_axisbelow(True)
+    axes.spines["right"].set_visible(False)
+    axes.spines["top"].set_visible(False)
+    axes.spines["bottom"].set_visible(False)
+    axes.spines["left"].set_visible(False)
+    plt.gca().invert_yaxis()  # y axis is reverse sorted otherwise
+
+    # Hide some labels if we have a lot of samples
+    show_nth = max(1, math.ceil(len(pdata[0]["data"]) / 150))
+    for idx, label in enumerate(axes.get_yticklabels()):
+        if idx % show_nth != 0:
+            label.set_visible(False)
+
+    # Legend
+    bottom_gap = -1 * (1 - ((plt_height - 1.5) / plt_height))
+    lgd = axes.legend(
+        dlabels,
+        loc="lower center",
+        bbox_to_anchor=(0, bottom_gap, 1, 0.102),
+        ncol=5,
+        mode="expand",
+        fontsize=pconfig.get("labelSize", 8),
+        frameon=False,
+    )
+
+    return fig, (lgd,)
@@ -4,7 +4,7 @@
 
 from __future__ import print_function, division
 from collections import OrderedDict
-import base64
+import gc
 import inspect
 import io
 import logging
@@ -13,6 +13,9 @@ import random
 import re
 import sys
 
+import numpy as np
+
+from multiqc.plots import mpl_render
 from multiqc.utils import config, report, util_functions
 
 logger = logging.getLogger(__name__)
@@ -121,14 +124,14 @@ def plot(data, pconfig=None):
     for data_index, d in enumerate(data):
         thisplotdata = list()
 
-        for s in sorted(d.keys()):
+        # Ensure any overwritting conditionals from data_labels (e.g. ymax) are taken in consideration
+        series_config = pconfig.copy()
+        if (
+            "data_labels" in pconfig and type(pconfig["data_labels"][data_index]) is dict
+        ):  # if not a dict: only dataset name is provided
+            series_config.update(pconfig["data_labels"][data_index])
 
-            # Ensure any overwritting conditionals from data_labels (e.g. ymax) are taken in consideration
-            series_config = pconfig.copy()
-            if (
-                "data_labels" in pconfig and type(pconfig["data_labels"][data_index]) is dict
-            ):  # if not a dict: only dataset name is provided
-                series_config.update(pconfig["data_labels"][data_index])
+        for s in sorted(d.keys()):
 
             pairs = list()
             maxval = 0
@@ -139,52 +142,17 @@ def plot(data, pconfig=None):
                     pairs.append(d[s][k])
                     maxval = max(maxval, d[s][k])
             else:
-
-                # Discard > ymax or just hide?
-                # If it never comes back into the plot, discard. If it goes above then comes back, just hide.
-                discard_ymax = None
-                discard_ymin = None
-                for k in sorted(d[s].keys()):
-                    if "xmax" in series_config and float(k) > float(series_config["xmax"]):
-                        continue
-                    if "xmin" in series_config and float(k) < float(series_config["xmin"]):
-                        continue
-                    if d[s][k] is not None and "ymax" in series_config:
-                        if float(d[s][k]) > float(series_config["ymax"]):
-                            discard_ymax = True
-                        elif discard_ymax is True:
-                            discard_ymax = False
-                    if d[s][k] is not None and "ymin" in series_config:
-                        if float(d[s][k]) > float(series_config["ymin"]):
-                            discard_ymin = True
-                        elif discard_ymin is True:
-                            discard_ymin = False
-
-                # Build the plot data structure
-                for k in sorted(d[s].keys()):
-                    if k is not None:
-                        if "xmax" in series_config and float(k) > float(series_config["xmax"]):
-                            continue
-                        if "xmin" in series_config and float(k) < float(series_config["xmin"]):
-                            continue
-                    if d[s][k] is not None:
-                        if (
-                            "ymax" in series_config
-                            and float(d[s][k]) > float(series_config["ymax"])
-                            and discard_ymax is not False
-                        ):
-                            continue
-                        if (
-                            "ymin" in series_config
-                            and float(d[s][k]) < float(series_config["ymin"])
-                            and discard_ymin is not False
-                        ):
-                            continue
-                    pairs.append([k, d[s][k]])
-                    try:
-                        maxval = max(maxval, d[s][k])
-                    except TypeError:
-                        pass
+                # Numeric series are filtered as arrays, others point by point
+                series = numeric_series_pairs(d[s], series_config)
+                if series is None:
+                    series = series_pairs(d[s], series_config) + (None,)
+                pairs, maxval, xy = series
+
+                # Downsample long series, keeping their shape and peaks
+                max_points = series_config.get("downsample_points", config.plots_downsample_points)
+                if max_points and len(pairs) > max_points:
+                    method = series_config.get("downsample_method", config.plots_downsample_method)
+                    pairs = downsample_series(pairs, max_points, method, xy)
             if maxval > 0 or series_config.get("hide_empty") is not True:
                 this_series = {"name": s, "data": pairs}
                 try:
@@ -342,20 +310,6 @@ def matplotlib_linegraph(plotdata, pconfig=None):
     )
     html += '<div class="mqc_mplplot_plotgroup" id="{}">'.format(pconfig["id"])
 
-    # Same defaults as HighCharts for consistency
-    default_colors = [
-        "#7cb5ec",
-        "#434348",
-        "#90ed7d",
-        "#f7a35c",
-        "#8085e9",
-        "#f15c80",
-        "#e4d354",
-        "#2b908f",
-        "#f45b5b",
-        "#91e8e1",
-    ]
-
     # Buttons to cycle through different datasets
     if len(plotdata) > 1 and not config.simple_output:
         html += '<div class="btn-group mpl_switch_group mqc_mplplot_bargraph_switchds">\n'
@@ -411,195 +365,306 @@ def matplotlib_linegraph(plotdata, pconfig=None):
             else:
                 util_functions.write_data_file(fdata, pid)
 
-        plt_height = 6
-        # Use fixed height if pconfig['height'] is set (convert pixels -> inches)
-        if "height" in pconfig:
-            # Default interactive height in pixels = 512
-            # Not perfect replication, but good enough
-            plt_height = 6 * (pconfig["height"] / 512)
+        # Should this plot be hidden on report load?
+        hidediv = ""
+        if pidx > 0:
+            hidediv = ' style="display:none;"'
+
+        # Draw the figure, export it and embed or link it, here or in a worker process
+        spec = mpl_render.figure_spec(
+            "xy_line", pid, (pdata, pidx, pconfig), getattr(get_template_mod(), "base64_plots", True) is True
+        )
+        html += mpl_render.add_figure(spec, hidediv)
 
-        # Set up figure
-        fig = plt.figure(figsize=(14, plt_height), frameon=False)
-        axes = fig.add_subplot(111)
+    # Close wrapping div
+    html += "</div>"
 
-        # Go through data series
-        for idx, d in enumerate(pdata):
+    return html
 
-            # Default colour index
-            cidx = idx
-            while cidx >= len(default_colors):
-                cidx -= len(default_colors)
 
-            # Line style
-            linestyle = "solid"
-            if d.get("dashStyle", None) == "Dash":
-                linestyle = "dashed"
+def draw_linegraph(pdata, pidx, pconfig):
+    """
+    Draw a single dataset of a flat line graph. Called by mpl_render, possibly in a worker process.
+    :param pdata: list of series of the dataset
+    :param pidx: index of the dataset
+    :param pconfig: plot config
+    :return: MatPlotLib figure and the extra artists to fit in exported files (None)
+    """
+    # Same defaults as HighCharts for consistency
+    default_colors = [
+        "#7cb5ec",
+        "#434348",
+        "#90ed7d",
+        "#f7a35c",
+        "#8085e9",
+        "#f15c80",
+        "#e4d354",
+        "#2b908f",
+        "#f45b5b",
+        "#91e8e1",
+    ]
 
-            # Reformat data (again)
-            try:
-                axes.plot(
-                    [x[0] for x in d["data"]],
-                    [x[1] for x in d["data"]],
-                    label=d["name"],
-                    color=d.get("color", default_colors[cidx]),
-                    linestyle=linestyle,
-                    linewidth=1,
-                    marker=None,
-                )
-            except TypeError:
-                # Categorical data on x axis
-                axes.plot(
-                    d["data"], label=d["name"], color=d.get("color", default_colors[cidx]), linewidth=1, marker=None
-                )
-
-        # Tidy up axes
-        axes.tick_params(
-            labelsize=pconfig.get("labelSize", 8), direction="out", left=False, right=False, top=False, bottom=False
-        )
-        axes.set_xlabel(pconfig.get("xlab", ""))
-        axes.set_ylabel(pconfig.get("ylab", ""))
+    plt_height = 6
+    # Use fixed height if pconfig['height'] is set (convert pixels -> inches)
+    if "height" in pconfig:
+        # Default interactive height in pixels = 512
+        # Not perfect replication, but good enough
+        plt_height = 6 * (pconfig["height"] / 512)
 
-        # Dataset specific y label
-        try:
-            axes.set_ylabel(pconfig["data_labels"][pidx]["ylab"])
-        except:
-            pass
+    # Set up figure
+    fig = plt.figure(figsize=(14, plt_height), frameon=False)
+    axes = fig.add_subplot(111)
 
-        # Axis limits
-        default_ylimits = axes.get_ylim()
-        ymin = default_ylimits[0]
-        if "ymin" in pconfig:
-            ymin = pconfig["ymin"]
-        elif "yFloor" in pconfig:
-            ymin = max(pconfig["yFloor"], default_ylimits[0])
-        ymax = default_ylimits[1]
-        if "ymax" in pconfig:
-            ymax = pconfig["ymax"]
-        elif "yCeiling" in pconfig:
-            ymax = min(pconfig["yCeiling"], default_ylimits[1])
-        if (ymax - ymin) < pconfig.get("yMinRange", 0):
-            ymax = ymin + pconfig["yMinRange"]
-        axes.set_ylim((ymin, ymax))
-
-        # Dataset specific ymax
+    # Go through data series
+    for idx, d in enumerate(pdata):
+
+        # Default colour index
+        cidx = idx
+        while cidx >= len(default_colors):
+            cidx -= len(default_colors)
+
+        # Line style
+        linestyle = "solid"
+        if d.get("dashStyle", None) == "Dash":
+            linestyle = "dashed"
+
+        # Reformat data (again)
         try:
-            axes.set_ylim((ymin, pconfig["data_labels"][pidx]["ymax"]))
-        except:
-            pass
+            axes.plot(
+                [x[0] for x in d["data"]],
+                [x[1] for x in d["data"]],
+                label=d["name"],
+                color=d.get("color", default_colors[cidx]),
+                linestyle=linestyle,
+                linewidth=1,
+                marker=None,
+            )
+        except TypeError:
+            # Categorical data on x axis
+            axes.plot(d["data"], label=d["name"], color=d.get("color", default_colors[cidx]), linewidth=1, marker=None)
+
+    # Tidy up axes
+    axes.tick_params(
+        labelsize=pconfig.get("labelSize", 8), direction="out", left=False, right=False, top=False, bottom=False
+    )
+    axes.set_xlabel(pconfig.get("xlab", ""))
+    axes.set_ylabel(pconfig.get("ylab", ""))
+
+    # Dataset specific y label
+    try:
+        axes.set_ylabel(pconfig["data_labels"][pidx]["ylab"])
+    except:
+        pass
+
+    # Axis limits
+    default_ylimits = axes.get_ylim()
+    ymin = default_ylimits[0]
+    if "ymin" in pconfig:
+        ymin = pconfig["ymin"]
+    elif "yFloor" in pconfig:
+        ymin = max(pconfig["yFloor"], default_ylimits[0])
+    ymax = default_ylimits[1]
+    if "ymax" in pconfig:
+        ymax = pconfig["ymax"]
+    elif "yCeiling" in pconfig:
+        ymax = min(pconfig["yCeiling"], default_ylimits[1])
+    if (ymax - ymin) < pconfig.get("yMinRange", 0):
+        ymax = ymin + pconfig["yMinRange"]
+    axes.set_ylim((ymin, ymax))
+
+    # Dataset specific ymax
+    try:
+        axes.set_ylim((ymin, pconfig["data_labels"][pidx]["ymax"]))
+    except:
+        pass
 
-        default_xlimits = axes.get_xlim()
-        xmin = default_xlimits[0]
-        if "xmin" in pconfig:
-            xmin = pconfig["xmin"]
-        elif "xFloor" in pconfig:
-            xmin = max(pconfig["xFloor"], default_xlimits[0])
-        xmax = default_xlimits[1]
-        if "xmax" in pconfig:
-            xmax = pconfig["xmax"]
-        elif "xCeiling" in pconfig:
-            xmax = min(pconfig["xCeiling"], default_xlimits[1])
-        if (xmax - xmin) < pconfig.get("xMinRange", 0):
-            xmax = xmin + pconfig["xMinRange"]
-        axes.set_xlim((xmin, xmax))
-
-        # Plot title
-        if "title" in pconfig:
-            plt.text(0.5, 1.05, pconfig["title"], horizontalalignment="center", fontsize=16, transform=axes.transAxes)
-        axes.grid(True, zorder=10, which="both", axis="y", linestyle="-", color="#dedede", linewidth=1)
-
-        # X axis categories, if specified
-        if "categories" in pconfig:
-            axes.set_xticks([i for i, v in enumerate(pconfig["categories"])])
-            axes.set_xticklabels(pconfig["categories"])
-
-        # Axis lines
+    default_xlimits = axes.get_xlim()
+    xmin = default_xlimits[0]
+    if "xmin" in pconfig:
+        xmin = pconfig["xmin"]
+    elif "xFloor" in pconfig:
+        xmin = max(pconfig["xFloor"], default_xlimits[0])
+    xmax = default_xlimits[1]
+    if "xmax" in pconfig:
+        xmax = pconfig["xmax"]
+    elif "xCeiling" in pconfig:
+        xmax = min(pconfig["xCeiling"], default_xlimits[1])
+    if (xmax - xmin) < pconfig.get("xMinRange", 0):
+        xmax = xmin + pconfig["xMinRange"]
+    axes.set_xlim((xmin, xmax))
+
+    # Plot title
+    if "title" in pconfig:
+        plt.text(0.5, 1.05, pconfig["title"], horizontalalignment="center", fontsize=16, transform=axes.transAxes)
+    axes.grid(True, zorder=10, which="both", axis="y", linestyle="-", color="#dedede", linewidth=1)
+
+    # X axis categories, if specified
+    if "categories" in pconfig:
+        axes.set_xticks([i for i, v in enumerate(pconfig["categories"])])
+        axes.set_xticklabels(pconfig["categories"])
+
+    # Axis lines
+    xlim = axes.get_xlim()
+    axes.plot([xlim[0], xlim[1]], [0, 0], linestyle="-", color="#dedede", linewidth=2)
+    axes.set_axisbelow(True)
+    axes.spines["right"].set_visible(False)
+    axes.spines["top"].set_visible(False)
+    axes.spines["bottom"].set_visible(False)
+    axes.spines["left"].set_visible(False)
+
+    # Background colours, if specified
+    if "yPlotBands" in pconfig:
         xlim = axes.get_xlim()
-        axes.plot([xlim[0], xlim[1]], [0, 0], linestyle="-", color="#dedede", linewidth=2)
-        axes.set_axisbelow(True)
-        axes.spines["right"].set_visible(False)
-        axes.spines["top"].set_visible(False)
-        axes.spines["bottom"].set_visible(False)
-        axes.spines["left"].set_visible(False)
-
-        # Background colours, if specified
-        if "yPlotBands" in pconfig:
-            xlim = axes.get_xlim()
-            for pb in pconfig["yPlotBands"]:
-                axes.barh(
-                    pb["from"],
-                    xlim[1],
-                    height=pb["to"] - pb["from"],
-                    left=xlim[0],
-                    color=pb["color"],
-                    linewidth=0,
-                    zorder=0,
-                    align="edge",
-                )
-        if "xPlotBands" in pconfig:
-            ylim = axes.get_ylim()
-            for pb in pconfig["xPlotBands"]:
-                axes.bar(
-                    pb["from"],
-                    ylim[1],
-                    width=pb["to"] - pb["from"],
-                    bottom=ylim[0],
-                    color=pb["color"],
-                    linewidth=0,
-                    zorder=0,
-                    align="edge",
-                )
-
-        # Tight layout - makes sure that legend fits in and stuff
-        if len(pdata) <= 15:
-            axes.legend(
-                loc="lower center",
-                bbox_to_anchor=(0, -0.22, 1, 0.102),
-                ncol=5,
-                mode="expand",
-                fontsize=pconfig.get("labelSize", 8),
-                frameon=False,
+        for pb in pconfig["yPlotBands"]:
+            axes.barh(
+                pb["from"],
+                xlim[1],
+                height=pb["to"] - pb["from"],
+                left=xlim[0],
+                color=pb["color"],
+                linewidth=0,
+                zorder=0,
+                align="edge",
+            )
+    if "xPlotBands" in pconfig:
+        ylim = axes.get_ylim()
+        for pb in pconfig["xPlotBands"]:
+            axes.bar(
+                pb["from"],
+                ylim[1],
+                width=pb["to"] - pb["from"],
+                bottom=ylim[0],
+                color=pb["color"],
+                linewidth=0,
+                zorder=0,
+                align="edge",
             )
-            plt.tight_layout(rect=[0, 0.08, 1, 0.92])
-        else:
-            plt.tight_layout(rect=[0, 0, 1, 0.92])
 
-        # Should this plot be hidden on report load?
-        hidediv = ""
-        if pidx > 0:
-            hidediv = ' style="display:none;"'
+    # Tight layout - makes sure that legend fits in and stuff
+    if len(pdata) <= 15:
+        axes.legend(
+            loc="lower center",
+            bbox_to_anchor=(0, -0.22, 1, 0.102),
+            ncol=5,
+            mode="expand",
+            fontsize=pconfig.get("labelSize", 8),
+            frameon=False,
+        )
+        plt.tight_layout(rect=[0, 0.08, 1, 0.92])
+    else:
+        plt.tight_layout(rect=[0, 0, 1, 0.92])
 
-        # Save the plot to the data directory if export is requests
-        if config.export_plots:
-            for fformat in config.export_plot_formats:
-                # Make the directory if it doesn't already exist
-                plot_dir = os.path.join(config.plots_dir, fformat)
-                if not os.path.exists(plot_dir):
-                    os.makedirs(plot_dir)
-                # Save the plot
-                plot_fn = os.path.join(plot_dir, "{}.{}".format(pid, fformat))
-                fig.savefig(plot_fn, format=fformat, bbox_inches="tight")
-
-        # Output the figure to a base64 encoded string
-        if getattr(get_template_mod(), "base64_plots", True) is True:
-            img_buffer = io.BytesIO()
-            fig.savefig(img_buffer, format="png", bbox_inches="tight")
-            b64_img = base64.b64encode(img_buffer.getvalue()).decode("utf8")
-            img_buffer.close()
-            html += '<div class="mqc_mplplot" id="{}"{}><img src="data:image/png;base64,{}" /></div>'.format(
-                pid, hidediv, b64_img
-            )
+    return fig, None
 
-        # Save to a file and link <img>
-        else:
-            plot_relpath = os.path.join(config.plots_dir_name, "png", "{}.png".format(pid))
-            html += '<div class="mqc_mplplot" id="{}"{}><img src="{}" /></div>'.format(pid, hidediv, plot_relpath)
 
-        plt.close(fig)
+def series_pairs(values, series_config):
+    """
+    Build the [x, y] pairs of a series point by point, dropping points outside of the x and y limits.
+    :param values: dict with x:y values of a sample
+    :param series_config: plot config, with the data_labels config of the dataset
+    :return: list of [x, y] pairs and the largest y value (0 if all are below)
+    """
+    pairs = list()
+    maxval = 0
+    # Discard > ymax or just hide?
+    # If it never comes back into the plot, discard. If it goes above then comes back, just hide.
+    discard_ymax = None
+    discard_ymin = None
+    for k in sorted(values.keys()):
+        if "xmax" in series_config and float(k) > float(series_config["xmax"]):
+            continue
+        if "xmin" in series_config and float(k) < float(series_config["xmin"]):
+            continue
+        if values[k] is not None and "ymax" in series_config:
+            if float(values[k]) > float(series_config["ymax"]):
+                discard_ymax = True
+            elif discard_ymax is True:
+                discard_ymax = False
+        if values[k] is not None and "ymin" in series_config:
+            if float(values[k]) > float(series_config["ymin"]):
+                discard_ymin = True
+            elif discard_ymin is True:
+                discard_ymin = False
+
+    # Build the plot data structure
+    for k in sorted(values.keys()):
+        if k is not None:
+            if "xmax" in series_config and float(k) > float(series_config["xmax"]):
+                continue
+            if "xmin" in series_config and float(k) < float(series_config["xmin"]):
+                continue
+        if values[k] is not None:
+            if (
+                "ymax" in series_config
+                and float(values[k]) > float(series_config["ymax"])
+                and discard_ymax is not False
+            ):
+                continue
+            if (
+                "ymin" in series_config
+                and float(values[k]) < float(series_config["ymin"])
+                and discard_ymin is not False
+            ):
+                continue
+        pairs.append([k, values[k]])
+        try:
+            maxval = max(maxval, values[k])
+        except TypeError:
+            pass
 
-    # Close wrapping div
-    html += "</div>"
+    return pairs, maxval
 
-    return html
+
+def numeric_series_pairs(values, series_config):
+    """
+    Build the [x, y] pairs of a series with numeric x and y values, dropping points outside of the x and y limits
+    with NumPy arrays. Gives the same pairs as series_pairs(), with the original x and y objects.
+    :param values: dict with x:y values of a sample
+    :param series_config: plot config, with the data_labels config of the dataset
+    :return: list of [x, y] pairs, the largest y value (0 if all are below) and a float array of the pairs,
+        or None if some x or y values are not numbers (e.g. None), to use series_pairs() instead
+    """
+    keys = sorted(values.keys())
+    vals = list(map(values.__getitem__, keys))
+    x = np.array(keys)
+    y = np.array(vals)
+    if x.ndim != 1 or y.ndim != 1 or x.dtype.kind not in "iuf" or y.dtype.kind not in "iuf":
+        return None
+
+    keep = np.ones(len(keys), dtype=bool)
+    if "xmax" in series_config:
+        keep &= ~(x > float(series_config["xmax"]))
+    if "xmin" in series_config:
+        keep &= ~(x < float(series_config["xmin"]))
+
+    # Discard > ymax or just hide?
+    # If it never comes back into the plot, discard. If it goes above then comes back, just hide.
+    # As in series_pairs(), it comes back if a point after the last one above the limit is in the plot.
+    in_x = y[keep]
+    if "ymax" in series_config:
+        above = in_x > float(series_config["ymax"])
+        if not above.any() or above[-1]:
+            keep &= ~(y > float(series_config["ymax"]))
+    if "ymin" in series_config:
+        above = in_x > float(series_config["ymin"])
+        if not above.any() or above[-1]:
+            keep &= ~(y < float(series_config["ymin"]))
+
+    # Pairs of the original x and y objects, so that e.g. integers stay integers in the plot data
+    pairs = np.empty((len(keys), 2), dtype=object)
+    pairs[:, 0] = keys
+    pairs[:, 1] = vals
+    # Many small lists at once would make the garbage collector go through all objects over and over
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        pairs = pairs[keep].tolist()
+    finally:
+        if gc_enabled:
+            gc.enable()
+    positive = y[keep][y[keep] > 0]
+    maxval = positive.max() if len(positive) > 0 else 0
+    return pairs, maxval, np.column_stack((x[keep], y[keep])).astype(float)
 
 
 def smooth_line_data(data, numpoints, sumcounts=True):
@@ -635,7 +700,86 @@ def smooth_line_data(data, numpoints, sumcounts=True):
 
         binsize = (len(d) - 1) / (numpoints - 1)
         first_element_indices = [round(binsize * i) for i in range(numpoints)]
-        smoothed_d = OrderedDict(xy for i, xy in enumerate(d.items()) if i in first_element_indices)
+        items = list(d.items())
+        smoothed_d = OrderedDict(items[i] for i in first_element_indices)
         smoothed_data[s_name] = smoothed_d
 
     return smoothed_data
+
+
+def downsample_series(pairs, max_points, method="lttb", xy=None):
+    """
+    Reduce a series of [x, y] pairs to at most max_points points, picking points of the series,
+    so that the curve keeps its shape and its peaks are not smoothed away.
+    Series with y values which are not numbers (e.g. None for gaps) are returned as they are.
+    :param pairs: list of [x, y] pairs, in the order of the x axis
+    :param max_points: maximum number of points to keep
+    :param method: 'lttb' for Largest-Triangle-Three-Buckets or 'minmax' for the minimum and maximum of every bucket
+    :param xy: optional float array of the pairs, if it's already built
+    :return: list of the kept [x, y] pairs
+    """
+    if len(pairs) <= max_points or max_points < 4:
+        return pairs
+    if xy is None:
+        try:
+            xy = np.array(pairs, dtype=float)
+        except (TypeError, ValueError):
+            return pairs
+    if xy.ndim != 2 or not np.isfinite(xy).all():
+        return pairs
+
+    if method == "minmax":
+        indices = minmax_indices(xy[:, 1], max_points)
+    elif method == "lttb":
+        indices = lttb_indices(xy[:, 0], xy[:, 1], max_points)
+    else:
+        logger.warning("Unknown linegraph downsample method '{}', series kept as they are".format(method))
+        return pairs
+    return [pairs[i] for i in indices]
+
+
+def bucket_firsts(mask, buckets):
+    """Index of the first True value of mask in every bucket, for buckets numbered in the order of the points"""
+    indices = np.flatnonzero(mask)
+    _, firsts = np.unique(buckets[indices], return_index=True)
+    return indices[firsts]
+
+
+def lttb_indices(x, y, num_points):
+    """
+    Indices of points picked by Largest-Triangle-Three-Buckets. The first and the last point are kept and
+    the others are split into buckets of about the same size. From every bucket the point making the largest
+    triangle with the neighbouring buckets is kept. The averages of both neighbouring buckets are used
+    as the other vertices, instead of the point picked in the previous bucket, so all buckets are done at once.
+    """
+    edges = np.linspace(1, len(x) - 1, num_points - 1).astype(int)
+    counts = np.diff(edges)
+    buckets = np.repeat(np.arange(len(counts)), counts)
+    px = x[1:-1]
+    py = y[1:-1]
+    mean_x = np.add.reduceat(px, edges[:-1] - 1) / counts
+    mean_y = np.add.reduceat(py, edges[:-1] - 1) / counts
+
+    # Vertices before and after every bucket, the first and last point for the first and last bucket
+    ax = np.concatenate(([x[0]], mean_x[:-1]))[buckets]
+    ay = np.concatenate(([y[0]], mean_y[:-1]))[buckets]
+    cx = np.concatenate((mean_x[1:], [x[-1]]))[buckets]
+    cy = np.concatenate((mean_y[1:], [y[-1]]))[buckets]
+    # Double the area of triangles, which is enough to compare them
+    areas = np.abs((ax - cx) * (py - ay) - (ax - px) * (cy - ay))
+
+    largest = bucket_firsts(areas == np.repeat(np.maximum.reduceat(areas, edges[:-1] - 1), counts), buckets)
+    return np.concatenate(([0], largest + 1, [len(x) - 1]))
+
+
+def minmax_indices(y, num_points):
+    """
+    Indices of points with the minimum and the maximum y value in buckets of about the same size,
+    in the order of the points. The first and the last point are kept as well.
+    """
+    edges = np.linspace(0, len(y), (num_points - 2) // 2 + 1).astype(int)
+    counts = np.diff(edges)
+    buckets = np.repeat(np.arange(len(counts)), counts)
+    minima = bucket_firsts(y == np.repeat(np.minimum.reduceat(y, edges[:-1]), counts), buckets)
+    maxima = bucket_firsts(y == np.repeat(np.maximum.reduceat(y, edges[:-1]), counts), buckets)
+    return np.union1d(np.union1d(minima, maxima), [0, len(y) - 1])
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+
+""" MultiQC functions to render MatPlotLib figures of flat plots, one by one or in a pool of worker processes """
+
+import base64
+import concurrent.futures
+import io
+import logging
+import multiprocessing
+import os
+import pickle
+import re
+
+from multiqc.utils import config
+
+logger = logging.getLogger(__name__)
+
+FIGURE_PLACEHOLDER = "<!-- mqc_mplplot_figure:{} -->"
+FIGURE_PLACEHOLDER_RE = re.compile(r"<!-- mqc_mplplot_figure:(\d+) -->")
+
+# Pool of worker processes, created with the first figure and kept for the next plots of this process
+_executor = None
+_executor_pid = None
+# Figures sent to the pool, by the number in their placeholder: (spec, hidediv, future)
+_pending = dict()
+_num_figures = 0
+
+
+def figure_spec(plot_type, pid, args, base64_plots=True):
+    """
+    Build the description of a single figure, which can be sent to a worker process.
+    :param plot_type: 'xy_line' or 'bar_graph', selects the function drawing the figure
+    :param pid: ID of the figure, used for the exported file names
+    :param args: arguments of the drawing function, see linegraph.draw_linegraph and bargraph.draw_bargraph
+    :param base64_plots: True to embed the PNG image in the HTML, False to link the exported file
+    :return: dict with the figure spec
+    """
+    export_fns = []
+    if config.export_plots:
+        export_fns = [
+            (fformat, os.path.join(config.plots_dir, fformat, "{}.{}".format(pid, fformat)))
+            for fformat in config.export_plot_formats
+        ]
+    return {"plot_type": plot_type, "pid": pid, "args": args, "export_fns": export_fns, "base64": base64_plots}
+
+
+def render_figure(spec):
+    """
+    Draw a figure with the Agg backend, save it to the export files and encode it as a base64 PNG.
+    Called directly or in a worker process.
+    :param spec: figure spec from figure_spec()
+    :return: dict with the base64 encoded PNG (None if not embedded) and the paths of the exported files
+    """
+    if not spec["base64"] and not spec["export_fns"]:
+        return {"b64": None, "files": []}
+
+    # Imported here, as the plot modules import this one
+    from multiqc.plots import bargraph, linegraph
+    import matplotlib.pyplot as plt
+
+    draw = {"xy_line": linegraph.draw_linegraph, "bar_graph": bargraph.draw_bargraph}[spec["plot_type"]]
+    fig, extra_artists = draw(*spec["args"])
+    try:
+        files = []
+        for fformat, plot_fn in spec["export_fns"]:
+            # Make the directory if it doesn't already exist
+            os.makedirs(os.path.dirname(plot_fn), exist_ok=True)
+            fig.savefig(plot_fn, format=fformat, bbox_extra_artists=extra_artists, bbox_inches="tight")
+            files.append(plot_fn)
+
+        b64_img = None
+        if spec["base64"]:
+            img_buffer = io.BytesIO()
+            fig.savefig(img_buffer, format="png", bbox_inches="tight")
+            b64_img = base64.b64encode(img_buffer.getvalue()).decode("utf8")
+            img_buffer.close()
+    finally:
+        plt.close(fig)
+
+    return {"b64": b64_img, "files": files}
+
+
+def render_pickled_figure(spec_pickle):
+    """Render a figure sent to a worker process as a pickled spec"""
+    return render_figure(pickle.loads(spec_pickle))
+
+
+def figure_html(spec, hidediv, rendered):
+    """Build the HTML of a rendered figure, with the image embedded or linked to the exported PNG"""
+    if rendered["b64"] is not None:
+        return '<div class="mqc_mplplot" id="{}"{}><img src="data:image/png;base64,{}" /></div>'.format(
+            spec["pid"], hidediv, rendered["b64"]
+        )
+    plot_relpath = os.path.join(config.plots_dir_name, "png", "{}.png".format(spec["pid"]))
+    return '<div class="mqc_mplplot" id="{}"{}><img src="{}" /></div>'.format(spec["pid"], hidediv, plot_relpath)
+
+
+def add_figure(spec, hidediv=""):
+    """
+    Render a figure, or send it to the pool of worker processes if config.plots_flat_workers is above 1.
+    :param spec: figure spec from figure_spec()
+    :param hidediv: style attribute of the figure div, to hide it on report load
+    :return: HTML of the figure, or a placeholder which is replaced by insert_figures()
+    """
+    global _num_figures
+    executor = get_executor()
+    if executor is None:
+        return figure_html(spec, hidediv, render_figure(spec))
+
+    try:
+        # Pickled here, as the plot config can be changed after the plot function returns
+        future = executor.submit(render_pickled_figure, pickle.dumps(spec, pickle.HIGHEST_PROTOCOL))
+    except Exception as e:
+        # e.g. a plot config with functions, which can't be pickled
+        logger.debug("Sending figure {} to a worker process failed: {}".format(spec["pid"], e))
+        return figure_html(spec, hidediv, render_figure(spec))
+    _num_figures += 1
+    _pending[_num_figures] = (spec, hidediv, future)
+    return FIGURE_PLACEHOLDER.format(_num_figures)
+
+
+def get_executor():
+    """Return the pool of worker processes rendering figures, or None if figures are rendered one by one"""
+    global _executor, _executor_pid
+    workers = config.plots_flat_workers
+    if workers is None or workers <= 1:
+        return None
+    # A pool created by a parent process can't be used by a forked child
+    if _executor is None or _executor_pid != os.getpid():
+        mp_context = None
+        if "fork" in multiprocessing.get_all_start_methods():
+            mp_context = multiprocessing.get_context("fork")
+        _executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=mp_context)
+        _executor_pid = os.getpid()
+        _pending.clear()
+    return _executor
+
+
+def insert_figures(html):
+    """
+    Replace placeholders of figures sent to the pool with their HTML, waiting for them to be rendered.
+    Figures which failed in a worker process are rendered here again.
+    :param html: HTML with placeholders from add_figure(), or None
+    :return: HTML with the figures
+    """
+    if not html or "mqc_mplplot_figure" not in html:
+        return html
+
+    def figure(match):
+        spec, hidediv, future = _pending.pop(int(match.group(1)))
+        try:
+            rendered = future.result()
+        except Exception as e:
+            logger.debug("Rendering figure {} in a worker process failed: {}".format(spec["pid"], e))
+            try:
+                rendered = render_figure(spec)
+            except Exception as e:
+                # Too late to fall back to HighCharts, as the rest of the plot HTML is already built
+                logger.error("############### Error making MatPlotLib figure {}!".format(spec["pid"]))
+                logger.debug(e, exc_info=True)
+                return '<div class="mqc_mplplot" id="{}"{}><p class="text-danger">Plot could not be drawn.</p></div>'.format(
+                    spec["pid"], hidediv
+                )
+        return figure_html(spec, hidediv, rendered)
+
+    return FIGURE_PLACEHOLDER_RE.sub(figure, html)
+
+
+def shutdown():
+    """
+    Stop the worker processes, if there are any, after the pending figures are rendered.
+    Figures of plots made only to be exported have placeholders which are never inserted, but their files are saved.
+    """
+    global _executor, _executor_pid
+    if _executor is not None and _executor_pid == os.getpid():
+        _executor.shutdown(wait=True)
+    _executor = None
+    _executor_pid = None
+    _pending.clear()
@@ -4,9 +4,11 @@
 
 from collections import defaultdict, OrderedDict
 import logging
+import numpy as np
 import random
+import re
 
-from multiqc.utils import config, report, util_functions, mqc_colour
+from multiqc.utils import config, report, util_functions, mqc_colour, jupyterlab_data
 from multiqc.plots import table_object, beeswarm
 
 logger = logging.getLogger(__name__)
@@ -30,6 +32,24 @@ def plot(data, headers=None, pconfig=None):
         for k, v in config.custom_plot_config[pconfig["id"]].items():
             pconfig[k] = v
 
+    # Keep the table data in the JupyterLab extension, so the table can be built again for any samples
+    table_key = None
+    if config.template == "jupyterlab":
+        table_key = save_table_data(data, headers, pconfig)
+
+    html = plot_html(data, headers, pconfig)
+    if table_key is not None:
+        html = jupyterlab_data.mark_table(table_key, html)
+    return html
+
+
+def plot_html(data, headers, pconfig):
+    """Build HTML for a MultiQC table, or for a beeswarm plot if there are many samples.
+    :param data: 2D dict, first keys as sample names, then x:y data pairs
+    :param headers: list of optional dicts with column config in key:value pairs.
+    :param pconfig: plot config dict
+    :return: HTML ready to be inserted into the page
+    """
     # Make a datatable object
     dt = table_object.datatable(data, headers, pconfig)
 
@@ -53,6 +73,44 @@ def plot(data, headers=None, pconfig=None):
         return make_table(dt)
 
 
+def save_table_data(data, headers, pconfig):
+    """Save table data in report.plot_data, with 'modify' functions already applied,
+    so the table can be built again from JSON for a subset of samples.
+    :param data: 2D dict or list of them, as given to plot()
+    :param headers: dict or list of dicts with column config, as given to plot()
+    :param pconfig: plot config dict
+    :return: plot id of the saved data, or None if the table can't be saved
+    """
+    if callable(pconfig.get("modify")):
+        return None  # applied by datatable to every column, the table is kept as HTML only
+
+    datasets = data if type(data) is list else [data]
+    headers = headers if type(headers) is list else [headers]
+    saved_datasets = list()
+    saved_headers = list()
+    for idx, d in enumerate(datasets):
+        h = headers[idx] if idx < len(headers) and headers[idx] is not None else {}
+        d = OrderedDict((str(s_name), {str(k): v for k, v in samp.items()}) for s_name, samp in d.items())
+        h = OrderedDict((str(k), dict(hconfig)) for k, hconfig in h.items())
+        d, h = jupyterlab_data.apply_modify(d, h)
+        saved_datasets.append(d)
+        saved_headers.append(h)
+
+    base_key = "table_data_{}".format(re.sub(r"\W+", "_", str(pconfig.get("id") or len(report.plot_data))))
+    table_key = base_key
+    key_num = 1
+    while table_key in report.plot_data:
+        table_key = "{}_{}".format(base_key, key_num)
+        key_num += 1
+    report.plot_data[table_key] = {
+        "plot_type": "table",
+        "datasets": saved_datasets,
+        "headers": saved_headers,
+        "pconfig": {k: v for k, v in pconfig.items() if not callable(v)},
+    }
+    return table_key
+
+
 def make_table(dt):
     """
     Build the HTML needed for a MultiQC table.
@@ -146,133 +204,69 @@ def make_table(dt):
         cond_formatting_colours = header.get("cond_formatting_colours", [])
         cond_formatting_colours.extend(config.table_cond_formatting_colours)
 
-        # Add the data table cells
-        for (s_name, samp) in dt.data[idx].items():
-            if k in samp:
-                val = samp[k]
-                kname = "{}_{}".format(header["namespace"], rid)
-                dt.raw_vals[s_name][kname] = val
-
-                if "modify" in header and callable(header["modify"]):
-                    val = header["modify"](val)
-
-                try:
-                    dmin = header["dmin"]
-                    dmax = header["dmax"]
-                    percentage = ((float(val) - dmin) / (dmax - dmin)) * 100
-                    # Treat 0 as 0-width and make bars width of absoluate value
-                    if header.get("bars_zero_centrepoint"):
-                        dmax = max(abs(header["dmin"]), abs(header["dmax"]))
-                        dmin = 0
-                        percentage = ((abs(float(val)) - dmin) / (dmax - dmin)) * 100
-                    percentage = min(percentage, 100)
-                    percentage = max(percentage, 0)
-                except (ZeroDivisionError, ValueError, TypeError):
-                    percentage = 0
-
-                try:
-                    valstring = str(header["format"].format(val))
-                except ValueError:
-                    try:
-                        valstring = str(header["format"].format(float(val)))
-                    except ValueError:
-                        valstring = str(val)
-                except:
-                    valstring = str(val)
+        # Work out the cells of the whole column at once
+        column = dt.get_column(idx, k)
+        kname = "{}_{}".format(header["namespace"], rid)
+        for s_name, val in zip(column.s_names, column.raw):
+            dt.raw_vals[s_name][kname] = val
+
+        valstrings = format_values(column.values, header)
+        badge_cols = cond_formatting_badges(column, cond_formatting_rules, cond_formatting_colours, rid, table_id)
+        for i, badge_col in enumerate(badge_cols):
+            if badge_col is not None:
+                valstrings[i] = '<span class="badge" style="background-color:{}">{}</span>'.format(
+                    badge_col, valstrings[i]
+                )
 
-                # This is horrible, but Python locale settings are worse
-                if config.thousandsSep_format is None:
-                    config.thousandsSep_format = '<span class="mqc_thousandSep"></span>'
-                if config.decimalPoint_format is None:
-                    config.decimalPoint_format = "."
-                valstring = valstring.replace(".", "DECIMAL").replace(",", "THOUSAND")
-                valstring = valstring.replace("DECIMAL", config.decimalPoint_format).replace(
-                    "THOUSAND", config.thousandsSep_format
+        # Build table cell background colour bars
+        if header["scale"]:
+            percentages = get_percentages(column, header)
+            if c_scale is not None:
+                colours = c_scale.get_colour_array(
+                    column.numbers if column.numeric else np.array(column.values, dtype=object)
                 )
+                col_styles = {colour: " background-color:{} !important;".format(colour) for colour in set(colours)}
+                cols = [col_styles[colour] for colour in colours]
+            else:
+                cols = [""] * len(valstrings)
+            coloured_td = '<td class="data-coloured {rid} {h}">'.format(rid=rid, h=hide)
+            bar_td = coloured_td.replace("{", "{{").replace("}", "}}") + (
+                '<div class="wrapper"><span class="bar" style="width:{}%;{}"></span>'
+                '<span class="val">{}</span></div></td>'
+            )
+            cells = list(map(bar_td.format, percentages, cols, valstrings))
 
-                # Percentage suffixes etc
-                valstring += header.get("suffix", "")
-
-                # Conditional formatting
-                # Build empty dict for cformatting matches
-                cmatches = {}
-                for cfc in cond_formatting_colours:
-                    for cfck in cfc:
-                        cmatches[cfck] = False
-                # Find general rules followed by column-specific rules
-                for cfk in ["all_columns", rid, table_id]:
-                    if cfk in cond_formatting_rules:
-                        # Loop through match types
-                        for ftype in cmatches.keys():
-                            # Loop through array of comparison types
-                            for cmp in cond_formatting_rules[cfk].get(ftype, []):
-                                try:
-                                    # Each comparison should be a dict with single key: val
-                                    if "s_eq" in cmp and str(cmp["s_eq"]).lower() == str(val).lower():
-                                        cmatches[ftype] = True
-                                    if "s_contains" in cmp and str(cmp["s_contains"]).lower() in str(val).lower():
-                                        cmatches[ftype] = True
-                                    if "s_ne" in cmp and str(cmp["s_ne"]).lower() != str(val).lower():
-                                        cmatches[ftype] = True
-                                    if "eq" in cmp and float(cmp["eq"]) == float(val):
-                                        cmatches[ftype] = True
-                                    if "ne" in cmp and float(cmp["ne"]) != float(val):
-                                        cmatches[ftype] = True
-                                    if "gt" in cmp and float(cmp["gt"]) < float(val):
-                                        cmatches[ftype] = True
-                                    if "lt" in cmp and float(cmp["lt"]) > float(val):
-                                        cmatches[ftype] = True
-                                except:
-                                    logger.warning(
-                                        "Not able to apply table conditional formatting to '{}' ({})".format(val, cmp)
-                                    )
-                # Apply HTML in order of config keys
-                badge_col = None
-                for cfc in cond_formatting_colours:
-                    for cfck in cfc:  # should always be one, but you never know
-                        if cmatches[cfck]:
-                            badge_col = cfc[cfck]
-                if badge_col is not None:
-                    valstring = '<span class="badge" style="background-color:{}">{}</span>'.format(badge_col, valstring)
-
-                # Categorical backgorund colours supplied
-                if val in header.get("bgcols", {}).keys():
-                    col = 'style="background-color:{} !important;"'.format(header["bgcols"][val])
-                    if s_name not in t_rows:
-                        t_rows[s_name] = dict()
-                    t_rows[s_name][rid] = '<td class="{rid} {h}" {c}>{v}</td>'.format(
-                        rid=rid, h=hide, c=col, v=valstring
-                    )
-
-                # Build table cell background colour bar
-                elif header["scale"]:
-                    if c_scale is not None:
-                        col = " background-color:{} !important;".format(c_scale.get_colour(val))
-                    else:
-                        col = ""
-                    bar_html = '<span class="bar" style="width:{}%;{}"></span>'.format(percentage, col)
-                    val_html = '<span class="val">{}</span>'.format(valstring)
-                    wrapper_html = '<div class="wrapper">{}{}</div>'.format(bar_html, val_html)
-
-                    if s_name not in t_rows:
-                        t_rows[s_name] = dict()
-                    t_rows[s_name][rid] = '<td class="data-coloured {rid} {h}">{c}</td>'.format(
-                        rid=rid, h=hide, c=wrapper_html
-                    )
-
-                # Scale / background colours are disabled
-                else:
-                    if s_name not in t_rows:
-                        t_rows[s_name] = dict()
-                    t_rows[s_name][rid] = '<td class="{rid} {h}">{v}</td>'.format(rid=rid, h=hide, v=valstring)
-
-                # Is this cell hidden or empty?
-                if s_name not in t_rows_empty:
-                    t_rows_empty[s_name] = dict()
-                t_rows_empty[s_name][rid] = header.get("hidden", False) or str(val).strip() == ""
+        # Scale / background colours are disabled
+        else:
+            plain_td = '<td class="{rid} {h}">'.format(rid=rid, h=hide)
+            cells = [plain_td + valstring + "</td>" for valstring in valstrings]
+
+        # Categorical backgorund colours supplied
+        bgcols = header.get("bgcols", {})
+        if bgcols:
+            for i, val in enumerate(column.values):
+                if val in bgcols.keys():
+                    col = 'style="background-color:{} !important;"'.format(bgcols[val])
+                    cells[i] = '<td class="{rid} {h}" {c}>{v}</td>'.format(rid=rid, h=hide, c=col, v=valstrings[i])
+
+        # Is this cell hidden or empty?
+        if header.get("hidden", False):
+            empties = [True] * len(cells)
+        elif column.numeric:
+            empties = [False] * len(cells)
+        else:
+            empties = [str(val).strip() == "" for val in column.values]
+
+        # Add the data table cells
+        for s_name, cell, empty in zip(column.s_names, cells, empties):
+            if s_name not in t_rows:
+                t_rows[s_name] = dict()
+                t_rows_empty[s_name] = dict()
+            t_rows[s_name][rid] = cell
+            t_rows_empty[s_name][rid] = empty
 
         # Remove header if we don't have any filled cells for it
-        if sum([len(rows) for rows in t_rows.values()]) == 0:
+        if len(t_rows) == 0:
             if header.get("hidden", False) is True:
                 hidden_cols -= 1
             t_headers.pop(rid, None)
@@ -366,27 +360,25 @@ def make_table(dt):
     html += '<thead><tr><th class="rowheader">{}</th>{}</tr></thead>'.format(col1_header, "".join(t_headers.values()))
 
     # Build the table body
-    html += "<tbody>"
     t_row_keys = t_rows.keys()
     if dt.pconfig.get("sortRows") is not False:
         t_row_keys = sorted(t_row_keys)
+    t_body = ["<tbody>"]
     for s_name in t_row_keys:
         # Hide the row if all cells are empty or hidden
         row_hidden = ' style="display:none"' if all(t_rows_empty[s_name].values()) else ""
-        html += "<tr{}>".format(row_hidden)
         # Sample name row header
-        html += '<th class="rowheader" data-original-sn="{sn}">{sn}</th>'.format(sn=s_name)
-        for k in t_headers:
-            html += t_rows[s_name].get(k, empty_cells[k])
-        html += "</tr>"
-    html += "</tbody></table></div>"
+        t_body.append('<tr{}><th class="rowheader" data-original-sn="{sn}">{sn}</th>'.format(row_hidden, sn=s_name))
+        t_body.extend([t_rows[s_name].get(k, empty_cells[k]) for k in t_headers])
+        t_body.append("</tr>")
+    t_footer = "</tbody></table></div>"
     if len(t_rows) > 10 and config.collapse_tables:
-        html += '<div class="mqc-table-expand"><span class="glyphicon glyphicon-chevron-down" aria-hidden="true"></span></div>'
-    html += "</div>"
+        t_footer += '<div class="mqc-table-expand"><span class="glyphicon glyphicon-chevron-down" aria-hidden="true"></span></div>'
+    t_footer += "</div>"
 
     # Build the bootstrap modal to customise columns and order
     if not config.simple_output:
-        html += """
+        t_footer += """
     <!-- MultiQC Table Columns Modal -->
     <div class="modal fade" id="{tid}_configModal" tabindex="-1">
       <div class="modal-dialog modal-lg">
@@ -429,4 +421,116 @@ def make_table(dt):
         util_functions.write_data_file(dt.raw_vals, fn)
         report.saved_raw_data[fn] = dt.raw_vals
 
-    return html
+    # Join the table body only once, it can be large
+    t_body.append(t_footer)
+    return html + "".join(t_body)
+
+
+def format_values(values, header):
+    """Format values of a column for display, with the header format and suffix"""
+    # This is horrible, but Python locale settings are worse
+    if config.thousandsSep_format is None:
+        config.thousandsSep_format = '<span class="mqc_thousandSep"></span>'
+    if config.decimalPoint_format is None:
+        config.decimalPoint_format = "."
+    fmt = header["format"]
+    suffix = header.get("suffix", "")
+
+    try:
+        valstrings = list(map(fmt.format, values))
+    except:
+        # Some values can't be formatted, go through them one by one
+        valstrings = []
+        for val in values:
+            try:
+                valstring = str(fmt.format(val))
+            except ValueError:
+                try:
+                    valstring = str(fmt.format(float(val)))
+                except ValueError:
+                    valstring = str(val)
+            except:
+                valstring = str(val)
+            valstrings.append(valstring)
+
+    # Percentage suffixes etc
+    separators = {ord("."): config.decimalPoint_format, ord(","): config.thousandsSep_format}
+    return [valstring.translate(separators) + suffix for valstring in valstrings]
+
+
+def get_percentages(column, header):
+    """Width of the bar in every cell of a column, 0 for values which are not numbers"""
+    dmin = header["dmin"]
+    dmax = header["dmax"]
+    numbers = column.numbers
+    if dmax - dmin == 0:
+        return [0] * len(numbers)
+    # Treat 0 as 0-width and make bars width of absoluate value
+    if header.get("bars_zero_centrepoint"):
+        dmax = max(abs(header["dmin"]), abs(header["dmax"]))
+        dmin = 0
+        numbers = np.abs(numbers)
+        if dmax - dmin == 0:
+            return [0] * len(numbers)
+    with np.errstate(invalid="ignore", over="ignore"):
+        percentages = ((numbers - dmin) / (dmax - dmin)) * 100
+        above = percentages > 100
+        below = percentages < 0
+    # Limits are ints, like in the percentages of values which are not numbers
+    percentages = percentages.tolist()
+    for i in np.flatnonzero(above):
+        percentages[i] = 100
+    for i in np.flatnonzero(below | ~column.is_number):
+        percentages[i] = 0
+    return percentages
+
+
+def cond_formatting_badges(column, cond_formatting_rules, cond_formatting_colours, rid, table_id):
+    """Badge colour of every cell of a column from conditional formatting rules, None if no rule matches"""
+    # Find general rules followed by column-specific rules
+    cmatches = OrderedDict()
+    for cfc in cond_formatting_colours:
+        for cfck in cfc:
+            cmatches[cfck] = np.zeros(len(column.values), dtype=bool)
+    for cfk in ["all_columns", rid, table_id]:
+        if cfk in cond_formatting_rules:
+            # Loop through match types
+            for ftype in cmatches.keys():
+                # Loop through array of comparison types
+                for cmp in cond_formatting_rules[cfk].get(ftype, []):
+                    cmatches[ftype] |= cond_formatting_matches(column, cmp)
+
+    # Apply HTML in order of config keys
+    badge_cols = np.full(len(column.values), None, dtype=object)
+    for cfc in cond_formatting_colours:
+        for cfck in cfc:  # should always be one, but you never know
+            badge_cols[cmatches[cfck]] = cfc[cfck]
+    return badge_cols.tolist()
+
+
+def cond_formatting_matches(column, cmp):
+    """Cells of a column matching one conditional formatting comparison, which should be a dict with single key: val"""
+    matches = np.zeros(len(column.values), dtype=bool)
+    # Cells where a comparison could not be made, the rest of this comparison is skipped for them
+    failed = np.zeros(len(column.values), dtype=bool)
+    try:
+        if "s_eq" in cmp:
+            ref = str(cmp["s_eq"]).lower()
+            matches |= column.get_strings() == ref
+        if "s_contains" in cmp:
+            ref = str(cmp["s_contains"]).lower()
+            matches |= np.char.find(column.get_strings(), ref) >= 0
+        if "s_ne" in cmp:
+            ref = str(cmp["s_ne"]).lower()
+            matches |= column.get_strings() != ref
+        for ftype, compare in [("eq", np.equal), ("ne", np.not_equal), ("gt", np.less), ("lt", np.greater)]:
+            if ftype in cmp:
+                ref = float(cmp[ftype])
+                failed |= ~column.is_number
+                with np.errstate(invalid="ignore"):
+                    matches |= compare(ref, column.numbers) & ~failed
+    except Exception:
+        failed[:] = True
+    for i in np.flatnonzero(failed):
+        logger.warning("Not able to apply table conditional formatting to '{}' ({})".format(column.values[i], cmp))
+    return matches
@@ -4,6 +4,7 @@
 
 from collections import defaultdict, OrderedDict
 import logging
+import numpy as np
 import re
 
 from multiqc.utils import config, report
@@ -40,6 +41,7 @@ class datatable(object):
             "153,153,153",
         ]
         shared_keys = defaultdict(lambda: dict())
+        self.columns = dict()
 
         # Go through each table section
         for idx, d in enumerate(data):
@@ -86,19 +88,16 @@ class datatable(object):
             for k, v in data[idx].items():
                 cdata[str(k)] = v
             data[idx] = cdata
-            for s_name in data[idx].keys():
-                for k in list(data[idx][s_name].keys()):
-                    data[idx][s_name][str(k)] = data[idx][s_name].pop(k)
+            for samp in data[idx].values():
+                if not all(type(k) is str for k in samp):
+                    for k in list(samp.keys()):
+                        samp[str(k)] = samp.pop(k)
 
             # Check that we have some data in each column
-            empties = list()
-            for k in keys:
-                n = 0
-                for samp in d.values():
-                    if k in samp:
-                        n += 1
-                if n == 0:
-                    empties.append(k)
+            filled = set()
+            for samp in d.values():
+                filled.update(samp.keys())
+            empties = [k for k in keys if k not in filled]
             for k in empties:
                 keys = [j for j in keys if j != k]
                 del headers[idx][k]
@@ -204,19 +203,14 @@ class datatable(object):
 
                 # Figure out the min / max if not supplied
                 if setdmax or setdmin:
-                    for s_name, samp in data[idx].items():
-                        try:
-                            val = float(samp[k])
-                            if callable(headers[idx][k]["modify"]):
-                                val = float(headers[idx][k]["modify"](val))
-                            if setdmax:
-                                headers[idx][k]["dmax"] = max(headers[idx][k]["dmax"], val)
-                            if setdmin:
-                                headers[idx][k]["dmin"] = min(headers[idx][k]["dmin"], val)
-                        except (ValueError, TypeError):
-                            val = samp[k]  # couldn't convert to float - keep as a string
-                        except KeyError:
-                            pass  # missing data - skip
+                    column = datacolumn(data[idx], k, headers[idx][k]["modify"])
+                    self.columns[(idx, k)] = column
+                    numbers = column.numbers[column.is_number & ~np.isnan(column.numbers)]
+                    if len(numbers) > 0:
+                        if setdmax:
+                            headers[idx][k]["dmax"] = max(headers[idx][k]["dmax"], float(numbers.max()))
+                        if setdmin:
+                            headers[idx][k]["dmin"] = min(headers[idx][k]["dmin"], float(numbers.min()))
                     # Limit auto-generated scales with floor, ceiling and minRange.
                     if headers[idx][k]["ceiling"] is not None and headers[idx][k]["max"] is None:
                         headers[idx][k]["dmax"] = min(headers[idx][k]["dmax"], float(headers[idx][k]["ceiling"]))
@@ -282,3 +276,50 @@ class datatable(object):
             for idx, k in self.headers_in_order[bucket]:
                 res.append((idx, k, self.headers[idx][k]))
         return res
+
+    def get_column(self, idx, k):
+        """Gets values of a column as a datacolumn, made once for every column"""
+        if (idx, k) not in self.columns:
+            self.columns[(idx, k)] = datacolumn(self.data[idx], k, self.headers[idx][k]["modify"])
+        return self.columns[(idx, k)]
+
+
+class datacolumn(object):
+    """Values of one table column for the samples which have it, in the order of the data.
+    Holds values after modify() and their float conversions, so the table can work column by column."""
+
+    __slots__ = ("s_names", "raw", "values", "numbers", "is_number", "numeric", "strings")
+
+    def __init__(self, data, k, modify=None):
+        self.s_names = [s_name for s_name, samp in data.items() if k in samp]
+        self.raw = [data[s_name][k] for s_name in self.s_names]
+        if callable(modify):
+            self.values = [modify(val) for val in self.raw]
+        else:
+            self.values = self.raw
+
+        # float() of every value, where it can be converted
+        try:
+            self.numbers = np.array(self.values, dtype=float)
+            self.is_number = np.ones(len(self.values), dtype=bool)
+        except (ValueError, TypeError):
+            self.numbers = np.full(len(self.values), np.nan)
+            self.is_number = np.zeros(len(self.values), dtype=bool)
+            for i, val in enumerate(self.values):
+                try:
+                    self.numbers[i] = float(val)
+                    self.is_number[i] = True
+                except (ValueError, TypeError):
+                    pass
+
+        # All values are numbers and not strings or booleans which happen to convert
+        self.numeric = all(
+            issubclass(t, (int, float, np.number)) and not issubclass(t, bool) for t in set(map(type, self.values))
+        )
+        self.strings = None
+
+    def get_strings(self):
+        """Gets values as an array of lowercase strings, for comparing with text"""
+        if self.strings is None:
+            self.strings = np.array([str(val).lower() for val in self.values], dtype=str)
+        return self.strings
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+""" LZ-string compression for the plot data embedded in reports.
+
+Output is identical to lzstring.LZString.compressToBase64, so it is read by
+LZString.decompressFromBase64 in the report JavaScript. The lzstring package
+writes the compressed stream bit by bit; here the codes are packed into
+six-bit characters with integer operations, which is several times faster
+for large plot data. """
+
+KEY_STR_BASE64 = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/="
+
+# Codes are written least significant bit first, while every Base64 character
+# holds the first written bit as its most significant one. Map the six bits as
+# they are packed here to the character with the bit order reversed.
+_BASE64_REVERSED = [KEY_STR_BASE64[int("{:06b}".format(i)[::-1], 2)] for i in range(64)]
+
+
+def compress_to_base64(uncompressed):
+    """Compress a string with LZ-string and encode the result as Base64"""
+    if uncompressed is None:
+        return ""
+
+    dictionary = {}
+    to_create = set()
+    dict_size = 3
+    num_bits = 2
+    enlarge_in = 2  # Compensate for the first entry which should not count
+
+    out = []
+    out_append = out.append
+    chars = _BASE64_REVERSED
+    bits = 0  # pending bits, the first written one is the least significant
+    bits_len = 0
+
+    w = ""
+    for c in uncompressed:
+        if c not in dictionary:
+            dictionary[c] = dict_size
+            dict_size += 1
+            to_create.add(c)
+
+        wc = w + c
+        if wc in dictionary:
+            w = wc
+            continue
+
+        # Output the code for w
+        if w in to_create:
+            value = ord(w)
+            if value < 256:
+                bits |= value << (bits_len + num_bits)
+                bits_len += num_bits + 8
+            else:
+                # lzstring writes only the low 16 bits of the character code
+                bits |= (1 | (value & 0xFFFF) << num_bits) << bits_len
+                bits_len += num_bits + 16
+            enlarge_in -= 1
+            if enlarge_in == 0:
+                enlarge_in = 1 << num_bits
+                num_bits += 1
+            to_create.remove(w)
+        else:
+            bits |= dictionary[w] << bits_len
+            bits_len += num_bits
+        while bits_len >= 6:
+            out_append(chars[bits & 63])
+            bits >>= 6
+            bits_len -= 6
+
+        enlarge_in -= 1
+        if enlarge_in == 0:
+            enlarge_in = 1 << num_bits
+            num_bits += 1
+
+        # Add wc to the dictionary
+        dictionary[wc] = dict_size
+        dict_size += 1
+        w = c
+
+    # Output the code for the last w
+    if w != "":
+        if w in to_create:
+            value = ord(w)
+            if value < 256:
+                bits |= value << (bits_len + num_bits)
+                bits_len += num_bits + 8
+            else:
+                bits |= (1 | (value & 0xFFFF) << num_bits) << bits_len
+                bits_len += num_bits + 16
+            enlarge_in -= 1
+            if enlarge_in == 0:
+                enlarge_in = 1 << num_bits
+                num_bits += 1
+        else:
+            bits |= dictionary[w] << bits_len
+            bits_len += num_bits
+    enlarge_in -= 1
+    if enlarge_in == 0:
+        num_bits += 1
+
+    # Mark the end of the stream and flush the last character
+    bits |= 2 << bits_len
+    bits_len += num_bits + 6 - (bits_len + num_bits) % 6
+    while bits_len > 0:
+        out_append(chars[bits & 63])
+        bits >>= 6
+        bits_len -= 6
+
+    # To produce valid Base64
+    end = len(out) % 4
+    if end > 0:
+        out_append("=" * (4 - end))
+    return "".join(out)
@@ -0,0 +1,368 @@
+#!/usr/bin/env python
+
+""" MultiQC JupyterLab extension catalog. Keeps modules, samples and their source files
+from every data_sources/data_source_N.json in a single SQLite database in jupyterlab_data,
+so they can be listed and searched without reading all of the data source files.
+General Statistics of every load are stored there as well, one row per sample and column. """
+
+import json
+import os
+import sqlite3
+from collections import OrderedDict
+
+from multiqc.utils import config, jupyterlab_data
+from multiqc.utils.util_functions import MQCJSONEncoder
+
+logger = config.logger
+
+CATALOG_FN = "catalog.sqlite"
+
+# user_version of a catalog once its tables are filled, so readers can tell it from one a writer is still creating
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+BEGIN;
+CREATE TABLE IF NOT EXISTS data_source_files (file TEXT PRIMARY KEY, mtime REAL, size INTEGER);
+CREATE TABLE IF NOT EXISTS modules (seq INTEGER PRIMARY KEY, data_source TEXT, module TEXT);
+CREATE TABLE IF NOT EXISTS samples (seq INTEGER PRIMARY KEY, data_source TEXT, module TEXT, module_key TEXT,
+                                    section TEXT, sample TEXT, source TEXT);
+CREATE INDEX IF NOT EXISTS samples_module ON samples (module_key, sample);
+CREATE INDEX IF NOT EXISTS samples_sample ON samples (sample);
+CREATE TABLE IF NOT EXISTS general_stats_columns (seq INTEGER PRIMARY KEY, namespace TEXT, column_key TEXT,
+                                                  header TEXT, UNIQUE (namespace, column_key));
+CREATE TABLE IF NOT EXISTS general_stats_samples (seq INTEGER PRIMARY KEY, sample TEXT UNIQUE);
+CREATE TABLE IF NOT EXISTS general_stats (column_key TEXT, namespace TEXT, sample TEXT, value,
+                                          PRIMARY KEY (column_key, namespace, sample)) WITHOUT ROWID;
+COMMIT;
+"""
+
+
+def connect(jupyterlab_dir):
+    """
+    Opens the catalog. It is kept up to date by update_catalog() whenever data sources are written,
+    so it is created here only if there is none yet, e.g. in jupyterlab_data of an older version.
+
+    Parameters:
+    jupyterlab_dir: path to jupyterlab_data directory
+
+    Returns:
+    sqlite3 connection
+
+    """
+    # other kernels can be writing to the catalog at the same time, wait for them longer than by default
+    connection = sqlite3.connect(os.path.join(jupyterlab_dir, CATALOG_FN), timeout=60)
+    if connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        connection.close()
+        update_catalog(jupyterlab_dir)
+        connection = sqlite3.connect(os.path.join(jupyterlab_dir, CATALOG_FN), timeout=60)
+    return connection
+
+
+def update(connection, data_sources_dir):
+    """
+    Adds data source files which are new or changed since they were cataloged, and removes deleted ones.
+    Only those files are read, so it is fast also with many data source files. Has to be called holding the lock.
+
+    Parameters:
+    connection: sqlite3 connection to the catalog
+    data_sources_dir: path to data_sources directory in jupyterlab_data
+
+    """
+    cataloged = {fn: (mtime, size) for fn, mtime, size in connection.execute("SELECT * FROM data_source_files")}
+    present = dict()
+    if os.path.exists(data_sources_dir):
+        for fn in os.listdir(data_sources_dir):
+            if fn.endswith(".json"):
+                stat = os.stat(os.path.join(data_sources_dir, fn))
+                present[fn] = (stat.st_mtime, stat.st_size)
+
+    outdated = [fn for fn in cataloged if present.get(fn) != cataloged[fn]]
+    new = sorted([fn for fn in present if present[fn] != cataloged.get(fn)], key=jupyterlab_data.data_file_number)
+    if not outdated and not new:
+        return
+
+    with connection:
+        for fn in outdated:
+            connection.execute("DELETE FROM data_source_files WHERE file = ?", (fn,))
+            connection.execute("DELETE FROM modules WHERE data_source = ?", (fn,))
+            connection.execute("DELETE FROM samples WHERE data_source = ?", (fn,))
+        for fn in new:
+            with open(os.path.join(data_sources_dir, fn), "r") as data_source_file:
+                data_sources = json.load(data_source_file)
+            connection.executemany(
+                "INSERT INTO modules (data_source, module) VALUES (?, ?)", [(fn, m) for m in data_sources]
+            )
+            connection.executemany(
+                "INSERT INTO samples (data_source, module, module_key, section, sample, source) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (fn, m, m.lower(), s, sample, source)
+                    for m in data_sources
+                    for s in data_sources[m]
+                    for sample, source in data_sources[m][s].items()
+                ],
+            )
+            connection.execute("INSERT INTO data_source_files VALUES (?, ?, ?)", (fn,) + present[fn])
+
+
+def update_catalog(jupyterlab_dir):
+    """
+    Creates the catalog if needed and brings it up to date after data sources were written by load() or add().
+    Kernels update it one at a time, so each data source file is cataloged once.
+
+    Parameters:
+    jupyterlab_dir: path to jupyterlab_data directory
+
+    """
+    with jupyterlab_data.locked(jupyterlab_dir):
+        connection = sqlite3.connect(os.path.join(jupyterlab_dir, CATALOG_FN), timeout=60)
+        try:
+            created = connection.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+            if not created:
+                connection.executescript(SCHEMA)
+            update(connection, os.path.join(jupyterlab_dir, "data_sources"))
+            if not created:
+                connection.execute("PRAGMA user_version = {}".format(SCHEMA_VERSION))
+        finally:
+            connection.close()
+
+
+def get_modules(jupyterlab_dir):
+    """
+    Lists modules in the order they were loaded.
+
+    Parameters:
+    jupyterlab_dir: path to jupyterlab_data directory
+
+    Returns:
+    list of modules without duplicates
+
+    """
+    connection = connect(jupyterlab_dir)
+    try:
+        return [m for m, in connection.execute("SELECT module FROM modules GROUP BY module ORDER BY MIN(seq)")]
+    finally:
+        connection.close()
+
+
+def get_samples(jupyterlab_dir, module, pattern=None):
+    """
+    Lists samples of a module in the order they were loaded.
+
+    Parameters:
+    jupyterlab_dir: path to jupyterlab_data directory
+    module: module name, case insensitive
+    pattern: glob pattern (e.g. 'SRR92176*') for sample names, or a prefix if it has no wildcards
+
+    Returns:
+    list of samples without duplicates
+
+    """
+    query = "SELECT sample FROM samples WHERE module_key = ?"
+    args = [module.lower()]
+    if pattern is not None:
+        query += " AND sample GLOB ?"
+        args.append(glob_pattern(pattern))
+    connection = connect(jupyterlab_dir)
+    try:
+        return [s for s, in connection.execute(query + " GROUP BY sample ORDER BY MIN(seq)", args)]
+    finally:
+        connection.close()
+
+
+def find_samples(jupyterlab_dir, pattern, module=None):
+    """
+    Searches samples of all modules, or of a given module, by name.
+
+    Parameters:
+    jupyterlab_dir: path to jupyterlab_data directory
+    pattern: glob pattern (e.g. 'SRR92176*') for sample names, or a prefix if it has no wildcards
+    module: module name, case insensitive
+
+    Returns:
+    list of (module, sample) tuples without duplicates, in the order they were loaded
+
+    """
+    query = "SELECT module, sample FROM samples WHERE sample GLOB ?"
+    args = [glob_pattern(pattern)]
+    if module is not None:
+        query += " AND module_key = ?"
+        args.append(module.lower())
+    connection = connect(jupyterlab_dir)
+    try:
+        return list(connection.execute(query + " GROUP BY module, sample ORDER BY MIN(seq)", args))
+    finally:
+        connection.close()
+
+
+def get_sources(jupyterlab_dir, sample, module=None):
+    """
+    Finds source files of a sample.
+
+    Parameters:
+    jupyterlab_dir: path to jupyterlab_data directory
+    sample: sample name
+    module: module name, case insensitive
+
+    Returns:
+    list of (module, section, source path) tuples, in the order they were loaded
+
+    """
+    query = "SELECT module, section, source FROM samples WHERE sample = ?"
+    args = [sample]
+    if module is not None:
+        query += " AND module_key = ?"
+        args.append(module.lower())
+    connection = connect(jupyterlab_dir)
+    try:
+        return list(connection.execute(query + " ORDER BY seq", args))
+    finally:
+        connection.close()
+
+
+def glob_pattern(pattern):
+    """
+    Makes a SQLite GLOB pattern, searching by prefix if the pattern has no wildcards.
+
+    Parameters:
+    pattern: glob pattern or prefix
+
+    Returns:
+    GLOB pattern
+
+    """
+    if not any(c in pattern for c in "*?["):
+        return pattern + "*"
+    return pattern
+
+
+def add_general_stats(jupyterlab_dir, general_stats_data, general_stats_headers, overwrite=False):
+    """
+    Stores General Statistics of a load. Values of samples stored before are replaced by the new ones.
+
+    Parameters:
+    jupyterlab_dir: path to jupyterlab_data directory
+    general_stats_data: list of dictionaries with sample names as keys and dictionaries with values for every column
+    general_stats_headers: list of dictionaries with configuration for every column, without callable 'modify'
+    overwrite: True if General Statistics stored before should be removed
+
+    """
+    columns = list()
+    values = list()
+    samples = list()
+    for data, headers in zip(general_stats_data, general_stats_headers):
+        for k, header in headers.items():
+            namespace = header.get("namespace", "")
+            columns.append((namespace, str(k), json.dumps(header, cls=MQCJSONEncoder)))
+            for s_name, samp in data.items():
+                value = samp.get(k)
+                if isinstance(value, (int, float, str)):  # only plain values make a table cell
+                    values.append((str(k), namespace, str(s_name), value))
+        samples.extend(str(s_name) for s_name in data)
+
+    with jupyterlab_data.locked(jupyterlab_dir):
+        connection = connect(jupyterlab_dir)
+        try:
+            with connection:
+                if overwrite:
+                    for table in ["general_stats_columns", "general_stats_samples", "general_stats"]:
+                        connection.execute("DELETE FROM {}".format(table))
+                # keep the position of known columns, but use their latest configuration
+                connection.executemany(
+                    "INSERT OR IGNORE INTO general_stats_columns (namespace, column_key, header) VALUES (?, ?, ?)",
+                    columns,
+                )
+                connection.executemany(
+                    "UPDATE general_stats_columns SET header = ? WHERE namespace = ? AND column_key = ?",
+                    [(header, namespace, k) for namespace, k, header in columns],
+                )
+                connection.executemany(
+                    "INSERT OR IGNORE INTO general_stats_samples (sample) VALUES (?)", [(s_name,) for s_name in samples]
+                )
+                connection.executemany("INSERT OR REPLACE INTO general_stats VALUES (?, ?, ?, ?)", values)
+        finally:
+            connection.close()
+
+
+def get_general_stats_columns(jupyterlab_dir):
+    """
+    Lists stored General Statistics columns.
+
+    Parameters:
+    jupyterlab_dir: path to jupyterlab_data directory
+
+    Returns:
+    list of (namespace, column, title) tuples, in the order they were stored
+
+    """
+    connection = connect(jupyterlab_dir)
+    try:
+        return [
+            (namespace, k, json.loads(header).get("title", k))
+            for namespace, k, header in connection.execute(
+                "SELECT namespace, column_key, header FROM general_stats_columns ORDER BY seq"
+            )
+        ]
+    finally:
+        connection.close()
+
+
+def get_general_stats(jupyterlab_dir, samples=None, columns=None):
+    """
+    Reads General Statistics, only for the requested samples and columns.
+
+    Parameters:
+    jupyterlab_dir: path to jupyterlab_data directory
+    samples: list of sample names, all samples if None
+    columns: list of column keys (e.g. 'percent_gc'), optionally with namespace (e.g. 'FastQC.percent_gc'),
+             all columns if None
+
+    Returns:
+    list of dictionaries with sample names as keys and dictionaries with values for every column,
+    and list of dictionaries with configuration for every column, one of each for every namespace
+
+    """
+    connection = connect(jupyterlab_dir)
+    try:
+        stored_columns = list(
+            connection.execute("SELECT namespace, column_key, header FROM general_stats_columns ORDER BY seq")
+        )
+        if columns is not None:
+            wanted = set(columns)
+            stored_columns = [c for c in stored_columns if c[1] in wanted or "{}.{}".format(c[0], c[1]) in wanted]
+
+        connection.execute("CREATE TEMP TABLE IF NOT EXISTS wanted_samples (sample TEXT PRIMARY KEY)")
+        connection.execute("DELETE FROM wanted_samples")
+        if samples is not None:
+            connection.executemany("INSERT OR IGNORE INTO wanted_samples VALUES (?)", [(s,) for s in samples])
+        samples_query = "SELECT sample, seq FROM general_stats_samples"
+        if samples is not None:
+            samples_query += " WHERE sample IN (SELECT sample FROM wanted_samples)"
+        order = dict(connection.execute(samples_query))
+
+        data = OrderedDict()
+        headers = OrderedDict()
+        for namespace, k, header in stored_columns:
+            # the primary key keeps values of a column together, so only the requested columns are read
+            values_query = "SELECT sample, value FROM general_stats WHERE column_key = ? AND namespace = ?"
+            if samples is not None:
+                values_query += " AND sample IN (SELECT sample FROM wanted_samples)"
+            ns_data = data.setdefault(namespace, dict())
+            for s_name, value in connection.execute(values_query, (k, namespace)):
+                ns_data.setdefault(s_name, dict())[k] = value
+            headers.setdefault(namespace, OrderedDict())[k] = json.loads(header)
+    finally:
+        connection.close()
+
+    general_stats_data = list()
+    general_stats_headers = list()
+    for namespace, ns_data in data.items():
+        if not ns_data:
+            continue
+        general_stats_data.append(
+            OrderedDict(
+                (s_name, ns_data[s_name]) for s_name in sorted(ns_data, key=lambda s_name: order.get(s_name, 0))
+            )
+        )
+        general_stats_headers.append(headers[namespace])
+    return general_stats_data, general_stats_headers
@@ -0,0 +1,1110 @@
+#!/usr/bin/env python
+
+""" MultiQC JupyterLab extension storage helpers. Writes plot data for every module
+to jupyterlab_data/<module>/plot_data and keeps an index of samples and plots,
+so only the records needed for the given samples have to be read and decoded. """
+
+import contextlib
+import hashlib
+import json
+import numpy as np
+import os
+import re
+import shutil
+import threading
+
+from multiqc.utils import config
+from multiqc.utils.util_functions import MQCJSONEncoder
+
+try:
+    import fcntl
+except ImportError:  # no advisory locks (e.g. on Windows), writes are still atomic
+    fcntl = None
+
+logger = config.logger
+
+INDEX_FN = "plot_index.json"
+MODULE_OUTPUT_FN = "module_output.jsonl"
+MODULE_HTML_FN = "module_output.html"
+OLD_MODULE_OUTPUT_FN = "module_output.json"
+MANIFEST_FN = "load_manifest.json"
+LOCK_FN = ".lock"
+
+# the lock is held by a process once, also when functions writing under it call each other,
+# and by one thread at a time
+lock_state = {"depth": 0, "file": None}
+thread_lock = threading.RLock()
+
+# integers stored as float64 in .npy series files up to this value are exact
+SERIES_MAX_INT = 2**53
+
+# tables are saved as data and marked in the module output, so they can be built again for the samples to show
+TABLE_BLOCK_RE = re.compile(r"<!--mqc_table_data:([^<>]+?)-->.*?<!--/mqc_table_data-->", re.S)
+TABLE_PLACEHOLDER_RE = re.compile(r"<!--mqc_table_data:([^<>]+?)-->")
+
+# characters of JSON numbers and brackets, as followed by JSONObjectStream
+JSON_NUMBER_CHARS = "0123456789.eE+-"
+JSON_OPENING_CHARS = [ord("{"), ord("[")]
+JSON_CLOSING_CHARS = [ord("}"), ord("]")]
+
+
+def plot_samples(content):
+    """
+    Lists names of samples in a single plot, as they are compared with samples to show in combine_output.
+
+    Parameters:
+    content: plot data for a single plot
+
+    Returns:
+    set of sample names
+
+    """
+    samples = set()
+    plot_type = content.get("plot_type")
+    if plot_type in ["bar_graph", "beeswarm"]:
+        for dataset_samples in content.get("samples", []):
+            samples.update(sample.split(" ")[0] for sample in dataset_samples)
+    elif plot_type in ["scatter", "xy_line"]:
+        for dataset in content.get("datasets", []):
+            samples.update(el["name"].split(" ")[0] for el in dataset if "name" in el)
+    elif plot_type == "heatmap":  # samples can be rows, columns or both, e.g. in relatedness matrices
+        samples.update(str(sample) for sample in content.get("ycats", []))
+        samples.update(str(sample) for sample in content.get("xcats", []))
+    elif plot_type == "table":
+        for dataset in content.get("datasets", []):
+            samples.update(dataset.keys())
+    return samples
+
+
+def new_index():
+    """
+    Creates an empty index.
+
+    Returns:
+    dictionary with data files in the order of writing, plot offsets for every file and plots for every sample
+
+    """
+    return {"files": [], "plots": {}, "samples": {}}
+
+
+def drop_samples(content, samples):
+    """
+    Removes samples from a single plot, e.g. when they were replaced by data loaded later.
+
+    Parameters:
+    content: plot data for a single plot, modified in place
+    samples: set of sample names to remove
+
+    Returns:
+    plot data without the given samples
+
+    """
+    plot_type = content.get("plot_type")
+    if plot_type in ["bar_graph", "beeswarm"]:
+        for i, dataset_samples in enumerate(content["samples"]):
+            keep = [idx for idx, sample in enumerate(dataset_samples) if sample.split(" ")[0] not in samples]
+            content["samples"][i] = [dataset_samples[idx] for idx in keep]
+            if plot_type == "beeswarm":  # beeswarm datasets are lists of values for every category
+                content["datasets"][i] = [content["datasets"][i][idx] for idx in keep]
+            else:
+                for element in content["datasets"][i]:
+                    element["data"] = [element["data"][idx] for idx in keep]
+    elif plot_type in ["scatter", "xy_line"]:
+        content["datasets"] = [
+            [el for el in dataset if el.get("name", "").split(" ")[0] not in samples] for dataset in content["datasets"]
+        ]
+    elif plot_type == "heatmap":
+        # remove rows and columns of the samples and move the ones after them
+        keep = lambda category: category not in samples
+        xcats, ycats = [], []
+        columns = heatmap_positions(content["xcats"], keep, xcats, dict())
+        rows = heatmap_positions(content["ycats"], keep, ycats, dict())
+        content["xcats"] = xcats
+        content["ycats"] = ycats
+        content["data"] = [
+            [columns[x], rows[y], value] for x, y, value in content["data"] if y in rows and x in columns
+        ]
+    elif plot_type == "table":
+        content["datasets"] = [
+            {s_name: samp for s_name, samp in dataset.items() if s_name not in samples}
+            for dataset in content["datasets"]
+        ]
+    return content
+
+
+def heatmap_positions(categories, keep, merged_categories, positions):
+    """
+    Maps positions of heatmap categories (xcats or ycats) to their positions in another heatmap,
+    adding the kept categories which are not there yet.
+
+    Parameters:
+    categories: categories of the heatmap
+    keep: function telling if a category, as a string, should be kept, or None to keep all of them
+    merged_categories: categories of the other heatmap, extended in place
+    positions: dictionary with categories of the other heatmap, as strings, and their positions, updated in place
+
+    Returns:
+    dictionary with positions of the kept categories in the heatmap as keys and their positions in the other heatmap
+
+    """
+    index_map = dict()
+    for i, category in enumerate(categories):
+        name = str(category)
+        if name not in positions:
+            if keep is not None and not keep(name):
+                continue
+            positions[name] = len(merged_categories)
+            merged_categories.append(category)
+        index_map[i] = positions[name]
+    return index_map
+
+
+def apply_modify(data, headers):
+    """
+    Applies 'modify' functions from the table headers to the data, so both can be pickled or saved as JSON.
+    The functions are replaced by False, so tables built from the data don't apply the default ones again.
+
+    Parameters:
+    data: dictionary with sample names as keys and dictionaries with values for every column
+    headers: dictionary with configuration for every column
+
+    Returns:
+    data and headers without any callable values
+
+    """
+    modify = {k: h["modify"] for k, h in headers.items() if callable(h.get("modify"))}
+    if not modify:
+        return data, headers
+
+    new_data = dict()
+    for s_name, samp in data.items():
+        new_data[s_name] = dict(samp)
+        for k, func in modify.items():
+            if k in samp:
+                try:
+                    new_data[s_name][k] = func(samp[k])
+                except (TypeError, ValueError):
+                    pass  # keep the raw value, as tables would fail to modify it as well
+    new_headers = type(headers)()
+    for k, h in headers.items():
+        new_headers[k] = {hk: (False if hk == "modify" and callable(hv) else hv) for hk, hv in h.items()}
+
+    return new_data, new_headers
+
+
+def mark_table(table_key, html):
+    """
+    Marks HTML of a table saved as data, so it can be replaced in the module output.
+
+    Parameters:
+    table_key: plot id of the table data
+    html: HTML of the table
+
+    Returns:
+    marked HTML
+
+    """
+    return "<!--mqc_table_data:{}-->{}<!--/mqc_table_data-->".format(table_key, html)
+
+
+def strip_tables(html):
+    """
+    Replaces marked tables with placeholders, as they are built again in combine_output for the samples to show.
+
+    Parameters:
+    html: HTML of a section
+
+    Returns:
+    HTML with placeholders instead of tables
+
+    """
+    if not html or "<!--mqc_table_data:" not in html:
+        return html
+    return TABLE_BLOCK_RE.sub(r"<!--mqc_table_data:\1-->", html)
+
+
+def insert_tables(html, tables):
+    """
+    Fills placeholders left by strip_tables().
+
+    Parameters:
+    html: HTML of a section
+    tables: dictionary with plot ids of tables as keys and their HTML
+
+    Returns:
+    HTML with tables, placeholders of tables without data are removed
+
+    """
+    if not html or "<!--mqc_table_data:" not in html:
+        return html
+    return TABLE_PLACEHOLDER_RE.sub(lambda m: tables.get(m.group(1), ""), html)
+
+
+def add_to_index(index, plot_data_fn, plot_offsets, plot_data, replace_samples=False):
+    """
+    Adds a single data file to the index.
+
+    Parameters:
+    index: index to update
+    plot_data_fn: name of the data file in plot_data directory
+    plot_offsets: dictionary with plot ids as keys and [offset, length] of the JSON value in the file
+    plot_data: dictionary with the plot data written to the file
+    replace_samples: True if samples in this file replace the same samples in files indexed before,
+        only in the plots which are in this file, as index['superseded'][file][plot]
+
+    """
+    if plot_data_fn in index["plots"]:
+        return
+    index["files"].append(plot_data_fn)
+    index["plots"][plot_data_fn] = dict()
+    for plot, content in plot_data.items():
+        offset, length = plot_offsets[plot]
+        index["plots"][plot_data_fn][plot] = [offset, length, content.get("plot_type")]
+        for sample in plot_samples(content):
+            sample_files = index["samples"].setdefault(sample, dict())
+            if replace_samples:
+                # other plots of the sample, e.g. from files which were not loaded again, are kept
+                for fn, fn_plots in sample_files.items():
+                    if fn != plot_data_fn and plot in fn_plots:
+                        superseded = index.setdefault("superseded", dict()).setdefault(fn, dict()).setdefault(plot, [])
+                        if sample not in superseded:
+                            superseded.append(sample)
+            sample_files.setdefault(plot_data_fn, []).append(plot)
+
+
+def dump_plot_data(plot_data, f):
+    """
+    Writes plot data to a binary file as a single JSON object, remembering where every plot starts.
+    Output is the same as json.dump(plot_data, f, cls=MQCJSONEncoder) would write.
+
+    Parameters:
+    plot_data: dictionary with plot ids as keys
+    f: file opened in binary mode
+
+    Returns:
+    dictionary with plot ids as keys and [offset, length] of the plot's JSON value in the file
+
+    """
+    plot_offsets = dict()
+    position = f.write(b"{")
+    for i, (plot, content) in enumerate(plot_data.items()):
+        key = "{}{}: ".format(", " if i > 0 else "", json.dumps(plot)).encode("utf-8")
+        value = json.dumps(content, cls=MQCJSONEncoder).encode("utf-8")
+        position += f.write(key)
+        plot_offsets[plot] = [position, len(value)]
+        position += f.write(value)
+    f.write(b"}")
+    return plot_offsets
+
+
+def scan_plot_data(plot_data_path):
+    """
+    Reads a whole data file written without offsets (e.g. by an older version) and finds offsets of its plots.
+
+    Parameters:
+    plot_data_path: path to the data file
+
+    Returns:
+    plot data and dictionary with plot ids as keys and [offset, length] of the plot's JSON value in the file
+
+    """
+    with open(plot_data_path, "rb") as f:
+        raw = f.read()
+    text = raw.decode("utf-8")
+    decoder = json.JSONDecoder()
+    plot_data = dict()
+    plot_offsets = dict()
+
+    # walk through the top level object, decoding keys and values one after another
+    idx = text.index("{") + 1
+    last_idx, last_offset = 0, 0
+    while True:
+        while text[idx] in " \t\n\r,":
+            idx += 1
+        if text[idx] == "}":
+            break
+        plot, idx = decoder.raw_decode(text, idx)
+        idx = text.index(":", idx) + 1
+        while text[idx] in " \t\n\r":
+            idx += 1
+        content, end = decoder.raw_decode(text, idx)
+        # offsets are in bytes, which differ from string indices for non-ASCII files
+        offset = last_offset + len(text[last_idx:idx].encode("utf-8"))
+        length = len(text[idx:end].encode("utf-8"))
+        plot_offsets[plot] = [offset, length]
+        plot_data[plot] = content
+        idx = last_idx = end
+        last_offset = offset + length
+
+    return plot_data, plot_offsets
+
+
+class JSONObjectStream(object):
+    """
+    Reads a JSON object from a file member by member, so only a single value has to be kept in memory.
+    After every key from keys(), its value has to be read with decode(), skip() or keys() of a nested object.
+
+    """
+
+    def __init__(self, f, chunk_size=1 << 20):
+        """
+        Parameters:
+        f: file opened in text mode
+        chunk_size: number of characters to read at once
+
+        """
+        self.f = f
+        self.chunk_size = chunk_size
+        self.text = ""
+        self.idx = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def read(self, size):
+        """
+        Appends the next part of the file to the buffer, dropping everything decoded before.
+
+        Parameters:
+        size: number of characters to read
+
+        Returns:
+        False at the end of the file
+
+        """
+        chunk = self.f.read(size)
+        self.text = self.text[self.idx :] + chunk
+        self.idx = 0
+        self.eof = not chunk
+        return not self.eof
+
+    def next_char(self):
+        """
+        Skips whitespace.
+
+        Returns:
+        the next character or None at the end of the file
+
+        """
+        while True:
+            while self.idx < len(self.text) and self.text[self.idx] in " \t\n\r":
+                self.idx += 1
+            if self.idx < len(self.text):
+                return self.text[self.idx]
+            if not self.read(self.chunk_size):
+                return None
+
+    def expect(self, chars):
+        """
+        Reads the next character, which has to be one of the given characters.
+
+        Parameters:
+        chars: allowed characters
+
+        Returns:
+        the character
+
+        """
+        char = self.next_char()
+        if char is None or char not in chars:
+            raise ValueError('Expecting one of "{}" in JSON file, found "{}"'.format(chars, char))
+        self.idx += 1
+        return char
+
+    def decode(self):
+        """
+        Decodes the next value, reading the file until the value is complete.
+
+        Returns:
+        decoded value
+
+        """
+        self.next_char()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.text, self.idx)
+                # a number can continue in the next part of the file, also after '.' or 'e' (e.g. '-2.' of '-2.5')
+                if self.eof or (end < len(self.text) and self.text[end] not in JSON_NUMBER_CHARS):
+                    self.idx = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            # read as much as is buffered, so large values are decoded only a few times
+            self.read(max(self.chunk_size, len(self.text) - self.idx))
+
+    def skip(self):
+        """
+        Moves past the next value without decoding it, following strings and brackets a part of the file at a time,
+        so a large value is never kept in memory as a whole.
+
+        """
+        if self.next_char() not in ["{", "[", '"']:  # numbers, true, false and null are short
+            self.decode()
+            return
+        depth = 0
+        quotes = 0
+        while True:
+            # backslashes at the end are kept with the character they escape, for the next part of the file
+            text = self.text[self.idx :].rstrip("\\")
+            # escapes are replaced by characters of the same length, so positions of quotes and brackets are kept,
+            # characters which aren't Latin-1 (never quotes or brackets) become '?'
+            text = text.replace("\\\\", "__").replace('\\"', "__").encode("latin-1", "replace")
+            chars = np.frombuffer(text, dtype=np.uint8)
+            # odd number of quotes inside strings, depth of brackets outside of them
+            chars_quotes = np.cumsum(chars == ord('"'), dtype=np.int32) + quotes
+            outside = chars_quotes % 2 == 0
+            steps = np.isin(chars, JSON_OPENING_CHARS).astype(np.int32) - np.isin(chars, JSON_CLOSING_CHARS)
+            chars_depth = np.cumsum(steps * outside, dtype=np.int32) + depth
+            ends = np.flatnonzero((chars_depth == 0) & outside)
+            if len(ends) > 0:
+                self.idx += int(ends[0]) + 1
+                return
+            if len(chars) > 0:
+                quotes = int(chars_quotes[-1]) % 2
+                depth = int(chars_depth[-1])
+            self.idx += len(chars)
+            if not self.read(self.chunk_size):
+                raise ValueError("Unexpected end of JSON file")
+
+    def keys(self):
+        """
+        Iterates through keys of the object starting at the current position.
+
+        Returns:
+        generator of keys
+
+        """
+        self.expect("{")
+        if self.next_char() == "}":
+            self.idx += 1
+            return
+        while True:
+            key = self.decode()
+            self.expect(":")
+            yield key
+            if self.expect(",}") == "}":
+                return
+
+
+def read_index(module_dir):
+    """
+    Reads the index of a module directory and adds any data files that are not indexed yet.
+
+    Parameters:
+    module_dir: path to the module directory in jupyterlab_data
+
+    Returns:
+    index dictionary
+
+    """
+    index_path = os.path.join(module_dir, INDEX_FN)
+    plot_data_dir = os.path.join(module_dir, "plot_data")
+
+    def load_index():
+        if os.path.exists(index_path):
+            with open(index_path, "r") as index_file:
+                return json.load(index_file)
+        return new_index()
+
+    def not_indexed(index):
+        if not os.path.exists(plot_data_dir):
+            return []
+        return [fn for fn in os.listdir(plot_data_dir) if fn.endswith(".json") and fn not in index["plots"]]
+
+    index = load_index()
+    # index data files written before the index existed, once another kernel finished writing
+    if not_indexed(index):
+        with locked(os.path.dirname(module_dir)):
+            index = load_index()
+            fns = not_indexed(index)
+            if fns:
+                for fn in sorted(fns, key=data_file_number):
+                    plot_data, plot_offsets = scan_plot_data(os.path.join(plot_data_dir, fn))
+                    add_to_index(index, fn, plot_offsets, plot_data)
+                write_index(module_dir, index)
+
+    return index
+
+
+def write_index(module_dir, index):
+    """
+    Saves the index in the module directory.
+
+    Parameters:
+    module_dir: path to the module directory in jupyterlab_data
+    index: index dictionary
+
+    """
+    with atomic_write(os.path.join(module_dir, INDEX_FN)) as index_file:
+        json.dump(index, index_file)
+
+
+@contextlib.contextmanager
+def locked(jupyterlab_dir):
+    """
+    Holds an exclusive advisory lock of jupyterlab_data, so kernels loading data to the same directory
+    (and threads of a kernel) write one at a time. Reading doesn't need the lock, as every file is replaced atomically.
+
+    Parameters:
+    jupyterlab_dir: path to jupyterlab_data directory
+
+    """
+    with thread_lock:
+        if lock_state["depth"] == 0:
+            if not os.path.exists(jupyterlab_dir):
+                os.makedirs(jupyterlab_dir)
+            lock_file = open(os.path.join(jupyterlab_dir, LOCK_FN), "a")
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            lock_state["file"] = lock_file
+        lock_state["depth"] += 1
+        try:
+            yield
+        finally:
+            lock_state["depth"] -= 1
+            if lock_state["depth"] == 0:
+                if fcntl is not None:
+                    fcntl.flock(lock_state["file"], fcntl.LOCK_UN)
+                lock_state["file"].close()
+                lock_state["file"] = None
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode="w"):
+    """
+    Opens a temporary file next to the given path, which replaces the path only when everything was written,
+    so a crash never leaves a truncated file and readers see either the previous or the new content.
+
+    Parameters:
+    path: path of the file to write
+    mode: 'w' for text or 'wb' for binary files
+
+    Returns:
+    file object
+
+    """
+    fd = None
+    while fd is None:
+        tmp_path = os.path.join(
+            os.path.dirname(path) or ".", ".{}.{}.tmp".format(os.path.basename(path), os.urandom(6).hex())
+        )
+        try:
+            # the umask applies to the mode, so the file gets the same permissions as other new files
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o666)
+        except FileExistsError:
+            pass
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_module_outputs(module_dir, module_outputs, overwrite=False):
+    """
+    Appends module outputs to the module directory, skipping outputs with anchors saved before.
+    Every output is a single line of module_output.jsonl, while HTML of its sections is appended
+    to module_output.html and the line keeps only [offset, length] of the HTML.
+
+    Parameters:
+    module_dir: path to the module directory in jupyterlab_data
+    module_outputs: list of module outputs, with sections, anchor, name, intro and optionally js and css
+    overwrite: True if outputs saved before should be removed
+
+    """
+    records_path = os.path.join(module_dir, MODULE_OUTPUT_FN)
+    html_path = os.path.join(module_dir, MODULE_HTML_FN)
+    with locked(os.path.dirname(module_dir)):
+        old_path = os.path.join(module_dir, OLD_MODULE_OUTPUT_FN)
+        if os.path.exists(old_path):
+            # convert outputs saved by an older version, unless they are overwritten
+            old_outputs = [] if overwrite else read_old_module_outputs(old_path)
+            os.remove(old_path)
+            if old_outputs:
+                write_module_outputs(module_dir, old_outputs)
+        if overwrite:
+            for path in [records_path, html_path]:
+                if os.path.exists(path):
+                    os.remove(path)
+
+        saved_anchors = {record["anchor"] for record in read_module_records(module_dir)}
+        new_outputs = [m for m in module_outputs if m["anchor"] not in saved_anchors]
+        if not new_outputs:
+            return
+
+        # HTML is written first, so records never refer to HTML that is missing after a crash
+        records = []
+        with open(html_path, "ab") as html_file:
+            offset = html_file.tell()
+            for module_output in new_outputs:
+                record = dict(module_output)
+                record["sections"] = []
+                for section in module_output["sections"]:
+                    section = dict(section)
+                    for key in ["plot", "content"]:
+                        if section.get(key):
+                            html = section[key].encode("utf-8")
+                            section[key] = {"html": [offset, len(html)]}
+                            offset += html_file.write(html)
+                    record["sections"].append(section)
+                records.append(json.dumps(record, cls=MQCJSONEncoder))
+            html_file.flush()
+            os.fsync(html_file.fileno())
+        # start on a new line if the last record was cut by a crash
+        separator = ""
+        if os.path.exists(records_path) and os.path.getsize(records_path) > 0:
+            with open(records_path, "rb") as records_file:
+                records_file.seek(-1, os.SEEK_END)
+                separator = "" if records_file.read(1) == b"\n" else "\n"
+        with open(records_path, "a") as records_file:
+            records_file.write(separator + "".join(record + "\n" for record in records))
+            records_file.flush()
+            os.fsync(records_file.fileno())
+
+
+def read_module_records(module_dir):
+    """
+    Reads module outputs without HTML of their sections.
+
+    Parameters:
+    module_dir: path to the module directory in jupyterlab_data
+
+    Returns:
+    list of module outputs, with [offset, length] of the HTML in module_output.html in place of section HTML
+
+    """
+    records_path = os.path.join(module_dir, MODULE_OUTPUT_FN)
+    if not os.path.exists(records_path):
+        return []
+    records = []
+    with open(records_path, "r") as records_file:
+        for line in records_file:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                logger.warning("Skipping incomplete module output in {}".format(records_path))
+    return records
+
+
+def read_module_outputs(module_dir, anchor=None):
+    """
+    Reads module outputs, with HTML only of the sections which are printed.
+
+    Parameters:
+    module_dir: path to the module directory in jupyterlab_data
+    anchor: anchor of the output to read, all outputs if None
+
+    Returns:
+    list of module outputs
+
+    """
+    old_path = os.path.join(module_dir, OLD_MODULE_OUTPUT_FN)
+    if not os.path.exists(os.path.join(module_dir, MODULE_OUTPUT_FN)) and os.path.exists(old_path):
+        outputs = read_old_module_outputs(old_path)
+        return [m for m in outputs if anchor is None or m["anchor"] == anchor]
+
+    outputs = [record for record in read_module_records(module_dir) if anchor is None or record["anchor"] == anchor]
+    if not outputs:
+        return outputs
+    with open(os.path.join(module_dir, MODULE_HTML_FN), "rb") as html_file:
+        for module_output in outputs:
+            for section in module_output["sections"]:
+                for key in ["plot", "content"]:
+                    if isinstance(section.get(key), dict):
+                        if section.get("print_section", True):
+                            offset, length = section[key]["html"]
+                            html_file.seek(offset)
+                            section[key] = html_file.read(length).decode("utf-8")
+                        else:
+                            section[key] = None
+    return outputs
+
+
+def read_old_module_outputs(old_path):
+    """
+    Reads module_output.json written by an older version, a single output or several outputs separated by commas.
+
+    Parameters:
+    old_path: path to module_output.json
+
+    Returns:
+    list of module outputs
+
+    """
+    with open(old_path, "r") as old_file:
+        text = old_file.read()
+    try:
+        outputs = json.loads(text)
+    except ValueError:
+        outputs = json.loads("[" + text + "]")
+    return outputs if type(outputs) is list else [outputs]
+
+
+def next_data_file(directory, base):
+    """
+    Chooses a name for a new data file, numbered one after the last one (e.g. data_3.json after data_2.json),
+    so numbers show the order of writing even if some files were removed. Has to be called holding the lock.
+
+    Parameters:
+    directory: directory of the data files
+    base: name of the data files without number and extension, e.g. 'data' or 'data_source'
+
+    Returns:
+    file name
+
+    """
+    numbers = [
+        data_file_number(fn)
+        for fn in os.listdir(directory)
+        if fn == base + ".json" or (fn.startswith(base + "_") and fn.endswith(".json"))
+    ]
+    if not numbers:
+        return base + ".json"
+    return "{}_{}.json".format(base, max(numbers) + 1)
+
+
+def write_data_source(data_sources_dir, data_sources, overwrite=False):
+    """
+    Writes data sources of a load to a new file in data_sources directory.
+
+    Parameters:
+    data_sources_dir: path to data_sources directory in jupyterlab_data
+    data_sources: dictionary with modules, sections and samples with their source files, as in report.data_sources
+    overwrite: True if data sources written before should be removed
+
+    Returns:
+    name of the written file
+
+    """
+    with locked(os.path.dirname(data_sources_dir)):
+        if overwrite and os.path.exists(data_sources_dir):
+            shutil.rmtree(data_sources_dir)
+        if not os.path.exists(data_sources_dir):
+            os.makedirs(data_sources_dir)
+        data_source_fn = next_data_file(data_sources_dir, "data_source")
+        with atomic_write(os.path.join(data_sources_dir, data_source_fn)) as data_source_file:
+            json.dump(data_sources, data_source_file, cls=MQCJSONEncoder)
+    return data_source_fn
+
+
+def data_file_number(plot_data_fn):
+    """
+    Gets the number of a data file, so data.json, data_1.json, data_2.json... can be sorted in the order of writing.
+
+    Parameters:
+    plot_data_fn: name of the data file
+
+    Returns:
+    number of the file, 0 for data.json
+
+    """
+    name = os.path.splitext(plot_data_fn)[0]
+    try:
+        return int(name.rsplit("_", 1)[1])
+    except (IndexError, ValueError):
+        return 0
+
+
+def write_plot_data(module_dir, plot_data, replace_samples=False):
+    """
+    Writes plot data to the first free data file in plot_data directory and adds it to the index.
+
+    Parameters:
+    module_dir: path to the module directory in jupyterlab_data
+    plot_data: dictionary with plot data for the module
+    replace_samples: True if samples in plot_data replace the same samples written before
+
+    Returns:
+    name of the written data file
+
+    """
+    plot_data_dir = os.path.join(module_dir, "plot_data")
+    with locked(os.path.dirname(module_dir)):
+        if not os.path.exists(plot_data_dir):
+            os.makedirs(plot_data_dir)
+        index = read_index(module_dir)
+
+        plot_data_fn = next_data_file(plot_data_dir, "data")
+        if config.jupyterlab_plot_data_format == "npy":
+            # numeric series are written first, so the JSON file never refers to a missing file
+            series_fn = os.path.splitext(plot_data_fn)[0] + ".npy"
+            plot_data, series = split_series(plot_data, series_fn)
+            if series is not None:
+                with atomic_write(os.path.join(plot_data_dir, series_fn), "wb") as series_file:
+                    np.save(series_file, series)
+        with atomic_write(os.path.join(plot_data_dir, plot_data_fn), "wb") as plot_data_file:
+            plot_offsets = dump_plot_data(plot_data, plot_data_file)
+
+        add_to_index(index, plot_data_fn, plot_offsets, plot_data, replace_samples)
+        write_index(module_dir, index)
+    return plot_data_fn
+
+
+def series_types(data):
+    """
+    Checks if line graph data is a numeric series, which can be saved in a .npy file.
+
+    Parameters:
+    data: data of a single line graph element
+
+    Returns:
+    types of x and y values, 'i' for integers and 'f' for floats (e.g. 'if'), or None if data isn't a numeric series
+
+    """
+    if type(data) is not list or len(data) == 0:
+        return None
+    if any(type(point) is not list or len(point) != 2 for point in data):
+        return None
+    types = ""
+    for values in zip(*data):
+        if all(type(v) is int and -SERIES_MAX_INT <= v <= SERIES_MAX_INT for v in values):
+            types += "i"
+        elif all(type(v) is float or type(v) is int for v in values):
+            types += "f"
+        else:
+            return None
+    return types
+
+
+def split_series(plot_data, series_fn):
+    """
+    Moves numeric [x, y] series of line graphs to a single array, leaving references to its rows in plot data.
+
+    Parameters:
+    plot_data: dictionary with plot data for the module, not modified
+    series_fn: name of the .npy file for the array
+
+    Returns:
+    plot data with references and array with x and y columns, or None if there are no numeric series
+
+    """
+    series = []
+    rows = 0
+    split_plot_data = dict()
+    for plot, content in plot_data.items():
+        if content.get("plot_type") != "xy_line":
+            split_plot_data[plot] = content
+            continue
+        datasets = []
+        for dataset in content["datasets"]:
+            elements = []
+            for el in dataset:
+                types = series_types(el.get("data")) if isinstance(el, dict) else None
+                if types is None:
+                    elements.append(el)
+                    continue
+                series.append(np.array(el["data"], dtype=np.float64))
+                elements.append(
+                    dict(el, data={"npy": series_fn, "rows": [rows, rows + len(el["data"])], "types": types})
+                )
+                rows += len(el["data"])
+            datasets.append(elements)
+        split_plot_data[plot] = dict(content, datasets=datasets)
+    if not series:
+        return plot_data, None
+    return split_plot_data, np.concatenate(series)
+
+
+def load_series(module_dir, plot_data):
+    """
+    Replaces references to rows of .npy files by [x, y] series. Files are memory-mapped,
+    so only the rows of line graph elements in plot_data are read.
+
+    Parameters:
+    module_dir: path to the module directory in jupyterlab_data
+    plot_data: dictionary with plot data, modified in place
+
+    """
+    arrays = dict()
+    for content in plot_data.values():
+        if content.get("plot_type") != "xy_line":
+            continue
+        for dataset in content["datasets"]:
+            for el in dataset:
+                ref = el.get("data") if isinstance(el, dict) else None
+                if not isinstance(ref, dict) or "npy" not in ref:
+                    continue
+                if ref["npy"] not in arrays:
+                    arrays[ref["npy"]] = np.load(os.path.join(module_dir, "plot_data", ref["npy"]), mmap_mode="r")
+                points = arrays[ref["npy"]][ref["rows"][0] : ref["rows"][1]].tolist()
+                if ref["types"] != "ff":
+                    x_type, y_type = [int if t == "i" else float for t in ref["types"]]
+                    points = [[x_type(x), y_type(y)] for x, y in points]
+                el["data"] = points
+
+
+def read_plots(module_dir, samples):
+    """
+    Reads only the plots needed to show the given samples. Every plot is read from the first file
+    where it appears (to get its configuration) and from every file with data for any of the samples.
+    Samples replaced by data written later are removed from the plots.
+
+    Parameters:
+    module_dir: path to the module directory in jupyterlab_data
+    samples: list of samples
+
+    Returns:
+    generator of (plot id, plot content) tuples, in the order of writing the data files
+
+    """
+    index = read_index(module_dir)
+    plot_data_dir = os.path.join(module_dir, "plot_data")
+
+    # plots to read from every file
+    needed = {fn: set() for fn in index["files"]}
+    seen_plots = set()
+    for fn in index["files"]:
+        for plot in index["plots"][fn]:
+            if plot not in seen_plots:
+                seen_plots.add(plot)
+                needed[fn].add(plot)
+    superseded = {
+        fn: {plot: set(replaced) for plot, replaced in fn_plots.items()}
+        for fn, fn_plots in index.get("superseded", {}).items()
+    }
+    for sample in set(samples):
+        for fn, plots in index["samples"].get(sample, {}).items():
+            fn_superseded = superseded.get(fn, {})
+            needed[fn].update(plot for plot in plots if sample not in fn_superseded.get(plot, ()))
+
+    for fn in index["files"]:
+        if not needed[fn]:
+            continue
+        plots = sorted(needed[fn], key=lambda plot: index["plots"][fn][plot][0])
+        with open(os.path.join(plot_data_dir, fn), "rb") as plot_data_file:
+            for plot in plots:
+                offset, length = index["plots"][fn][plot][:2]
+                plot_data_file.seek(offset)
+                content = json.loads(plot_data_file.read(length).decode("utf-8"))
+                if plot in superseded.get(fn, {}):
+                    content = drop_samples(content, superseded[fn][plot])
+                yield plot, content
+
+
+def read_manifest(jupyterlab_dir):
+    """
+    Reads the manifest of input files loaded to jupyterlab_data.
+
+    Parameters:
+    jupyterlab_dir: path to jupyterlab_data directory
+
+    Returns:
+    dictionary with absolute paths of loaded files as keys and their size, mtime, hash, search pattern keys
+    and samples found in them for every module as values
+
+    """
+    manifest_path = os.path.join(jupyterlab_dir, MANIFEST_FN)
+    if not os.path.exists(manifest_path):
+        return dict()
+    with open(manifest_path, "r") as manifest_file:
+        return json.load(manifest_file)
+
+
+def write_manifest(jupyterlab_dir, manifest):
+    """
+    Saves the manifest of input files loaded to jupyterlab_data.
+
+    Parameters:
+    jupyterlab_dir: path to jupyterlab_data directory
+    manifest: manifest dictionary
+
+    """
+    with atomic_write(os.path.join(jupyterlab_dir, MANIFEST_FN)) as manifest_file:
+        json.dump(manifest, manifest_file, indent=1)
+
+
+def file_hash(path):
+    """
+    Calculates SHA-1 of the file contents.
+
+    Parameters:
+    path: path to the file
+
+    Returns:
+    hex digest
+
+    """
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def changed_files(files, manifest, touched=None):
+    """
+    Removes files that didn't change since they were loaded from the files found for every search pattern.
+    A file is unchanged if its size and modification time are the same as in the manifest,
+    or if only its modification time differs but contents are the same (when the manifest has their hash).
+
+    Parameters:
+    files: dictionary with search pattern keys and lists of found files, as in report.files
+    manifest: manifest dictionary, not modified
+    touched: dictionary updated with manifest records of unchanged files with a new modification time, or None
+
+    Returns:
+    dictionary with search pattern keys and lists of new or modified files
+
+    """
+    result = dict()
+    unchanged = dict()  # cache for files matched by more than one search pattern
+    for key, key_files in files.items():
+        result[key] = []
+        for f in key_files:
+            path = os.path.abspath(os.path.join(f["root"], f["fn"]))
+            if path not in unchanged:
+                unchanged[path] = False
+                record = manifest.get(path)
+                if record is not None:
+                    stat = os.stat(path)
+                    same_size = record["size"] == stat.st_size
+                    if same_size and record["mtime"] == stat.st_mtime:
+                        unchanged[path] = True
+                    elif same_size and record.get("hash") is not None and record["hash"] == file_hash(path):
+                        if touched is not None:
+                            touched[path] = dict(record, mtime=stat.st_mtime)
+                        unchanged[path] = True
+            if not unchanged[path]:
+                result[key].append(f)
+    return result
+
+
+def update_manifest(manifest, files, data_sources, hash_files=False):
+    """
+    Adds loaded files to the manifest, with samples that modules found in them.
+
+    Parameters:
+    manifest: manifest dictionary to update
+    files: dictionary with search pattern keys and lists of loaded files, as in report.files
+    data_sources: dictionary with modules, sections and samples with their source files, as in report.data_sources
+    hash_files: True to save hashes of the files, so touched files are found unchanged by changed_files()
+
+    """
+    loaded = dict()
+    for key, key_files in files.items():
+        for f in key_files:
+            path = os.path.abspath(os.path.join(f["root"], f["fn"]))
+            if path not in loaded:
+                stat = os.stat(path)
+                loaded[path] = {
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime,
+                    "hash": file_hash(path) if hash_files else None,
+                    "keys": [],
+                    "samples": dict(),
+                }
+            loaded[path]["keys"].append(key)
+
+    for module, sections in data_sources.items():
+        for section, sources in sections.items():
+            for sample, source in sources.items():
+                record = loaded.get(os.path.abspath(source))
+                if record is not None and sample not in record["samples"].get(module, []):
+                    record["samples"].setdefault(module, []).append(sample)
+
+    manifest.update(loaded)
@@ -10,19 +10,10 @@ import os
 import requests
 
 from multiqc import config
+from multiqc.utils.util_functions import MQCJSONEncoder
 
 log = config.logger
 
-# Custom encoder to handle lambda functions
-class MQCJSONEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if callable(obj):
-            try:
-                return obj(1)
-            except:
-                return None
-        return json.JSONEncoder.default(self, obj)
-
 
 def multiqc_dump_json(report):
     exported_data = dict()
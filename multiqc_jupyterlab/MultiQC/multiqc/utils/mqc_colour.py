@@ -5,6 +5,7 @@ Helper functions to manipulate colours and colour scales
 
 from __future__ import print_function
 import spectra
+import math
 import numpy as np
 import os
 import re
@@ -18,6 +19,15 @@ logger = logging.getLogger(__name__)
 class mqc_colour_scale(object):
     """Class to hold a colour scheme."""
 
+    # Number of colours precomputed along a scale, values are rounded to the nearest one
+    lookup_table_size = 1024
+
+    # Lookup tables shared by all scales with the same colours
+    lookup_tables = dict()
+
+    # Characters kept when parsing numbers from strings
+    non_numeric_re = re.compile("[^0-9\.-e]")
+
     def __init__(self, name="GnBu", minval=0, maxval=100):
         """Initialise class with a colour scale"""
 
@@ -25,8 +35,8 @@ class mqc_colour_scale(object):
         self.name = name
 
         # Sanity checks
-        minval = re.sub("[^0-9\.-e]", "", str(minval))
-        maxval = re.sub("[^0-9\.-e]", "", str(maxval))
+        minval = self.non_numeric_re.sub("", str(minval))
+        maxval = self.non_numeric_re.sub("", str(maxval))
         if minval == "":
             minval = 0
         if maxval == "":
@@ -44,47 +54,99 @@ class mqc_colour_scale(object):
     def get_colour(self, val, colformat="hex", lighten=0.3):
         """Given a value, return a colour within the colour scale"""
 
-        # Ported from the original JavaScript for continuity
-        # Seems to work better than adjusting brightness / saturation / luminosity
-        rgb_converter = lambda x: max(0, min(1, 1 + ((x - 1) * lighten)))
-
         try:
             # When we have non-numeric values (e.g. Male/Female, Yes/No, chromosome names, etc), and a qualitive
             # scale (Set1, Set3, etc), we don't want to attempt to parse numbers, otherwise we will end up with all
             # values assigned with the same color. But instead we will geta has from a string to hope to assign
             # a unique color for each possible enumeration value.
             if self.name in mqc_colour_scale.qualitative_scales and isinstance(val, str):
-                thecolour = spectra.html(self.colours[hash(val) % len(self.colours)])
-                thecolour = spectra.rgb(*[rgb_converter(v) for v in thecolour.rgb])
-                return thecolour.hexcode
-
-            # When there is only 1 color in scale, spectra.scale() will crash with DevisionByZero
-            elif len(self.colours) == 1:
-                thecolour = spectra.html(self.colours[0])
-                thecolour = spectra.rgb(*[rgb_converter(v) for v in thecolour.rgb])
-                return thecolour.hexcode
+                colours = self.get_lookup_table(lighten, size=len(self.colours))
+                return colours.item(hash(val) % len(colours))
 
-            else:
-                # Sanity checks
-                val = re.sub("[^0-9\.-e]", "", str(val))
-                if val == "":
-                    val = self.minval
-                val = float(val)
-                val = max(val, self.minval)
-                val = min(val, self.maxval)
-
-                domain_nums = list(np.linspace(self.minval, self.maxval, len(self.colours)))
-                my_scale = spectra.scale(self.colours).domain(domain_nums)
+            lookup_table = self.get_lookup_table(lighten)
 
-                # Lighten colours
-                thecolour = spectra.rgb(*[rgb_converter(v) for v in my_scale(val).rgb])
+            # When there is only 1 color in scale, every value gets it
+            if len(lookup_table) == 1:
+                return lookup_table.item(0)
 
-                return thecolour.hexcode
+            val = self.parse_value(val)
+            val = max(val, self.minval)
+            val = min(val, self.maxval)
+            position = (val - self.minval) / (self.maxval - self.minval)
+            return lookup_table.item(int(round(position * (len(lookup_table) - 1))))
 
         except:
             # Shouldn't crash all of MultiQC just for colours
             return ""
 
+    def get_colour_array(self, values, colformat="hex", lighten=0.3):
+        """Given a list or a NumPy array of values, return an array of colours within the colour scale.
+        Gives the same colours as get_colour() for every value, but numeric arrays are mapped in one go."""
+
+        values = np.asarray(values)
+        if self.name in mqc_colour_scale.qualitative_scales and values.dtype.kind in "OUS":
+            return np.array([self.get_colour(val, colformat, lighten) for val in values.flat], dtype="<U7").reshape(
+                values.shape
+            )
+
+        lookup_table = self.get_lookup_table(lighten)
+        if len(lookup_table) == 1:
+            return np.full(values.shape, lookup_table[0], dtype="<U7")
+
+        if values.dtype.kind in "biuf":
+            numbers = values.astype(float)
+        else:
+            numbers = np.empty(values.shape)
+            for i, val in enumerate(values.flat):
+                try:
+                    numbers.flat[i] = self.parse_value(val)
+                except ValueError:
+                    numbers.flat[i] = np.nan
+
+        finite = np.isfinite(numbers)
+        colours = np.full(values.shape, "", dtype="<U7")
+        positions = (np.clip(numbers[finite], self.minval, self.maxval) - self.minval) / (self.maxval - self.minval)
+        colours[finite] = lookup_table[np.rint(positions * (len(lookup_table) - 1)).astype(int)]
+        return colours
+
+    def parse_value(self, val):
+        """Get a number from a table value, strings are stripped from any units first"""
+        if isinstance(val, (int, float, np.number)) and not isinstance(val, bool):
+            val = float(val)
+        else:
+            val = self.non_numeric_re.sub("", str(val))
+            if val == "":
+                return self.minval
+            val = float(val)
+        if not math.isfinite(val):
+            raise ValueError("Can't get a colour for {}".format(val))
+        return val
+
+    def get_lookup_table(self, lighten=0.3, size=None):
+        """Return an array of hex colours spread evenly along the scale, built once for every lighten value.
+        With size equal to the number of colours in the scale, these are the lightened scale colours."""
+
+        if size is None:
+            size = 1 if len(self.colours) == 1 else self.lookup_table_size
+        key = (tuple(self.colours), lighten, size)
+        if key not in self.lookup_tables:
+            rgb = np.array([spectra.html(c).rgb for c in self.colours])
+            if size == len(self.colours):
+                channels = rgb
+            else:
+                # Same as blending neighbouring colours of spectra.scale() with an evenly spaced domain,
+                # stops are placed on table indices so that those falling on an entry keep their exact colour
+                stops = np.linspace(0, size - 1, len(self.colours))
+                channels = np.column_stack([np.interp(np.arange(size), stops, rgb[:, i]) for i in range(3)])
+
+            # Ported from the original JavaScript for continuity
+            # Seems to work better than adjusting brightness / saturation / luminosity
+            channels = np.clip(1 + ((channels - 1) * lighten), 0, 1)
+            # Rounded halves up like spectra, so colours of the stops are the same as before
+            channels = np.minimum(np.floor(channels * 255 + 0.5), 255).astype(int)
+            self.lookup_tables[key] = np.array(["#{:02x}{:02x}{:02x}".format(*c) for c in channels], dtype="<U7")
+        return self.lookup_tables[key]
+
     def get_colours(self, name="GnBu"):
         """Function to get a colour scale by name
         Input: Name of colour scale (suffix with -rev for reversed)
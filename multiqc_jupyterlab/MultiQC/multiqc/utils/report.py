@@ -6,11 +6,11 @@ helper functions to generate markup for report. """
 
 from __future__ import print_function
 from collections import defaultdict, OrderedDict
+import concurrent.futures
 import fnmatch
 import inspect
 import io
 import json
-import lzstring
 import mimetypes
 import os
 import re
@@ -19,6 +19,7 @@ import time
 import yaml
 
 from multiqc import config
+from multiqc.utils import compression, util_functions
 
 logger = config.logger
 
@@ -32,6 +33,10 @@ try:
 except NameError:
     pass  # Python 3
 
+# Sanitisers of HTML IDs, see save_htmlid()
+HTML_ID_START_RE = re.compile(r"^[a-zA-Z]")
+HTML_ID_ILLEGAL_RE = re.compile("[^a-zA-Z0-9_-]+")
+
 
 # Set up global variables shared across modules
 # Inside a function so that the global vars are reset if MultiQC is run more than once within a single session / environment
@@ -52,7 +57,11 @@ def init():
     plot_data = dict()
 
     global html_ids
-    html_ids = list()
+    html_ids = set()
+
+    # Next number to try for every duplicated HTML ID, e.g. 2 after "id" and "id-1" were saved
+    global html_id_suffixes
+    html_id_suffixes = dict()
 
     global lint_errors
     lint_errors = list()
@@ -163,59 +172,96 @@ def get_filelist(run_module_names):
         logger.info("Skipping {} file search patterns".format(len(skipped_patterns)))
         logger.debug("Skipping search patterns: {}".format(", ".join(skipped_patterns)))
 
-    def add_file(fn, root):
+    # Compile search patterns once, and combine all file name patterns into a single regex,
+    # so that files which can't match any of them by name are recognised with one match
+    compiled_sps = dict()
+    fn_res = list()
+    for patterns in spatterns:
+        for key, sps in patterns.items():
+            compiled_sps[key] = [compile_search_pattern(sp) for sp in sps]
+            fn_res.extend(fn_re.pattern for csp in compiled_sps[key] for fn_re in csp["fn"])
+    try:
+        any_fn_re = re.compile("|".join("(?:{})".format(fn_re) for fn_re in fn_res)) if fn_res else None
+    except re.error:
+        any_fn_re = None  # eg. inline flags in fn_re can't be combined, test every pattern
+
+    def add_file(fn, root, entry=None):
         """
         Function applied to each file found when walking the analysis
-        directories. Runs through all search patterns and returns True
-        if a match is found.
+        directories. Runs through all search patterns. Can run in a worker
+        thread, so instead of changing the global variables it returns the
+        file, search keys it matched, the skip counter to increase, True if
+        a match is found and time spent on every search key.
         """
         f = {"fn": fn, "root": root}
+        matched_keys = list()
+        sp_runtimes = dict()
 
         # Check that this is a file and not a pipe or anything weird
-        if not os.path.isfile(os.path.join(root, fn)):
-            file_search_stats["skipped_not_a_file"] += 1
-            return False
+        try:
+            is_file = entry.is_file() if entry is not None else os.path.isfile(os.path.join(root, fn))
+        except OSError:
+            is_file = False
+        if not is_file:
+            return f, matched_keys, "skipped_not_a_file", False, sp_runtimes
 
         # Check that we don't want to ignore this file
         i_matches = [n for n in config.fn_ignore_files if fnmatch.fnmatch(fn, n)]
         if len(i_matches) > 0:
             logger.debug("Ignoring file as matched an ignore pattern: {}".format(fn))
-            file_search_stats["skipped_ignore_pattern"] += 1
-            return False
+            return f, matched_keys, "skipped_ignore_pattern", False, sp_runtimes
 
         # Limit search to small files, to avoid 30GB FastQ files etc.
         try:
-            f["filesize"] = os.path.getsize(os.path.join(root, fn))
+            if entry is not None:
+                f["filesize"] = entry.stat().st_size
+            else:
+                f["filesize"] = os.path.getsize(os.path.join(root, fn))
         except (IOError, OSError, ValueError, UnicodeDecodeError):
             logger.debug("Couldn't read file when checking filesize: {}".format(fn))
         else:
             if f["filesize"] > config.log_filesize_limit:
-                file_search_stats["skipped_filesize_limit"] += 1
-                return False
-
-        # Test file for each search pattern
-        file_matched = False
-        for patterns in spatterns:
-            for key, sps in patterns.items():
-                start = time.time()
-                for sp in sps:
-                    if search_file(sp, f, key):
-                        # Check that we shouldn't exclude this file
-                        if not exclude_file(sp, f):
-                            # Looks good! Remember this file
-                            files[key].append(f)
-                            file_search_stats[key] = file_search_stats.get(key, 0) + 1
-                            file_matched = True
-                        # Don't keep searching this file for other modules
-                        if not sp.get("shared", False):
-                            runtimes["sp"][key] = runtimes["sp"].get(key, 0) + (time.time() - start)
-                            return True
-                        # Don't look at other patterns for this module
-                        else:
-                            break
-                runtimes["sp"][key] = runtimes["sp"].get(key, 0) + (time.time() - start)
-
-        return file_matched
+                return f, matched_keys, "skipped_filesize_limit", False, sp_runtimes
+
+        # Test file for each search pattern, reading its contents only once
+        search_f = SearchFile(f)
+        if any_fn_re is not None:
+            search_f.fn_candidate = any(any_fn_re.match(n) for n in {fn, os.path.normcase(fn)})
+        try:
+            for patterns in spatterns:
+                for key, sps in patterns.items():
+                    start = time.time()
+                    for sp, csp in zip(sps, compiled_sps[key]):
+                        if search_file(sp, f, key, search_f, csp):
+                            # Check that we shouldn't exclude this file
+                            if not exclude_file(sp, f, search_f):
+                                # Looks good! Remember this file
+                                matched_keys.append(key)
+                            # Don't keep searching this file for other modules
+                            if not sp.get("shared", False):
+                                sp_runtimes[key] = sp_runtimes.get(key, 0) + (time.time() - start)
+                                return f, matched_keys, None, True, sp_runtimes
+                            # Don't look at other patterns for this module
+                            else:
+                                break
+                    sp_runtimes[key] = sp_runtimes.get(key, 0) + (time.time() - start)
+
+            return f, matched_keys, None, len(matched_keys) > 0, sp_runtimes
+        finally:
+            search_f.close()
+
+    def record_file(result):
+        """Saves the result of add_file() to files and file_search_stats, in the order of searchfiles"""
+        f, matched_keys, skipped, file_matched, sp_runtimes = result
+        for key in matched_keys:
+            files[key].append(f)
+            file_search_stats[key] = file_search_stats.get(key, 0) + 1
+        for key, runtime in sp_runtimes.items():
+            runtimes["sp"][key] = runtimes["sp"].get(key, 0) + runtime
+        if skipped is not None:
+            file_search_stats[skipped] += 1
+        if not file_matched:
+            file_search_stats["skipped_no_match"] += 1
 
     # Go through the analysis directories and get file list
     multiqc_installation_dir_files = [
@@ -229,97 +275,255 @@ def get_filelist(run_module_names):
         "setup.py",
         ".gitignore",
     ]
-    total_sp_starttime = time.time()
-    for path in config.analysis_dir:
-        if os.path.islink(path) and config.ignore_symlinks:
-            file_search_stats["skipped_symlinks"] += 1
-            continue
-        elif os.path.isfile(path):
-            searchfiles.append([os.path.basename(path), os.path.dirname(path)])
-        elif os.path.isdir(path):
-            for root, dirnames, filenames in os.walk(path, followlinks=(not config.ignore_symlinks), topdown=True):
-                bname = os.path.basename(root)
 
-                # Skip any sub-directories matching ignore params
+    def skip_dir(root, dirnames, filenames):
+        """
+        Removes sub-directories matching ignore params from dirnames, as with os.walk(topdown=True).
+        Returns True if files in this directory shouldn't be searched.
+        """
+        bname = os.path.basename(root)
+
+        # Skip any sub-directories matching ignore params
+        orig_dirnames = dirnames[:]
+        for n in config.fn_ignore_dirs:
+            dirnames[:] = [d for d in dirnames if not fnmatch.fnmatch(d, n.rstrip(os.sep))]
+            if len(orig_dirnames) != len(dirnames):
+                removed_dirs = [os.path.join(root, d) for d in set(orig_dirnames).symmetric_difference(set(dirnames))]
+                logger.debug("Ignoring directory as matched fn_ignore_dirs: {}".format(", ".join(removed_dirs)))
                 orig_dirnames = dirnames[:]
-                for n in config.fn_ignore_dirs:
-                    dirnames[:] = [d for d in dirnames if not fnmatch.fnmatch(d, n.rstrip(os.sep))]
-                    if len(orig_dirnames) != len(dirnames):
-                        removed_dirs = [
-                            os.path.join(root, d) for d in set(orig_dirnames).symmetric_difference(set(dirnames))
-                        ]
-                        logger.debug("Ignoring directory as matched fn_ignore_dirs: {}".format(", ".join(removed_dirs)))
-                        orig_dirnames = dirnames[:]
-                for n in config.fn_ignore_paths:
-                    dirnames[:] = [d for d in dirnames if not fnmatch.fnmatch(os.path.join(root, d), n.rstrip(os.sep))]
-                    if len(orig_dirnames) != len(dirnames):
-                        removed_dirs = [
-                            os.path.join(root, d) for d in set(orig_dirnames).symmetric_difference(set(dirnames))
-                        ]
-                        logger.debug(
-                            "Ignoring directory as matched fn_ignore_paths: {}".format(", ".join(removed_dirs))
-                        )
-
-                # Skip *this* directory if matches ignore params
-                d_matches = [n for n in config.fn_ignore_dirs if fnmatch.fnmatch(bname, n.rstrip(os.sep))]
-                if len(d_matches) > 0:
-                    logger.debug("Ignoring directory as matched fn_ignore_dirs: {}".format(bname))
-                    continue
-                p_matches = [n for n in config.fn_ignore_paths if fnmatch.fnmatch(root, n.rstrip(os.sep))]
-                if len(p_matches) > 0:
-                    logger.debug("Ignoring directory as matched fn_ignore_paths: {}".format(root))
-                    continue
-
-                # Sanity check - make sure that we're not just running in the installation directory
-                if len(filenames) > 0 and all([fn in filenames for fn in multiqc_installation_dir_files]):
-                    logger.error("Error: MultiQC is running in source code directory! {}".format(root))
-                    logger.warning(
-                        "Please see the docs for how to use MultiQC: https://multiqc.info/docs/#running-multiqc"
-                    )
-                    dirnames[:] = []
-                    filenames[:] = []
-                    continue
-
-                # Search filenames in this directory
-                for fn in filenames:
-                    searchfiles.append([fn, root])
-
-    # Search through collected files
-    progress_obj = rich.progress.Progress(
-        "[blue]|[/]      ",
-        rich.progress.SpinnerColumn(),
-        "[blue]{task.description}[/] |",
-        rich.progress.BarColumn(),
-        "[progress.percentage]{task.percentage:>3.0f}%",
-        "[green]{task.completed}/{task.total}",
-        "[dim]{task.fields[s_fn]}",
-    )
-    with progress_obj as progress:
-        mqc_task = progress.add_task("searching", total=len(searchfiles), s_fn="")
-        for sf in searchfiles:
-            progress.update(mqc_task, advance=1, s_fn=os.path.join(sf[1], sf[0])[-50:])
-            if not add_file(sf[0], sf[1]):
-                file_search_stats["skipped_no_match"] += 1
-        progress.update(mqc_task, s_fn="")
+        for n in config.fn_ignore_paths:
+            dirnames[:] = [d for d in dirnames if not fnmatch.fnmatch(os.path.join(root, d), n.rstrip(os.sep))]
+            if len(orig_dirnames) != len(dirnames):
+                removed_dirs = [os.path.join(root, d) for d in set(orig_dirnames).symmetric_difference(set(dirnames))]
+                logger.debug("Ignoring directory as matched fn_ignore_paths: {}".format(", ".join(removed_dirs)))
+
+        # Skip *this* directory if matches ignore params
+        d_matches = [n for n in config.fn_ignore_dirs if fnmatch.fnmatch(bname, n.rstrip(os.sep))]
+        if len(d_matches) > 0:
+            logger.debug("Ignoring directory as matched fn_ignore_dirs: {}".format(bname))
+            return True
+        p_matches = [n for n in config.fn_ignore_paths if fnmatch.fnmatch(root, n.rstrip(os.sep))]
+        if len(p_matches) > 0:
+            logger.debug("Ignoring directory as matched fn_ignore_paths: {}".format(root))
+            return True
+
+        # Sanity check - make sure that we're not just running in the installation directory
+        if len(filenames) > 0 and all([fn in filenames for fn in multiqc_installation_dir_files]):
+            logger.error("Error: MultiQC is running in source code directory! {}".format(root))
+            logger.warning("Please see the docs for how to use MultiQC: https://multiqc.info/docs/#running-multiqc")
+            dirnames[:] = []
+            filenames[:] = []
+            return True
+        return False
+
+    total_sp_starttime = time.time()
+    num_threads = max(1, config.file_search_threads or 1)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=num_threads) if num_threads > 1 else None
+    searchentries = list()  # os.DirEntry objects for searchfiles, to reuse their stat results
+    try:
+        for path in config.analysis_dir:
+            if os.path.islink(path) and config.ignore_symlinks:
+                file_search_stats["skipped_symlinks"] += 1
+                continue
+            elif os.path.isfile(path):
+                searchfiles.append([os.path.basename(path), os.path.dirname(path)])
+                searchentries.append(None)
+            elif os.path.isdir(path):
+                if executor is None:
+                    walk = os.walk(path, followlinks=(not config.ignore_symlinks), topdown=True)
+                    walk = ((root, dirnames, filenames, None) for root, dirnames, filenames in walk)
+                else:
+                    walk = parallel_walk(path, not config.ignore_symlinks, executor)
+                for root, dirnames, filenames, entries in walk:
+                    if skip_dir(root, dirnames, filenames):
+                        continue
+
+                    # Search filenames in this directory
+                    for fn in filenames:
+                        searchfiles.append([fn, root])
+                        searchentries.append(entries[fn] if entries is not None else None)
+
+        # Search through collected files
+        progress_obj = rich.progress.Progress(
+            "[blue]|[/]      ",
+            rich.progress.SpinnerColumn(),
+            "[blue]{task.description}[/] |",
+            rich.progress.BarColumn(),
+            "[progress.percentage]{task.percentage:>3.0f}%",
+            "[green]{task.completed}/{task.total}",
+            "[dim]{task.fields[s_fn]}",
+        )
+        with progress_obj as progress:
+            mqc_task = progress.add_task("searching", total=len(searchfiles), s_fn="")
+            if executor is None:
+                results = map(add_file, [sf[0] for sf in searchfiles], [sf[1] for sf in searchfiles], searchentries)
+            else:
+                # files are searched in threads, results are saved in the order of searchfiles
+                results = executor.map(
+                    add_file, [sf[0] for sf in searchfiles], [sf[1] for sf in searchfiles], searchentries
+                )
+            for sf, result in zip(searchfiles, results):
+                progress.update(mqc_task, advance=1, s_fn=os.path.join(sf[1], sf[0])[-50:])
+                record_file(result)
+            progress.update(mqc_task, s_fn="")
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
     runtimes["total_sp"] = time.time() - total_sp_starttime
 
 
-def search_file(pattern, f, module_key):
+def scan_dir(path):
+    """
+    Lists a directory for parallel_walk(). Returns lists of sub-directories and
+    other entries as os.walk() sorts them, or None if the directory can't be listed.
+    """
+    dirs = list()
+    nondirs = list()
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    dirs.append(entry)
+                else:
+                    nondirs.append(entry)
+    except OSError:
+        return None
+    return dirs, nondirs
+
+
+def parallel_walk(top, followlinks, executor):
+    """
+    Same as os.walk(top, topdown=True, followlinks=followlinks), but directories are
+    listed with os.scandir in the executor's threads. Sub-directories are listed as
+    soon as their parent is walked, while directories are still yielded in the order
+    of os.walk. Yields (root, dirnames, filenames, entries), where entries has
+    os.DirEntry objects of the files. Remove names from dirnames to skip them.
+    """
+    stack = [(top, executor.submit(scan_dir, top))]
+    while stack:
+        root, future = stack.pop()
+        scanned = future.result()
+        if scanned is None:
+            continue
+        dirs, nondirs = scanned
+        dirnames = [entry.name for entry in dirs]
+        filenames = [entry.name for entry in nondirs]
+        yield root, dirnames, filenames, {entry.name: entry for entry in nondirs}
+
+        # Walk into the remaining sub-directories, but don't follow symlinks unless asked to
+        dir_entries = {entry.name: entry for entry in dirs}
+        subdirs = list()
+        for name in dirnames:
+            path = os.path.join(root, name)
+            entry = dir_entries.get(name)
+            is_symlink = entry.is_symlink() if entry is not None else os.path.islink(path)
+            if followlinks or not is_symlink:
+                subdirs.append((path, executor.submit(scan_dir, path)))
+        stack.extend(reversed(subdirs))
+
+
+class SearchFile(object):
+    """
+    A file tested against the search patterns. Its lines are read only once
+    and shared by all patterns, as far as the furthest looking pattern needs.
+    """
+
+    def __init__(self, f):
+        self.path = os.path.join(f["root"], f["fn"])
+        self.fn_candidate = True  # False if the file name can't match any fn / fn_re pattern
+        self.lines = list()
+        self.texts = dict()
+        self.read_error = None
+        self._fh = None
+        self._done = False
+        self._skip_type = None
+
+    def skip_type(self):
+        """Use mimetypes to exclude binary files where possible"""
+        if self._skip_type is None:
+            self._skip_type = False
+            if not re.match(r".+_mqc\.(png|jpg|jpeg)", os.path.basename(self.path)) and config.ignore_images:
+                (ftype, encoding) = mimetypes.guess_type(self.path)
+                if encoding is not None or (ftype is not None and ftype.startswith("image")):
+                    self._skip_type = True
+        return self._skip_type
+
+    def get_lines(self, num_lines=None):
+        """
+        Lines from the start of the file, all of them if num_lines is not set.
+        Returns the lines and the error if the file couldn't be read that far.
+        """
+        while not self._done and (not num_lines or len(self.lines) < num_lines):
+            try:
+                if self._fh is None:
+                    self._fh = io.open(self.path, "r", encoding="utf-8")
+                line = self._fh.readline()
+            except (IOError, OSError, ValueError, UnicodeDecodeError) as e:
+                self.read_error = e
+                line = ""
+            if line == "":
+                self.close()
+            else:
+                self.lines.append(line)
+        if num_lines and len(self.lines) >= num_lines:
+            return self.lines[:num_lines], None
+        return self.lines, self.read_error
+
+    def get_text(self, num_lines=None):
+        """Same as get_lines(), but with the lines joined, to search for a string in one go"""
+        if num_lines not in self.texts:
+            lines, error = self.get_lines(num_lines)
+            self.texts[num_lines] = ("".join(lines), error)
+        return self.texts[num_lines]
+
+    def close(self):
+        self._done = True
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+
+def compile_search_pattern(sp):
+    """
+    Compile file name globs / regexes and contents regex of a single search pattern,
+    so they can be reused for every file.
+    """
+    fn_res = list()
+    if sp.get("fn") is not None:
+        fn_res.append(re.compile(fnmatch.translate(os.path.normcase(sp["fn"]))))
+    if sp.get("fn_re") is not None:
+        fn_res.append(re.compile(sp["fn_re"]))
+    contents_re = re.compile(sp["contents_re"]) if sp.get("contents_re") is not None else None
+    return {"fn": fn_res, "contents_re": contents_re}
+
+
+def search_file(pattern, f, module_key, search_f=None, compiled=None):
     """
     Function to searach a single file for a single search pattern.
+    get_filelist() gives search_f and compiled, to share the file contents
+    and compiled patterns between all search patterns.
     """
+    if search_f is None:
+        search_f = SearchFile(f)
+        try:
+            return search_file(pattern, f, module_key, search_f, compiled)
+        finally:
+            search_f.close()
+    if compiled is None:
+        compiled = compile_search_pattern(pattern)
 
     fn_matched = False
     contents_matched = False
+    search_contents = pattern.get("contents") is not None or pattern.get("contents_re") is not None
 
     # Use mimetypes to exclude binary files where possible
-    if not re.match(r".+_mqc\.(png|jpg|jpeg)", f["fn"]) and config.ignore_images:
-        (ftype, encoding) = mimetypes.guess_type(os.path.join(f["root"], f["fn"]))
-        if encoding is not None:
-            return False
-        if ftype is not None and ftype.startswith("image"):
-            return False
+    if search_f.skip_type():
+        return False
 
     # Search pattern specific filesize limit
     if pattern.get("max_filesize") is not None and "filesize" in f:
@@ -329,55 +533,44 @@ def search_file(pattern, f, module_key):
             )
             return False
 
-    # Search by file name (glob)
-    if pattern.get("fn") is not None:
-        if fnmatch.fnmatch(f["fn"], pattern["fn"]):
-            fn_matched = True
-            if pattern.get("contents") is None and pattern.get("contents_re") is None:
-                return True
-
-    # Search by file name (regex)
-    if pattern.get("fn_re") is not None:
-        if re.match(pattern["fn_re"], f["fn"]):
-            fn_matched = True
-            if pattern.get("contents") is None and pattern.get("contents_re") is None:
-                return True
+    # Search by file name (glob or regex)
+    if compiled["fn"]:
+        if search_f.fn_candidate:
+            for i, fn_re in enumerate(compiled["fn"]):
+                # globs are matched case-insensitively where the file system is
+                fn = os.path.normcase(f["fn"]) if i == 0 and pattern.get("fn") is not None else f["fn"]
+                if fn_re.match(fn):
+                    fn_matched = True
+                    if not search_contents:
+                        return True
+        # No need to read the contents if the file name doesn't match
+        if not fn_matched:
+            return False
 
     # Search by file contents
-    if pattern.get("contents") is not None or pattern.get("contents_re") is not None:
-        if pattern.get("contents_re") is not None:
-            repattern = re.compile(pattern["contents_re"])
-        try:
-            with io.open(os.path.join(f["root"], f["fn"]), "r", encoding="utf-8") as f:
-                l = 1
-                for line in f:
-                    # Search by file contents (string)
-                    if pattern.get("contents") is not None:
-                        if pattern["contents"] in line:
-                            contents_matched = True
-                            if pattern.get("fn") is None and pattern.get("fn_re") is None:
-                                return True
-                            break
-                    # Search by file contents (regex)
-                    elif pattern.get("contents_re") is not None:
-                        if re.search(repattern, line):
-                            contents_matched = True
-                            if pattern.get("fn") is None and pattern.get("fn_re") is None:
-                                return True
-                            break
-                    # Break if we've searched enough lines for this pattern
-                    if pattern.get("num_lines") and l >= pattern.get("num_lines"):
-                        break
-                    l += 1
-        except (IOError, OSError, ValueError, UnicodeDecodeError):
-            if config.report_readerrors:
-                logger.debug("Couldn't read file when looking for output: {}".format(f["fn"]))
-                return False
+    if search_contents:
+        num_lines = pattern.get("num_lines")
+        if pattern.get("contents") is not None:
+            # Search by file contents (string)
+            if "\n" not in pattern["contents"]:
+                text, error = search_f.get_text(num_lines)
+                contents_matched = pattern["contents"] in text
+            else:
+                lines, error = search_f.get_lines(num_lines)
+                contents_matched = any(pattern["contents"] in line for line in lines)
+        else:
+            # Search by file contents (regex)
+            lines, error = search_f.get_lines(num_lines)
+            contents_matched = any(compiled["contents_re"].search(line) for line in lines)
+        if not contents_matched and error is not None and config.report_readerrors:
+            logger.debug("Couldn't read file when looking for output: {}".format(f["fn"]))
+        if contents_matched and not compiled["fn"]:
+            return True
 
     return fn_matched and contents_matched
 
 
-def exclude_file(sp, f):
+def exclude_file(sp, f, search_f=None):
     """
     Exclude discovered files if they match the special exclude_
     search pattern keys
@@ -405,16 +598,20 @@ def exclude_file(sp, f):
         # Compile regex patterns if we have any
         if "exclude_contents_re" in sp:
             sp["exclude_contents_re"] = [re.compile(pat) for pat in sp["exclude_contents_re"]]
-        with io.open(os.path.join(f["root"], f["fn"]), "r", encoding="utf-8") as fh:
-            for line in fh:
-                if "exclude_contents" in sp:
-                    for pat in sp["exclude_contents"]:
-                        if pat in line:
-                            return True
-                if "exclude_contents_re" in sp:
-                    for pat in sp["exclude_contents_re"]:
-                        if re.search(pat, line):
-                            return True
+        if search_f is None:
+            search_f = SearchFile(f)
+        lines, error = search_f.get_lines()
+        for line in lines:
+            if "exclude_contents" in sp:
+                for pat in sp["exclude_contents"]:
+                    if pat in line:
+                        return True
+            if "exclude_contents_re" in sp:
+                for pat in sp["exclude_contents_re"]:
+                    if re.search(pat, line):
+                        return True
+        if error is not None:
+            raise error
     return False
 
 
@@ -472,63 +669,53 @@ def save_htmlid(html_id, skiplint=False):
     html_id_clean = html_id_clean.strip("_")
 
     # Must begin with a letter
-    if re.match(r"^[a-zA-Z]", html_id_clean) is None:
+    if HTML_ID_START_RE.match(html_id_clean) is None:
         html_id_clean = "mqc_{}".format(html_id_clean)
 
     # Replace illegal characters
-    html_id_clean = re.sub("[^a-zA-Z0-9_-]+", "_", html_id_clean)
+    html_id_clean = HTML_ID_ILLEGAL_RE.sub("_", html_id_clean)
 
     # Validate if linting
-    if config.lint and not skiplint:
-        modname = ""
-        codeline = ""
-        callstack = inspect.stack()
-        for n in callstack:
-            if "multiqc/modules/" in n[1] and "base_module.py" not in n[1]:
-                callpath = n[1].split("multiqc/modules/", 1)[-1]
-                modname = ">{}< ".format(callpath)
-                codeline = n[4][0].strip()
-                break
-    if config.lint and not skiplint and html_id != html_id_clean:
-        errmsg = "LINT: {}HTML ID was not clean ('{}' -> '{}') ## {}".format(modname, html_id, html_id_clean, codeline)
-        logger.error(errmsg)
-        lint_errors.append(errmsg)
-
-    # Check for duplicates
-    i = 1
-    html_id_base = html_id_clean
-    while html_id_clean in html_ids:
+    lint = config.lint and not skiplint
+    if lint and html_id != html_id_clean:
+        save_lint_error("HTML ID was not clean ('{}' -> '{}')".format(html_id, html_id_clean))
+
+    # Check for duplicates, starting after the number given to the last duplicate of this ID
+    if html_id_clean in html_ids:
+        html_id_base = html_id_clean
+        i = html_id_suffixes.get(html_id_base, 1)
         html_id_clean = "{}-{}".format(html_id_base, i)
-        i += 1
-        if config.lint and not skiplint:
-            errmsg = "LINT: {}HTML ID was a duplicate ({}) ## {}".format(modname, html_id_clean, codeline)
-            logger.error(errmsg)
-            lint_errors.append(errmsg)
+        # The ID with the number can be taken already, if a module saved it itself
+        while html_id_clean in html_ids:
+            i += 1
+            html_id_clean = "{}-{}".format(html_id_base, i)
+        html_id_suffixes[html_id_base] = i + 1
+        if lint:
+            save_lint_error("HTML ID was a duplicate ({})".format(html_id_clean))
 
     # Remember and return
-    html_ids.append(html_id_clean)
+    html_ids.add(html_id_clean)
     return html_id_clean
 
 
-def compress_json(data):
-    """Take a Python data object. Convert to JSON and compress using lzstring"""
-    json_string = json.dumps(data).encode("utf-8", "ignore").decode("utf-8")
-    json_string = sanitise_json(json_string)
-    x = lzstring.LZString()
-    return x.compressToBase64(json_string)
+def save_lint_error(message):
+    """Log and save a lint error, prefixed by the module and line of code that caused it.
+    The call stack is only inspected here, as it is slow."""
+    modname = ""
+    codeline = ""
+    for n in inspect.stack():
+        if "multiqc/modules/" in n[1] and "base_module.py" not in n[1]:
+            callpath = n[1].split("multiqc/modules/", 1)[-1]
+            modname = ">{}< ".format(callpath)
+            codeline = n[4][0].strip()
+            break
+    errmsg = "LINT: {}{} ## {}".format(modname, message, codeline)
+    logger.error(errmsg)
+    lint_errors.append(errmsg)
 
 
-def sanitise_json(json_string):
-    """
-    The Python json module uses a bunch of values which are valid JavaScript
-    but invalid JSON. These crash the browser when parsing the JSON.
-    Nothing in the MultiQC front-end uses these values, so instead we just
-    do a find-and-replace for them and switch them with `null`, which works fine.
-
-    Side effect: Any string values that include the word "Infinity"
-    (case-sensitive) will have it switched for "null". Hopefully that doesn't happen
-    a lot, otherwise we'll have to do this in a more complicated manner.
-    """
-    json_string = re.sub(r"\bNaN\b", "null", json_string)
-    json_string = re.sub(r"\b-?Infinity\b", "null", json_string)
-    return json_string
+def compress_json(data):
+    """Take a Python data object. Convert to JSON and compress using LZ-string.
+    NaN and Infinity are written as null by the encoder, as they are invalid JSON."""
+    json_string = json.dumps(data, cls=util_functions.MQCJSONEncoder).encode("utf-8", "ignore").decode("utf-8")
+    return compression.compress_to_base64(json_string)
@@ -6,6 +6,7 @@ from __future__ import print_function
 from collections import OrderedDict
 import io
 import json
+import math
 import os
 import yaml
 import time
@@ -15,6 +16,89 @@ import sys
 from multiqc import config
 
 
+class MQCJSONEncoder(json.JSONEncoder):
+    """JSON encoder for MultiQC data.
+
+    Lambda functions (eg. in table headers) are called to get a value.
+    NaN and Infinity are written as null, as they are valid JavaScript but
+    invalid JSON and crash the browser when parsing the report data."""
+
+    def default(self, obj):
+        if callable(obj):
+            try:
+                return obj(1)
+            except:
+                return None
+        return json.JSONEncoder.default(self, obj)
+
+    def iterencode(self, o, _one_shot=False):
+        if _one_shot and json.encoder.c_make_encoder is not None and self.indent is None and self.allow_nan:
+            # The fast C encoder stops at the first non-finite float. Data rarely has them,
+            # so only then replace them with None and encode again.
+            self.allow_nan = False
+            try:
+                return super(MQCJSONEncoder, self).iterencode(o, _one_shot)
+            except ValueError as e:
+                # Other errors, e.g. circular references, are raised as they are
+                if not str(e).startswith("Out of range float values"):
+                    raise
+                return super(MQCJSONEncoder, self).iterencode(self.replace_nonfinite(o), _one_shot)
+            finally:
+                self.allow_nan = True
+
+        # Pure Python encoder, writing null for non-finite floats in the same pass
+        def floatstr(o, _repr=float.__repr__):
+            if o != o or o == float("inf") or o == float("-inf"):
+                return "null"
+            return _repr(o)
+
+        markers = {} if self.check_circular else None
+        if self.ensure_ascii:
+            encoder = json.encoder.encode_basestring_ascii
+        else:
+            encoder = json.encoder.encode_basestring
+        _iterencode = json.encoder._make_iterencode(
+            markers,
+            self.default,
+            encoder,
+            self.indent,
+            floatstr,
+            self.key_separator,
+            self.item_separator,
+            self.sort_keys,
+            self.skipkeys,
+            _one_shot,
+        )
+        return _iterencode(o, 0)
+
+    def replace_nonfinite(self, o, markers=None):
+        """Copy of the data with NaN and Infinity replaced with None"""
+        if callable(o):
+            o = self.default(o)
+        # Subclasses too, e.g. numpy.float64 values are floats
+        if isinstance(o, float):
+            return o if math.isfinite(o) else None
+        if not isinstance(o, (dict, list, tuple)):
+            return o
+
+        # Containers on the path to this one, as json.JSONEncoder checks them
+        if markers is None:
+            markers = set()
+        if self.check_circular:
+            if id(o) in markers:
+                raise ValueError("Circular reference detected")
+            markers.add(id(o))
+        if isinstance(o, dict):
+            o_copy = {
+                k if not isinstance(k, float) or math.isfinite(k) else "null": self.replace_nonfinite(v, markers)
+                for k, v in o.items()
+            }
+        else:
+            o_copy = [self.replace_nonfinite(v, markers) for v in o]
+        markers.discard(id(o))
+        return o_copy
+
+
 def robust_rmtree(path, logger=None, max_retries=10):
     """Robustly tries to delete paths.
     Retries several times (with increasing delays) if an OSError
@@ -56,16 +140,6 @@ def write_data_file(data, fn, sort_cols=False, data_format=None):
             data_format = config.data_format
         fn = "{}.{}".format(fn, config.data_format_extensions[data_format])
 
-        # JSON encoder class to handle lambda functions
-        class MQCJSONEncoder(json.JSONEncoder):
-            def default(self, obj):
-                if callable(obj):
-                    try:
-                        return obj(1)
-                    except:
-                        return None
-                return json.JSONEncoder.default(self, obj)
-
         # Save file
         with io.open(os.path.join(config.data_dir, fn), "w", encoding="utf-8") as f:
             if data_format == "json":
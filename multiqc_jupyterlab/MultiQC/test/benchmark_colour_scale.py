@@ -0,0 +1,71 @@
+"""
+Compares colouring table cells with a spectra scale built for every cell, as get_colour() used to do,
+with the lookup table of mqc_colour_scale, cell by cell and for whole columns with get_colour_array().
+Reports the largest difference of a colour channel between both.
+"""
+
+from __future__ import print_function
+import argparse
+import re
+import time
+
+import numpy as np
+import spectra
+
+from multiqc.utils.mqc_colour import mqc_colour_scale
+
+parser = argparse.ArgumentParser(description="Benchmarks colour scales for General Statistics table cells")
+parser.add_argument("--samples", help="Number of table rows", type=int, default=5000)
+parser.add_argument("--columns", help="Number of table columns", type=int, default=40)
+parser.add_argument("--scale", help="Colour scale", default="RdYlGn")
+parser.add_argument("--lighten", help="Lighten value of cell colours", type=float, default=0.3)
+args = parser.parse_args()
+
+
+def spectra_colour(scale, val, lighten):
+    """Colour of a single value, as computed before the lookup table"""
+    rgb_converter = lambda x: max(0, min(1, 1 + ((x - 1) * lighten)))
+    val = re.sub("[^0-9\\.-e]", "", str(val))
+    if val == "":
+        val = scale.minval
+    val = min(max(float(val), scale.minval), scale.maxval)
+    domain_nums = list(np.linspace(scale.minval, scale.maxval, len(scale.colours)))
+    my_scale = spectra.scale(scale.colours).domain(domain_nums)
+    return spectra.rgb(*[rgb_converter(v) for v in my_scale(val).rgb]).hexcode
+
+
+def channel_difference(expected, result):
+    return max(abs(int(e[i : i + 2], 16) - int(r[i : i + 2], 16)) for e, r in zip(expected, result) for i in (1, 3, 5))
+
+
+np.random.seed(1)
+table = np.random.uniform(0, 100, (args.columns, args.samples)).round(2)
+scales = [mqc_colour_scale(args.scale, 0, 100) for _ in range(args.columns)]
+
+start = time.time()
+expected = [[spectra_colour(scales[c], val, args.lighten) for val in table[c]] for c in range(args.columns)]
+spectra_time = time.time() - start
+
+start = time.time()
+per_cell = [[scales[c].get_colour(val, lighten=args.lighten) for val in table[c]] for c in range(args.columns)]
+per_cell_time = time.time() - start
+
+start = time.time()
+per_column = [scales[c].get_colour_array(table[c], lighten=args.lighten) for c in range(args.columns)]
+per_column_time = time.time() - start
+
+cells = args.samples * args.columns
+print("{} cells, {} colour scale".format(cells, args.scale))
+print("{:>24} {:>10} {:>14}".format("path", "time (s)", "per cell (us)"))
+for name, elapsed in [
+    ("spectra scale per cell", spectra_time),
+    ("lookup table per cell", per_cell_time),
+    ("lookup table per column", per_column_time),
+]:
+    print("{:>24} {:>10.3f} {:>14.2f}".format(name, elapsed, elapsed / cells * 1e6))
+print(
+    "Largest channel difference: {} per cell, {} per column".format(
+        max(channel_difference(e, r) for e, r in zip(expected, per_cell)),
+        max(channel_difference(e, r) for e, r in zip(expected, per_column)),
+    )
+)
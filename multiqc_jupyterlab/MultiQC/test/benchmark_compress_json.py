@@ -0,0 +1,58 @@
+"""
+Compares compression of plot data with the lzstring package and with multiqc.utils.compression,
+for line graph data of growing size. Checks that both give the same output.
+"""
+
+from __future__ import print_function
+import argparse
+import json
+import random
+import time
+
+import lzstring
+
+from multiqc.utils import compression
+from multiqc.utils.util_functions import MQCJSONEncoder
+
+parser = argparse.ArgumentParser(description="Benchmarks LZ-string compression of report plot data")
+parser.add_argument("--samples", help="Numbers of samples in plot data", type=int, nargs="+", default=[10, 50, 200])
+parser.add_argument("--points", help="Number of points for every sample", type=int, default=100)
+parser.add_argument("--repeats", help="Number of runs, the best one is reported", type=int, default=3)
+args = parser.parse_args()
+
+
+def plot_data(num_samples, num_points):
+    """Builds data for a single line graph, similar to FastQC per base quality"""
+    random.seed(num_samples)
+    dataset = []
+    for s in range(num_samples):
+        dataset.append(
+            {
+                "name": "sample_{}".format(s),
+                "data": [[x, round(random.uniform(20, 40), 3)] for x in range(num_points)],
+                "color": "#5cb85c",
+            }
+        )
+    return {"mqc_linegraph_{}".format(num_samples): {"plot_type": "xy_line", "datasets": [dataset], "config": {}}}
+
+
+def best_time(function, string):
+    times = []
+    for _ in range(args.repeats):
+        start = time.time()
+        result = function(string)
+        times.append(time.time() - start)
+    return min(times), result
+
+
+print("{:>8} {:>12} {:>12} {:>12} {:>8}".format("samples", "JSON (kB)", "lzstring (s)", "multiqc (s)", "speedup"))
+for num_samples in args.samples:
+    json_string = json.dumps(plot_data(num_samples, args.points), cls=MQCJSONEncoder)
+    lzstring_time, expected = best_time(lzstring.LZString().compressToBase64, json_string)
+    multiqc_time, result = best_time(compression.compress_to_base64, json_string)
+    assert result == expected, "Compressed data differs from lzstring output"
+    print(
+        "{:>8} {:>12.1f} {:>12.3f} {:>12.3f} {:>8.1f}".format(
+            num_samples, len(json_string) / 1e3, lzstring_time, multiqc_time, lzstring_time / multiqc_time
+        )
+    )
@@ -0,0 +1,56 @@
+"""
+Measures figures rendered per second for flat (MatPlotLib) bar and line graphs, rendered one by one
+and in pools of worker processes (config.plots_flat_workers). Checks that every pool gives the same HTML.
+"""
+
+from __future__ import print_function
+import argparse
+import random
+import time
+
+from multiqc.plots import bargraph, linegraph, mpl_render
+from multiqc.utils import config, report
+
+parser = argparse.ArgumentParser(description="Benchmarks rendering flat plots in worker processes")
+parser.add_argument("--workers", help="Numbers of worker processes", type=int, nargs="+", default=[1, 2, 4, 8])
+parser.add_argument("--plots", help="Number of bar graphs and of line graphs", type=int, default=20)
+parser.add_argument("--samples", help="Number of samples in every plot", type=int, default=50)
+parser.add_argument("--points", help="Number of line graph points for every sample", type=int, default=200)
+args = parser.parse_args()
+
+
+def make_plots(num_plots, num_samples, num_points):
+    """Builds HTML of bar graphs with counts and percentages and of line graphs, like the sections of modules"""
+    random.seed(num_plots)
+    html = []
+    for p in range(num_plots):
+        bar_data = {
+            "sample_{}".format(s): {c: random.randint(0, 10**6) for c in ["aligned", "multimapped", "unmapped"]}
+            for s in range(num_samples)
+        }
+        html.append(bargraph.plot(bar_data, pconfig={"id": "bar_{}".format(p), "save_data_file": False}))
+        line_data = {
+            "sample_{}".format(s): {x: random.uniform(20, 40) for x in range(num_points)} for s in range(num_samples)
+        }
+        html.append(linegraph.plot(line_data, {"id": "line_{}".format(p), "save_data_file": False}))
+    return [mpl_render.insert_figures(h) for h in html]
+
+
+config.plots_force_flat = True
+num_figures = args.plots * 3  # bar graphs have a figure with counts and one with percentages
+expected = None
+print("{:>8} {:>8} {:>10} {:>14} {:>6}".format("workers", "figures", "time (s)", "figures / s", "same"))
+for workers in args.workers:
+    report.init()
+    config.plots_flat_workers = workers
+    start = time.time()
+    html = make_plots(args.plots, args.samples, args.points)
+    elapsed = time.time() - start
+    mpl_render.shutdown()
+    if expected is None:
+        expected = html
+    print(
+        "{:>8} {:>8} {:>10.2f} {:>14.2f} {:>6}".format(
+            workers, num_figures, elapsed, num_figures / elapsed, str(html == expected)
+        )
+    )
@@ -0,0 +1,59 @@
+"""
+Compares building line graph series point by point (linegraph.series_pairs) with NumPy arrays
+(linegraph.numeric_series_pairs), for growing numbers of samples with x and y limits set,
+and measures the whole linegraph.plot(). Checks that both builders give the same pairs.
+"""
+
+from __future__ import print_function
+import argparse
+import random
+import time
+
+from multiqc.plots import linegraph
+from multiqc.utils import config, report
+
+parser = argparse.ArgumentParser(description="Benchmarks building line graph series")
+parser.add_argument("--samples", help="Numbers of samples", type=int, nargs="+", default=[100, 1000])
+parser.add_argument("--points", help="Number of x values for every sample", type=int, default=10000)
+args = parser.parse_args()
+
+
+def line_data(num_samples, num_points):
+    """Builds histograms with integer x values and float y values, like coverage or insert sizes"""
+    random.seed(num_samples)
+    return {
+        "sample_{}".format(s): {x: round(random.uniform(0, 100), 2) for x in range(num_points)}
+        for s in range(num_samples)
+    }
+
+
+# Only the interactive plot, flat plots would spend the time on drawing the figure
+config.plots_force_interactive = True
+pconfig = {"id": "benchmark_linegraph", "xmax": args.points * 0.9, "ymin": 1, "ymax": 99}
+print("{:>8} {:>8} {:>14} {:>14} {:>10} {:>6}".format("samples", "points", "loop (s)", "numpy (s)", "plot (s)", "same"))
+for num_samples in args.samples:
+    data = line_data(num_samples, args.points)
+
+    # Sample by sample, so that the pairs of only one sample are kept at a time
+    loop_time = 0
+    numpy_time = 0
+    same = True
+    for d in data.values():
+        start = time.time()
+        loop_pairs = linegraph.series_pairs(d, pconfig)[0]
+        loop_time += time.time() - start
+        start = time.time()
+        numpy_pairs = linegraph.numeric_series_pairs(d, pconfig)[0]
+        numpy_time += time.time() - start
+        same = same and loop_pairs == numpy_pairs
+
+    report.init()
+    start = time.time()
+    linegraph.plot(data, dict(pconfig))
+    plot_time = time.time() - start
+
+    print(
+        "{:>8} {:>8} {:>14.2f} {:>14.2f} {:>10.2f} {:>6}".format(
+            num_samples, args.points, loop_time, numpy_time, plot_time, str(same)
+        )
+    )
@@ -0,0 +1,61 @@
+"""
+Measures size of a notebook and time of rendering its reports against the number of show() cells,
+with static assets inlined in every report and with assets shared between reports.
+
+Needs data already loaded with load() or add(), e.g.:
+    python benchmark_notebook_size.py --data_dir multiqc_output --module fastqc --cells 1 5 10 30
+"""
+
+from __future__ import print_function
+import argparse
+import json
+import time
+
+import multiqc
+from multiqc import multiqc as mqc
+from multiqc.utils import config
+
+parser = argparse.ArgumentParser(description="Benchmarks notebook size and render time against the number of cells")
+parser.add_argument("--data_dir", help="Output directory with jupyterlab_data", default=".")
+parser.add_argument("--module", help="Module to show", required=True)
+parser.add_argument("--samples", help="Number of samples in every report", type=int, default=5)
+parser.add_argument("--cells", help="Numbers of cells to benchmark", type=int, nargs="+", default=[1, 5, 10, 30])
+args = parser.parse_args()
+
+
+def notebook(outputs):
+    """Builds a minimal nbformat 4 notebook with one code cell for every HTML output"""
+    cells = []
+    for i, html in enumerate(outputs):
+        cells.append(
+            {
+                "cell_type": "code",
+                "execution_count": i + 1,
+                "metadata": {},
+                "source": ["m.show('{}', samples)".format(args.module)],
+                "outputs": [{"output_type": "display_data", "metadata": {}, "data": {"text/html": html}}],
+            }
+        )
+    return {"cells": cells, "metadata": {}, "nbformat": 4, "nbformat_minor": 5}
+
+
+config.output_dir = args.data_dir
+multiqc.init()
+samples = sorted(multiqc.get_samples(args.module))[: args.samples]
+
+print("{:>8} {:>8} {:>12} {:>10} {:>12}".format("mode", "cells", "size (MB)", "time (s)", "per cell (s)"))
+for shared in [False, True]:
+    for num_cells in args.cells:
+        config.jupyterlab_shared_assets = shared
+        mqc.template_cache["assets_shown"] = False  # new kernel
+        outputs = []
+        start = time.time()
+        for _ in range(num_cells):
+            outputs.append(multiqc.show([args.module], samples))
+        elapsed = time.time() - start
+        size = len(json.dumps(notebook(outputs), indent=1).encode("utf-8"))
+        print(
+            "{:>8} {:>8} {:>12.2f} {:>10.3f} {:>12.4f}".format(
+                "shared" if shared else "inline", num_cells, size / 1e6, elapsed, elapsed / num_cells
+            )
+        )
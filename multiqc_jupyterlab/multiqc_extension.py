@@ -19,18 +19,25 @@ class MultiQC(DOMWidget):
     # _view_module = Unicode(module_name).tag(sync=True)
     # _view_module_version = Unicode(module_version).tag(sync=True)
 
-    def __init__(self):
+    def __init__(self, shared_assets=None):
         super().__init__()
         multiqc.init()
+        if shared_assets is not None:
+            multiqc.config.jupyterlab_shared_assets = shared_assets
 
         print("MultiQC initialized in JupyterLab. Usage: \n"
-              "- load(data_dir, file_list, overwrite) \t- load new data, \n"
+              "- load(data_dir, file_list, overwrite, workers, incremental) \t- load new data, \n"
               "- add(multiqc_data) \t\t\t- add data directly from MultiQC run, \n"
               "- get_modules() \t\t\t- get a list of available modules, \n"
-              "- get_samples(module) \t\t\t- get list of samples for a given module, \n"
-              "- show(module, samples) \t\t- see the report for a given module and list of samples.")
-
-    def load(self, analysis_dir, file_list=False, overwrite=False):
+              "- get_samples(module, pattern) \t\t- get list of samples for a given module, \n"
+              "- find_samples(pattern, module) \t- search samples by name prefix or glob pattern, \n"
+              "- get_sources(sample, module) \t\t- get files a sample was loaded from, \n"
+              "- show(module, samples, anchor) \t- see the report for a given module and list of samples, \n"
+              "- show_general_stats(samples, columns) - see General Statistics of every load, \n"
+              "- get_general_stats_columns() \t\t- get a list of General Statistics columns, \n"
+              "- show_assets() \t\t\t- show scripts and styles shared by reports (with shared_assets=True).")
+
+    def load(self, analysis_dir, file_list=False, overwrite=False, workers=None, incremental=False):
         """
         Triggers multiqc load function
 
@@ -38,9 +45,11 @@ class MultiQC(DOMWidget):
         analysis_dir: Directory for with data to load
         file_list: False by default, True if more than one analysis_dir is given
         overwrite: False by default, True if user wants to overwrite al of the previous data
+        workers: None by default, number of processes running modules at the same time
+        incremental: False by default, True if only new or modified files should be loaded
 
         """
-        result = multiqc.load(analysis_dir, file_list, overwrite)
+        result = multiqc.load(analysis_dir, file_list, overwrite, workers, incremental)
         if result:
             print("Data from the given directory successfully loaded and saved in jupyterlab_data directory.")
         else:
@@ -60,32 +69,95 @@ class MultiQC(DOMWidget):
         else:
             print(result)
 
-    def show(self, module, samples):
+    def show(self, module, samples, anchor=None):
         """
         Triggers multiqc show function and displays it in the JupyterLab cell
 
         Parameters:
         module
         samples: list of samples
+        anchor: None by default, anchor of a single output of the module
 
         """
-        output_widget = multiqc.show(list(module.split(',')), samples)
+        output_widget = multiqc.show(list(module.split(',')), samples, anchor)
         display(HTML(output_widget))
 
-    def get_samples(self, module):
+    def show_general_stats(self, samples=None, columns=None):
+        """
+        Triggers multiqc show_general_stats function and displays it in the JupyterLab cell
+
+        Parameters:
+        samples: None by default, list of samples, all samples if None
+        columns: None by default, list of column keys, all columns if None
+
+        """
+        output_widget = multiqc.show_general_stats(samples, columns)
+        display(HTML(output_widget))
+
+    def get_general_stats_columns(self):
+        """
+        Triggers multiqc get_general_stats_columns function and displays it in the JupyterLab cell
+
+        """
+        columns = multiqc.get_general_stats_columns()
+        if not columns:
+            print("No General Statistics found.")
+        else:
+            display(columns)
+
+    def show_assets(self):
+        """
+        Triggers multiqc show_assets function and displays it in the JupyterLab cell.
+        Needed only with shared assets, when the output of the first report was cleared.
+
+        """
+        display(HTML(multiqc.show_assets()))
+
+    def get_samples(self, module, pattern=None):
         """
         Triggers multiqc get_samples function and displays it in the JupyterLab cell
 
         Parameters:
         module
+        pattern: None by default, glob pattern or prefix of sample names
 
         """
-        samples = multiqc.get_samples(module)
+        samples = multiqc.get_samples(module, pattern)
         if not samples:
             print("No samples for a given module found or wrong module specified.")
         else:
             display(samples)
 
+    def find_samples(self, pattern, module=None):
+        """
+        Triggers multiqc find_samples function and displays it in the JupyterLab cell
+
+        Parameters:
+        pattern: glob pattern or prefix of sample names
+        module: None by default, module to search in
+
+        """
+        samples = multiqc.find_samples(pattern, module)
+        if not samples:
+            print("No samples matching a given pattern found.")
+        else:
+            display(samples)
+
+    def get_sources(self, sample, module=None):
+        """
+        Triggers multiqc get_sources function and displays it in the JupyterLab cell
+
+        Parameters:
+        sample
+        module: None by default, module to search in
+
+        """
+        sources = multiqc.get_sources(sample, module)
+        if not sources:
+            print("No sources for a given sample found.")
+        else:
+            display(sources)
+
     def get_modules(self):
         """
         Triggers multiqc get_available_modules function and displays it in the JupyterLab cell
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Aleksandra Kukawka.
+# Distributed under the terms of the Modified BSD License.
+
+import json
+import random
+from collections import OrderedDict
+
+import pytest
+
+from multiqc.plots import bargraph
+
+CATS = OrderedDict([
+    ('assigned', {'name': 'Assigned', 'color': '#7cb5ec'}),
+    ('zeros', {'name': 'Only zeros'}),
+    ('negative', {'name': 'Negative'}),
+    ('missing', {'name': 'In no sample'}),
+    ('unassigned', {'name': 'Unassigned'}),
+])
+
+
+def bar_data(seed, num_samples):
+    """Read counts with missing values, empty samples and keys which are not categories"""
+    rng = random.Random(seed)
+    data = dict()
+    for s in range(num_samples):
+        row = {'assigned': rng.randint(0, 10 ** 6), 'zeros': 0, 'negative': -rng.random(),
+               'unassigned': rng.random() > 0.5, 'other': 1}
+        data['sample_{}'.format(s)] = {c: v for c, v in row.items() if rng.random() > 0.2} if s % 10 else dict()
+    return data
+
+
+def assert_same_series(d, samples, cats, pconfig):
+    # NaN for missing values, which are not equal to themselves
+    loop_series = bargraph.category_series(d, samples, cats, pconfig)
+    assert json.dumps(bargraph.numeric_category_series(d, samples, cats, pconfig)) == json.dumps(loop_series)
+    return loop_series
+
+
+@pytest.mark.parametrize('pconfig', [{}, {'hide_zero_cats': False}])
+@pytest.mark.parametrize('seed', range(3))
+def test_numeric_category_series_are_category_series(seed, pconfig):
+    d = bar_data(seed, 50)
+    samples, series = assert_same_series(d, sorted(d), CATS, pconfig)
+    assert len(samples) < 50
+    shown = ['Assigned', 'Unassigned'] if not pconfig else ['Assigned', 'Only zeros', 'Negative', 'Unassigned']
+    assert [s['name'] for s in series] == shown
+    assert series[0]['color'] == '#7cb5ec'
+
+
+def test_samples_and_categories_without_data():
+    d = {'s1': {'assigned': 5}, 's2': {}, 's3': {'unassigned': 2.5}}
+    samples, series = assert_same_series(d, ['s3', 's2', 's1'], CATS, {})
+    assert samples == ['s3', 's1']
+    assert json.dumps(series) == json.dumps([{'name': 'Assigned', 'data': [float('nan'), 5.0], 'color': '#7cb5ec'},
+                                             {'name': 'Unassigned', 'data': [2.5, float('nan')]}])
+    assert assert_same_series({'s1': {}, 's2': {'other': 3}}, ['s1', 's2'], CATS, {}) == ([], [])
+
+
+def test_not_numeric_values_use_category_series():
+    assert bargraph.numeric_category_series({'s1': {'assigned': 'n/a'}}, ['s1'], CATS, {}) is None
+    assert bargraph.numeric_category_series({'s1': {'assigned': None}}, ['s1'], CATS, {}) is None
+    assert bargraph.numeric_category_series({'s1': 5}, ['s1'], CATS, {}) is None
+    # NaN values count as data in category_series(), which shows categories with other values
+    d = {'s1': {'assigned': float('nan')}, 's2': {'assigned': 3}}
+    assert bargraph.numeric_category_series(d, ['s1', 's2'], CATS, {}) is None
+    assert json.dumps(bargraph.category_series(d, ['s1', 's2'], CATS, {})) == json.dumps(
+        (['s1', 's2'], [{'name': 'Assigned', 'data': [float('nan'), 3.0], 'color': '#7cb5ec'}]))
+    # and fails for categories with only NaN values
+    d = {'s1': {'assigned': float('nan')}}
+    assert bargraph.numeric_category_series(d, ['s1'], CATS, {}) is None
+    with pytest.raises(ValueError):
+        bargraph.category_series(d, ['s1'], CATS, {})
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Aleksandra Kukawka.
+# Distributed under the terms of the Modified BSD License.
+
+import json
+import random
+
+import lzstring
+import pytest
+
+from multiqc.utils.compression import compress_to_base64
+
+
+def random_string(seed, alphabet, length):
+    rng = random.Random(seed)
+    return ''.join(rng.choice(alphabet) for _ in range(length))
+
+
+@pytest.mark.parametrize('text', ['', 'a', 'aaaaaaaaaa', 'abcabcabcabc', None])
+def test_short_strings_match_lzstring(text):
+    assert compress_to_base64(text) == lzstring.LZString().compressToBase64(text)
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('alphabet', ['ab', '0123456789.,[]{}":', 'zażółć gęślą jaźń ÅÄÖ ß µ 日本語', 'ab€😀'])
+def test_random_strings_match_lzstring(seed, alphabet):
+    # up to thousands of characters, so the dictionary grows past several code widths
+    text = random_string(seed, alphabet, random.Random(seed).randint(1, 5000))
+    assert compress_to_base64(text) == lzstring.LZString().compressToBase64(text)
+
+
+def test_plot_data_matches_lzstring():
+    rng = random.Random(0)
+    data = {'sample_{}'.format(s): {x: round(rng.uniform(0, 100), 2) for x in range(300)} for s in range(20)}
+    text = json.dumps(data)
+    assert compress_to_base64(text) == lzstring.LZString().compressToBase64(text)
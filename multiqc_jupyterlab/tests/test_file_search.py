@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Aleksandra Kukawka.
+# Distributed under the terms of the Modified BSD License.
+
+import concurrent.futures
+import os
+
+import pytest
+
+from multiqc.utils import config, report
+
+SEARCH_PATTERNS = {
+    'mod_a/log': {'fn': '*_a.log'},
+    'mod_b/stats': {'contents': 'B stats', 'num_lines': 2},
+    'mod_c/version': {'fn_re': r'.+\.txt$', 'contents_re': r'^C version \d+'},
+    'mod_d/text': {'fn': '*.txt', 'shared': True},
+    'mod_e/output': [{'fn': 'e_*.tsv'}, {'contents': 'E tool', 'exclude_fn': 'skip_*'}],
+}
+
+FILES = {
+    's1_a.log': 'A log\n',
+    's2_a.log': 'B stats\n',  # matched by name first, so mod_b doesn't get it
+    'b.out': 'header\nB stats here\n',
+    'b_late.out': 'header\nnothing\nB stats too late\n',
+    'c.txt': 'header\n' * 4 + 'C version 2\n',
+    'plain.txt': 'no version\n',
+    'e_1.tsv': 'x\ty\n',
+    'e_tool.log': 'made by E tool\n',
+    'skip_e.log': 'made by E tool\n',
+    'image.png': 'made by E tool\n',
+}
+
+
+def write_files(directory, files):
+    os.makedirs(directory, exist_ok=True)
+    for fn, text in files.items():
+        with open(os.path.join(directory, fn), 'w') as f:
+            f.write(text)
+
+
+@pytest.fixture
+def search(monkeypatch):
+    monkeypatch.setattr(config, 'sp', SEARCH_PATTERNS)
+
+    def search(*analysis_dir):
+        monkeypatch.setattr(config, 'analysis_dir', list(analysis_dir))
+        report.init()
+        report.get_filelist(['mod_a', 'mod_b', 'mod_c', 'mod_d', 'mod_e'])
+        return {key: sorted(os.path.join(os.path.relpath(f['root'], analysis_dir[0]), f['fn']) for f in files)
+                for key, files in report.files.items()}
+
+    return search
+
+
+def test_files_match_search_patterns_in_order(tmp_path, search):
+    write_files(str(tmp_path), FILES)
+    assert search(str(tmp_path)) == {
+        'mod_a/log': ['./s1_a.log', './s2_a.log'],
+        'mod_b/stats': ['./b.out'],
+        'mod_c/version': ['./c.txt'],
+        'mod_d/text': ['./c.txt', './plain.txt'],
+        'mod_e/output': ['./e_1.tsv', './e_tool.log'],
+    }
+    # skip_e.log is excluded after it matched, so only b_late.out and image.png match nothing
+    assert report.file_search_stats['skipped_no_match'] == 2
+
+
+def test_search_file_reads_only_needed_lines(tmp_path):
+    write_files(str(tmp_path), {'b.out': 'header\nB stats here\n' + 'more\n' * 100})
+    f = {'fn': 'b.out', 'root': str(tmp_path)}
+    search_f = report.SearchFile(f)
+    try:
+        assert report.search_file({'contents': 'B stats', 'num_lines': 2}, f, 'mod_b', search_f)
+        assert len(search_f.lines) == 2
+        assert not report.search_file({'contents': 'stats\nmore'}, f, 'mod_b', search_f)
+        assert report.search_file({'contents_re': r'^more$'}, f, 'mod_b', search_f)
+        assert len(search_f.lines) == 102
+        # patterns searched alone read the file themselves, with the same results
+        for pattern in [{'contents': 'B stats', 'num_lines': 1}, {'fn': 'b.*', 'contents': 'more'},
+                        {'fn_re': 'x', 'contents': 'more'}]:
+            assert report.search_file(pattern, f, 'mod_b', search_f) == report.search_file(pattern, f, 'mod_b')
+    finally:
+        search_f.close()
+
+
+def write_tree(top):
+    for i in range(3):
+        for j in range(3):
+            write_files(os.path.join(top, 'run_{}'.format(i), 'lane_{}'.format(j)), FILES)
+        write_files(os.path.join(top, 'run_{}'.format(i), 'ignored_dir'), FILES)
+    write_files(top, FILES)
+
+
+def test_parallel_walk_is_os_walk(tmp_path):
+    write_tree(str(tmp_path))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        walked = [(root, dirnames, filenames)
+                  for root, dirnames, filenames, _ in report.parallel_walk(str(tmp_path), False, executor)]
+    assert walked == list(os.walk(str(tmp_path), topdown=True))
+
+
+@pytest.mark.parametrize('threads', [2, 8])
+def test_threads_find_the_same_files(tmp_path, search, monkeypatch, threads):
+    write_tree(str(tmp_path))
+    monkeypatch.setattr(config, 'fn_ignore_dirs', config.fn_ignore_dirs + ['ignored_*'])
+    found = search(str(tmp_path))
+    searchfiles = report.searchfiles
+    file_search_stats = report.file_search_stats
+    monkeypatch.setattr(config, 'file_search_threads', threads)
+    assert search(str(tmp_path)) == found
+    assert report.searchfiles == searchfiles and report.file_search_stats == file_search_stats
+    assert len(found['mod_a/log']) == 20
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Aleksandra Kukawka.
+# Distributed under the terms of the Modified BSD License.
+
+import json
+
+import numpy as np
+import pytest
+
+from multiqc.utils import report
+from multiqc.utils.util_functions import MQCJSONEncoder
+
+
+@pytest.mark.parametrize('indent', [None, 1])
+def test_nonfinite_floats_are_null(indent):
+    data = {'a': [float('nan'), float('inf'), (1, float('-inf'))], 'b': {'c': 2.5}}
+    expected = {'a': [None, None, [1, None]], 'b': {'c': 2.5}}
+    assert json.loads(json.dumps(data, cls=MQCJSONEncoder, indent=indent)) == expected
+
+
+@pytest.mark.parametrize('indent', [None, 1])
+def test_numpy_nonfinite_floats_are_null(indent):
+    data = {'a': [np.float64('nan'), np.float64('inf'), (1, np.float64('-inf'))], 'b': np.float64(2.5)}
+    assert json.loads(json.dumps(data, cls=MQCJSONEncoder, indent=indent)) == {'a': [None, None, [1, None]], 'b': 2.5}
+
+
+def test_compress_json_numpy_nan():
+    assert report.compress_json({'x': np.float64('nan')}) == report.compress_json({'x': None})
+
+
+@pytest.mark.parametrize('indent', [None, 1])
+def test_circular_reference_is_an_error(indent):
+    data = {'a': [float('nan')]}
+    data['b'] = data
+    with pytest.raises(ValueError, match='Circular reference detected'):
+        json.dumps(data, cls=MQCJSONEncoder, indent=indent)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Aleksandra Kukawka.
+# Distributed under the terms of the Modified BSD License.
+
+import json
+import multiprocessing
+import os
+
+import pytest
+
+from multiqc.utils import jupyterlab_catalog
+
+
+def write_data_sources(jupyterlab_dir, data_sources):
+    """Writes data source files the way jupyterlab_data.write_data_source() numbers them"""
+    data_sources_dir = os.path.join(jupyterlab_dir, 'data_sources')
+    os.makedirs(data_sources_dir)
+    for i, data_source in enumerate(data_sources):
+        fn = 'data_source.json' if i == 0 else 'data_source_{}.json'.format(i + 1)
+        with open(os.path.join(data_sources_dir, fn), 'w') as f:
+            json.dump(data_source, f)
+
+
+def count_modules(jupyterlab_dir):
+    try:
+        return len(jupyterlab_catalog.get_modules(jupyterlab_dir))
+    except Exception as e:
+        return repr(e)
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='kernels are forked processes')
+def test_concurrent_readers_catalog_each_data_source_once(tmp_path):
+    data_sources = [{'Module {}'.format(i % 3): {'all_sections': {'sample_{}_{}'.format(i, j): '/data/{}'.format(j)
+                                                                  for j in range(50)}}}
+                    for i in range(200)]
+    for run in range(3):
+        jupyterlab_dir = str(tmp_path / str(run))
+        write_data_sources(jupyterlab_dir, data_sources)
+        with multiprocessing.get_context('fork').Pool(6) as pool:
+            assert pool.map(count_modules, [jupyterlab_dir] * 6) == [3] * 6
+        assert len(jupyterlab_catalog.get_samples(jupyterlab_dir, 'module 0')) == 67 * 50
+
+
+def test_queries_keep_the_load_order(tmp_path):
+    jupyterlab_dir = str(tmp_path)
+    write_data_sources(jupyterlab_dir, [
+        {'FastQC': {'all_sections': {'SRR2': '/data/SRR2.zip', 'SRR10': '/data/SRR10.zip'}}},
+        {'Cutadapt': {'all_sections': {'SRR10': '/data/SRR10.log', 'ERR1': '/data/ERR1.log'}},
+         'FastQC': {'all_sections': {'SRR1': '/data/SRR1.zip', 'SRR2': '/data/SRR2_new.zip'}}},
+    ])
+    jupyterlab_catalog.update_catalog(jupyterlab_dir)
+    assert jupyterlab_catalog.get_modules(jupyterlab_dir) == ['FastQC', 'Cutadapt']
+    assert jupyterlab_catalog.get_samples(jupyterlab_dir, 'fastqc') == ['SRR2', 'SRR10', 'SRR1']
+    assert jupyterlab_catalog.get_samples(jupyterlab_dir, 'FastQC', 'SRR1') == ['SRR10', 'SRR1']
+    assert jupyterlab_catalog.get_samples(jupyterlab_dir, 'FastQC', 'SRR?') == ['SRR2', 'SRR1']
+    assert jupyterlab_catalog.get_samples(jupyterlab_dir, 'FastQC', '*[02]') == ['SRR2', 'SRR10']
+    assert jupyterlab_catalog.find_samples(jupyterlab_dir, 'SRR1') == [('FastQC', 'SRR10'), ('Cutadapt', 'SRR10'),
+                                                                       ('FastQC', 'SRR1')]
+    assert jupyterlab_catalog.find_samples(jupyterlab_dir, '*R1', 'cutadapt') == [('Cutadapt', 'ERR1')]
+    assert jupyterlab_catalog.get_sources(jupyterlab_dir, 'SRR2') == [('FastQC', 'all_sections', '/data/SRR2.zip'),
+                                                                      ('FastQC', 'all_sections', '/data/SRR2_new.zip')]
+
+    # removed and added data source files are found by the next update
+    os.remove(os.path.join(jupyterlab_dir, 'data_sources', 'data_source.json'))
+    with open(os.path.join(jupyterlab_dir, 'data_sources', 'data_source_3.json'), 'w') as f:
+        json.dump({'Qualimap': {'all_sections': {'SRR3': '/data/SRR3'}}}, f)
+    assert jupyterlab_catalog.get_modules(jupyterlab_dir) == ['FastQC', 'Cutadapt']
+    jupyterlab_catalog.update_catalog(jupyterlab_dir)
+    assert jupyterlab_catalog.get_modules(jupyterlab_dir) == ['Cutadapt', 'FastQC', 'Qualimap']
+    assert jupyterlab_catalog.get_samples(jupyterlab_dir, 'fastqc') == ['SRR1', 'SRR2']
@@ -0,0 +1,378 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Aleksandra Kukawka.
+# Distributed under the terms of the Modified BSD License.
+
+import io
+import json
+import os
+import shutil
+import stat
+import threading
+import time
+
+import pytest
+
+import multiqc
+from multiqc import multiqc as multiqc_main
+from multiqc.utils import config, jupyterlab_catalog, jupyterlab_data, report
+
+EXAMPLE_DATA = os.path.join(os.path.dirname(__file__), '..', '..', 'examples', 'data2', 'data')
+QUALIMAP_DIR = os.path.join('piper_ngi', '06_final_alignment_qc', 'P4107_1001.clean.dedup.qc',
+                            'raw_data_qualimapReport')
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    path = str(tmp_path / 'data')
+    shutil.copytree(EXAMPLE_DATA, path)
+    return path
+
+
+@pytest.fixture
+def use_jupyterlab_dir(tmp_path, monkeypatch):
+    multiqc.init()
+
+    def use(name):
+        jupyterlab_dir = str(tmp_path / name)
+        monkeypatch.setattr(config, 'jupyterlab_dir', jupyterlab_dir)
+        monkeypatch.setattr(config, 'data_sources_dir', os.path.join(jupyterlab_dir, 'data_sources'))
+        return jupyterlab_dir
+
+    return use
+
+
+def write_custom_content(data_dir, name, count):
+    """Writes a custom content file, each id is a separate output of the custom_content module"""
+    with open(os.path.join(data_dir, '{}_mqc.txt'.format(name)), 'w') as f:
+        f.write("# id: 'cc_{0}'\n"
+                "# section_name: 'Custom {0}'\n"
+                "# description: 'Counts of the {0} custom content file'\n"
+                "# plot_type: 'bargraph'\n"
+                "# pconfig:\n"
+                "#    id: 'cc_{0}_plot'\n"
+                "Sample\tCount\n"
+                "sample_a\t{1}\n"
+                "sample_b\t20\n".format(name, count))
+
+
+def write_module(jupyterlab_dir, module, *plot_data):
+    """Writes plot data of a module the way save_module_output() does, a data file for every load"""
+    module_dir = os.path.join(jupyterlab_dir, module)
+    os.makedirs(module_dir)
+    jupyterlab_data.write_module_outputs(module_dir, [{'sections': [], 'anchor': module, 'name': module, 'intro': ''}])
+    for data in plot_data:
+        jupyterlab_data.write_plot_data(module_dir, data)
+    return module_dir
+
+
+def bar_and_line_data(samples):
+    """Bar graph, beeswarm and line graph with values made from sample names, e.g. 12 for s12"""
+    values = [int(sample[1:].split(' ')[0]) for sample in samples]
+    return {
+        'bar': {'plot_type': 'bar_graph', 'samples': [samples, samples[:1]], 'config': {},
+                'datasets': [[{'name': 'a', 'data': values}, {'name': 'b', 'data': [-v for v in values]}],
+                             [{'name': 'a', 'data': values[:1]}]]},
+        'beeswarm': {'plot_type': 'beeswarm', 'samples': [samples], 'datasets': [values], 'config': {}},
+        'line': {'plot_type': 'xy_line', 'config': {},
+                 'datasets': [[{'name': sample, 'data': [[0, v], [1, v * 2]]} for sample, v in zip(samples, values)]]},
+    }
+
+
+def change_file(path):
+    """Changes a digit a quarter into the file, keeping its size"""
+    with open(path) as f:
+        text = f.read()
+    idx = next(i for i in range(len(text) // 4, len(text)) if text[i] in '12345678')
+    with open(path, 'w') as f:
+        f.write(text[:idx] + str(int(text[idx]) + 1) + text[idx + 1:])
+
+
+def series(content):
+    """Data of every sample in a plot, so plots with samples in a different order can be compared"""
+    result = dict()
+    if content['plot_type'] in ['bar_graph', 'beeswarm']:
+        for i, samples in enumerate(content['samples']):
+            for idx, sample in enumerate(samples):
+                if content['plot_type'] == 'beeswarm':
+                    result[(i, sample)] = content['datasets'][i][idx]
+                else:
+                    result[(i, sample)] = [el['data'][idx] for el in content['datasets'][i]]
+    elif content['plot_type'] in ['scatter', 'xy_line']:
+        for i, dataset in enumerate(content['datasets']):
+            for el in dataset:
+                result[(i, el['name'])] = el
+    else:
+        result = content
+    return result
+
+
+def combined_plots(jupyterlab_dir):
+    """Plots of combine_output for every module and all of its samples"""
+    plots = dict()
+    for module in sorted(os.listdir(jupyterlab_dir)):
+        module_dir = os.path.join(jupyterlab_dir, module)
+        if not os.path.exists(os.path.join(module_dir, jupyterlab_data.INDEX_FN)):
+            continue
+        samples = list(jupyterlab_data.read_index(module_dir)['samples'])
+        multiqc_main.combine_output(module, samples)
+        for plot, content in report.plot_data.items():
+            plots[(module, plot)] = series(content)
+    return plots
+
+
+def test_incremental_load_replaces_samples_only_in_plots_of_changed_files(data_dir, use_jupyterlab_dir):
+    jupyterlab_dir = use_jupyterlab_dir('incremental')
+    assert multiqc.load(data_dir, False, False) is True
+    before = combined_plots(jupyterlab_dir)
+
+    # Qualimap makes the insert size plot from this file and other plots of the sample from other files
+    change_file(os.path.join(data_dir, QUALIMAP_DIR, 'insert_size_histogram.txt'))
+    assert multiqc.load(data_dir, False, False, incremental=True) is True
+    incremental = combined_plots(jupyterlab_dir)
+
+    use_jupyterlab_dir('full')
+    assert multiqc.load(data_dir, False, False) is True
+    full = combined_plots(config.jupyterlab_dir)
+
+    assert incremental.keys() == full.keys() == before.keys()
+    for plot in full:
+        assert incremental[plot] == full[plot], plot
+    assert [plot for plot in full if full[plot] != before[plot]] == [('qualimap', 'qualimap_insert_size')]
+
+
+def test_incremental_load_skips_unchanged_files(data_dir, use_jupyterlab_dir, monkeypatch):
+    jupyterlab_dir = use_jupyterlab_dir('jupyterlab_data')
+    multiqc.load(data_dir, False, False)
+    manifest = jupyterlab_data.read_manifest(jupyterlab_dir)
+    assert manifest and all(record['hash'] is None for record in manifest.values())
+
+    hashed = []
+    file_hash = jupyterlab_data.file_hash
+    monkeypatch.setattr(jupyterlab_data, 'file_hash', lambda path: hashed.append(path) or file_hash(path))
+    plot_data_dir = os.path.join(jupyterlab_dir, 'qualimap', 'plot_data')
+
+    def load():
+        del hashed[:]
+        multiqc.load(data_dir, False, False, incremental=True)
+        return sorted(os.listdir(plot_data_dir))
+
+    data_files = load()
+    assert hashed == []
+
+    # a file loaded before without a hash is loaded again, with a hash
+    path = os.path.abspath(os.path.join(data_dir, QUALIMAP_DIR, 'insert_size_histogram.txt'))
+    os.utime(path, (1e9, 1e9))
+    assert len(load()) == len(data_files) + 1
+    assert jupyterlab_data.read_manifest(jupyterlab_dir)[path]['hash'] is not None
+
+    # a file with the same contents is skipped and its new mtime is kept
+    data_files = load()
+    os.utime(path, (2e9, 2e9))
+    assert load() == data_files
+    assert hashed == [path]
+    assert jupyterlab_data.read_manifest(jupyterlab_dir)[path]['mtime'] == 2e9
+    assert load() == data_files
+    assert hashed == []
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='file modes are not set by the umask on Windows')
+def test_atomic_write_applies_umask(tmp_path):
+    path = str(tmp_path / 'data.json')
+    old_umask = os.umask(0o027)
+    try:
+        with jupyterlab_data.atomic_write(path) as f:
+            f.write('{}')
+        assert os.umask(0o027) == 0o027
+    finally:
+        os.umask(old_umask)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
+
+
+def test_atomic_write_keeps_previous_file_on_error(tmp_path):
+    path = str(tmp_path / 'data.json')
+    with jupyterlab_data.atomic_write(path) as f:
+        f.write('{}')
+    with pytest.raises(RuntimeError):
+        with jupyterlab_data.atomic_write(path) as f:
+            f.write('{"cut": ')
+            raise RuntimeError()
+    with open(path) as f:
+        assert f.read() == '{}'
+    assert os.listdir(str(tmp_path)) == ['data.json']
+
+
+def test_locked_is_held_by_one_thread_at_a_time(tmp_path):
+    jupyterlab_dir = str(tmp_path / 'jupyterlab_data')
+    holders = []
+    overlaps = []
+
+    def write():
+        for _ in range(20):
+            with jupyterlab_data.locked(jupyterlab_dir):
+                with jupyterlab_data.locked(jupyterlab_dir):  # re-entrant, e.g. write_plot_data() in load()
+                    holders.append(threading.current_thread())
+                    overlaps.append(len(holders) > 1)
+                    time.sleep(0.001)
+                    holders.remove(threading.current_thread())
+
+    threads = [threading.Thread(target=write) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(overlaps) == 80 and not any(overlaps)
+    assert jupyterlab_data.lock_state == {'depth': 0, 'file': None}
+
+
+def test_incremental_load_keeps_each_output_of_a_module_once(data_dir, use_jupyterlab_dir):
+    jupyterlab_dir = use_jupyterlab_dir('incremental')
+    write_custom_content(data_dir, 'first', 10)
+    write_custom_content(data_dir, 'second', 15)
+    assert multiqc.load(data_dir, False, False) is True
+    write_custom_content(data_dir, 'first', 12)
+    assert multiqc.load(data_dir, False, False, incremental=True) is True
+    incremental = combined_plots(jupyterlab_dir)
+
+    module_dir = os.path.join(jupyterlab_dir, 'custom_content')
+    with open(os.path.join(module_dir, jupyterlab_data.MODULE_OUTPUT_FN)) as f:
+        assert sorted(json.loads(line)['anchor'] for line in f) == ['cc_first', 'cc_second']
+    outputs = jupyterlab_data.read_module_outputs(module_dir)
+    assert [m['anchor'] for m in outputs] == ['cc_first', 'cc_second']
+    for module_output in outputs:
+        assert 'cc_{}_plot'.format(module_output['anchor'][3:]) in module_output['sections'][0]['plot']
+    assert [m['name'] for m in jupyterlab_data.read_module_outputs(module_dir, 'cc_second')] == ['Custom second']
+
+    use_jupyterlab_dir('full')
+    assert multiqc.load(data_dir, False, False) is True
+    full = combined_plots(config.jupyterlab_dir)
+    assert incremental == full
+    assert full[('custom_content', 'cc_first_plot')][(0, 'sample_a')] == [12]
+
+
+def test_module_outputs_survive_cut_records_and_old_files(tmp_path):
+    module_dir = str(tmp_path)
+
+    def output(anchor):
+        return {'anchor': anchor, 'name': anchor.title(), 'intro': '',
+                'sections': [{'anchor': anchor + '-1', 'plot': '<div id="{}_plot">ü</div>'.format(anchor),
+                              'content': None, 'print_section': True}]}
+
+    # module_output.json of an older version holds outputs separated by commas
+    with open(os.path.join(module_dir, jupyterlab_data.OLD_MODULE_OUTPUT_FN), 'w') as f:
+        f.write(json.dumps(output('old')) + ',' + json.dumps(output('older')))
+    assert [m['anchor'] for m in jupyterlab_data.read_module_outputs(module_dir)] == ['old', 'older']
+    jupyterlab_data.write_module_outputs(module_dir, [output('first'), output('old')])
+    assert not os.path.exists(os.path.join(module_dir, jupyterlab_data.OLD_MODULE_OUTPUT_FN))
+
+    # a record cut by a crash is skipped and the next record starts on a new line
+    records_path = os.path.join(module_dir, jupyterlab_data.MODULE_OUTPUT_FN)
+    with open(records_path, 'rb+') as f:
+        f.truncate(os.path.getsize(records_path) - 10)
+    jupyterlab_data.write_module_outputs(module_dir, [output('second')])
+    assert jupyterlab_data.read_module_outputs(module_dir) == [output('old'), output('older'), output('second')]
+
+
+def test_combine_output_selects_samples_of_every_data_file(use_jupyterlab_dir):
+    write_module(use_jupyterlab_dir('jupyterlab_data'), 'mod', bar_and_line_data(['s1', 's2 R1', 's2 R2', 's3']),
+                 bar_and_line_data(['s4', 's1', 's5']))
+    multiqc_main.combine_output('Mod', ['s1', 's2', 's4', 'missing'])
+    assert report.modules_output[0]['anchor'] == 'mod'
+    assert report.plot_data['bar']['samples'] == [['s1', 's2 R1', 's2 R2', 's4'], ['s1', 's4']]
+    assert report.plot_data['bar']['datasets'] == [[{'name': 'a', 'data': [1, 2, 2, 4]},
+                                                    {'name': 'b', 'data': [-1, -2, -2, -4]}],
+                                                   [{'name': 'a', 'data': [1, 4]}]]
+    assert report.plot_data['beeswarm']['samples'] == [['s1', 's2 R1', 's2 R2', 's4']]
+    assert report.plot_data['beeswarm']['datasets'] == [[1, 2, 2, 4]]
+    assert [el['name'] for el in report.plot_data['line']['datasets'][0]] == ['s1', 's2 R1', 's2 R2', 's4']
+    assert report.plot_data['line']['datasets'][0][3]['data'] == [[0, 4], [1, 8]]
+
+
+def heatmap(xcats, ycats):
+    """Heatmap with cells named after their column and row, e.g. 'c1/s2'"""
+    data = [[x, y, '{}/{}'.format(xcat, ycat)] for y, ycat in enumerate(ycats) for x, xcat in enumerate(xcats)]
+    return {'plot_type': 'heatmap', 'xcats': xcats, 'ycats': ycats, 'data': data, 'config': {}}
+
+
+def test_combine_output_selects_heatmap_rows_and_columns_of_samples(use_jupyterlab_dir):
+    jupyterlab_dir = use_jupyterlab_dir('jupyterlab_data')
+    jupyterlab_data.write_data_source(config.data_sources_dir, {'Mod': {'all_sections': {
+        's{}'.format(i): '/data/s{}.txt'.format(i) for i in range(1, 5)}}})
+    jupyterlab_catalog.update_catalog(jupyterlab_dir)
+    write_module(jupyterlab_dir, 'mod', {
+        'rows': heatmap(['c1', 'c2'], ['s1', 's2', 's3']),
+        'matrix': heatmap(['s1', 's2', 's3'], ['s1', 's2', 's3']),
+        'other': heatmap(['c1', 'c2'], ['r1', 'r2']),
+    }, {
+        'rows': heatmap(['c1', 'c2'], ['s4', 's1']),
+        'matrix': heatmap(['s4', 's1'], ['s4', 's1']),
+    })
+    multiqc_main.combine_output('mod', ['s1', 's3', 's4'])
+
+    rows = report.plot_data['rows']
+    assert rows['xcats'] == ['c1', 'c2'] and rows['ycats'] == ['s1', 's3', 's4']
+    assert {(rows['xcats'][x], rows['ycats'][y]): value for x, y, value in rows['data']} == {
+        (xcat, ycat): '{}/{}'.format(xcat, ycat) for xcat in ['c1', 'c2'] for ycat in ['s1', 's3', 's4']}
+    assert len(rows['data']) == 6
+
+    # a sample by sample matrix keeps the selected sub-matrix, with cells of both files
+    matrix = report.plot_data['matrix']
+    assert matrix['xcats'] == ['s1', 's3', 's4'] and matrix['ycats'] == ['s1', 's3', 's4']
+    assert sorted((matrix['xcats'][x], matrix['ycats'][y]) for x, y, _ in matrix['data']) == [
+        ('s1', 's1'), ('s1', 's3'), ('s1', 's4'), ('s3', 's1'), ('s3', 's3'), ('s4', 's1'), ('s4', 's4')]
+    assert all(value == '{}/{}'.format(matrix['xcats'][x], matrix['ycats'][y]) for x, y, value in matrix['data'])
+
+    # heatmaps without samples are shown whole
+    assert report.plot_data['other'] == heatmap(['c1', 'c2'], ['r1', 'r2'])
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 8, 1 << 20])
+def test_json_object_stream_skips_values_split_across_reads(chunk_size):
+    data = {
+        'quotes': 'a "quoted" {not an object} [nor a list]',
+        'backslashes': ['\\', 'ends with \\', '\\"', '\\\\"}]', {'path': 'C:\\data\\"x"'}],
+        'kept': {'nested': [[], {}, [{'a': '}'}], '"', 'zażółć 日本 😀'], 'number': -2.5e-3},
+        'numbers': [1, -2.5, 1e10, True, False, None],
+        'empty': {},
+        'last': 'b\\',
+    }
+    text = json.dumps(data, indent=1, ensure_ascii=False) + json.dumps(data)
+    stream = jupyterlab_data.JSONObjectStream(io.StringIO(text), chunk_size)
+    for _ in range(2):
+        for i, key in enumerate(stream.keys()):
+            if key == 'kept':
+                assert stream.decode() == data['kept']
+            else:
+                stream.skip()
+            assert key == list(data)[i]
+    assert stream.next_char() is None
+
+
+def test_npy_plot_data_format_gives_the_same_plot_data(use_jupyterlab_dir, monkeypatch):
+    jupyterlab_dir = use_jupyterlab_dir('jupyterlab_data')
+    samples = ['s1', 's2', 's3']
+    line = {'plot_type': 'xy_line', 'config': {}, 'datasets': [[
+        {'name': 's1', 'data': [[x, x * 0.5] for x in range(100)]},  # int x, float y
+        {'name': 's2', 'data': [[0.5, 1], [1.5, 2 ** 60], [2.5, -3]]},  # y saved as floats, equal to the ints
+        {'name': 's3', 'data': [[1, None], [2, 3.0]]},  # not a numeric series
+    ], [
+        {'name': 's1', 'data': [[2 ** 53, -2 ** 53]], 'color': '#000000'},
+        {'name': 's2', 'data': []},
+        {'name': 's3', 'data': {'1': 2}},
+    ]]}
+    plot_data = {'line': line, 'bar': bar_and_line_data(samples)['bar']}
+
+    shown = dict()
+    for plot_data_format in ['json', 'npy']:
+        monkeypatch.setattr(config, 'jupyterlab_plot_data_format', plot_data_format)
+        module_dir = write_module(jupyterlab_dir, plot_data_format, plot_data, bar_and_line_data(['s4']))
+        multiqc_main.combine_output(plot_data_format, samples)
+        shown[plot_data_format] = report.plot_data
+    assert sorted(os.listdir(os.path.join(module_dir, 'plot_data'))) == ['data.json', 'data.npy', 'data_1.json',
+                                                                         'data_1.npy']
+    assert shown['npy'] == shown['json']
+    assert shown['npy']['line'] == line
+    # integer series are read back as integers
+    assert [type(v) for point in shown['npy']['line']['datasets'][1][0]['data'] for v in point] == [int, int]
+    assert [type(v) for point in shown['npy']['line']['datasets'][0][0]['data'][:1] for v in point] == [int, float]
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Aleksandra Kukawka.
+# Distributed under the terms of the Modified BSD License.
+
+import random
+
+import numpy as np
+import pytest
+
+from multiqc.plots import linegraph
+
+
+def random_pairs(seed, num_points):
+    rng = random.Random(seed)
+    x = sorted(rng.sample(range(10 * num_points), num_points))
+    return [[xi, round(rng.gauss(0, 10), 2)] for xi in x]
+
+
+@pytest.mark.parametrize('method', ['lttb', 'minmax'])
+@pytest.mark.parametrize('num_points', [5, 101, 1000, 4321])
+@pytest.mark.parametrize('max_points', [4, 5, 10, 99, 1000])
+def test_downsampled_series_keeps_endpoints_within_budget(method, num_points, max_points):
+    pairs = random_pairs(num_points, num_points)
+    kept = linegraph.downsample_series(pairs, max_points, method)
+    if num_points <= max_points:
+        assert kept is pairs
+        return
+    assert len(kept) <= max_points
+    assert kept[0] is pairs[0] and kept[-1] is pairs[-1]
+    # points of the series, in their order
+    positions = [pairs.index(pair) for pair in kept]
+    assert positions == sorted(set(positions))
+    assert linegraph.downsample_series(pairs, max_points, method, np.array(pairs, dtype=float)) == kept
+
+
+@pytest.mark.parametrize('method', ['lttb', 'minmax'])
+def test_downsampled_series_keeps_peaks(method):
+    pairs = [[x, 1.0] for x in range(1000)]
+    pairs[123][1] = 50.0
+    pairs[600][1] = -20.0
+    kept = linegraph.downsample_series(pairs, 20, method)
+    assert [123, 50.0] in kept and [600, -20.0] in kept
+    if method == 'minmax':
+        pairs = random_pairs(0, 1000)
+        kept = linegraph.downsample_series(pairs, 100, method)
+        assert max(kept, key=lambda p: p[1]) == max(pairs, key=lambda p: p[1])
+        assert min(kept, key=lambda p: p[1]) == min(pairs, key=lambda p: p[1])
+
+
+def test_series_which_cant_be_downsampled_are_kept():
+    pairs = random_pairs(0, 100)
+    assert linegraph.downsample_series(pairs, 3) is pairs
+    assert linegraph.downsample_series(pairs, 10, 'average') is pairs
+    pairs[50][1] = None
+    assert linegraph.downsample_series(pairs, 10) is pairs
+    pairs[50][1] = float('nan')
+    assert linegraph.downsample_series(pairs, 10) is pairs
+
+
+SERIES_CONFIGS = [
+    {},
+    {'xmin': 10, 'xmax': '30.5'},
+    {'ymax': 5},
+    {'ymax': 5, 'xmax': 25},  # points above are discarded or hidden depending on the last one in the plot
+    {'ymin': -5},
+    {'ymin': -5, 'xmin': 20, 'ymax': 100},
+    {'ymax': 1000, 'ymin': -1000},
+]
+
+
+@pytest.mark.parametrize('series_config', SERIES_CONFIGS)
+@pytest.mark.parametrize('values', [
+    {x: 10 * np.sin(x / 5) for x in range(40)},  # int x, float y
+    {x / 2: (x * 7) % 13 - 6 for x in range(40, 0, -1)},  # float x, int y
+    {x: -abs(x - 20) for x in range(40)},  # below zero
+    {x: 8 for x in range(40)},  # only above ymax
+])
+def test_numeric_series_pairs_are_series_pairs(values, series_config):
+    pairs, maxval = linegraph.series_pairs(values, series_config)
+    numeric_pairs, numeric_maxval, xy = linegraph.numeric_series_pairs(values, series_config)
+    assert numeric_pairs == pairs
+    assert [type(v) for pair in numeric_pairs for v in pair] == [type(v) for pair in pairs for v in pair]
+    assert numeric_maxval == maxval
+    assert xy.tolist() == [[float(x), float(y)] for x, y in pairs]
+
+
+def test_numeric_series_pairs_discard_ymax_as_series_pairs():
+    values = {x: 10 if x in (3, 8) else 1 for x in range(10)}
+    # the last point above is followed by one in the plot, so points above are only hidden
+    assert linegraph.numeric_series_pairs(values, {'ymax': 5})[0] == linegraph.series_pairs(values, {'ymax': 5})[0]
+    assert len(linegraph.numeric_series_pairs(values, {'ymax': 5})[0]) == 10
+    # the last point in the plot is above, so points above are discarded
+    series_config = {'ymax': 5, 'xmax': 8}
+    assert linegraph.numeric_series_pairs(values, series_config)[0] == linegraph.series_pairs(values, series_config)[0]
+    assert [x for x, _ in linegraph.numeric_series_pairs(values, series_config)[0]] == [0, 1, 2, 4, 5, 6, 7]
+
+
+def test_series_with_gaps_are_not_numeric():
+    assert linegraph.numeric_series_pairs({1: 2, 2: None, 3: 4}, {}) is None
+    assert linegraph.numeric_series_pairs({1: 2, 2: 'n/a'}, {}) is None
+    assert linegraph.numeric_series_pairs({'a': 1, 'b': 2}, {}) is None
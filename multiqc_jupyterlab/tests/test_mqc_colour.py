@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Aleksandra Kukawka.
+# Distributed under the terms of the Modified BSD License.
+
+import numpy as np
+import pytest
+import spectra
+
+from multiqc.utils.mqc_colour import mqc_colour_scale
+
+
+def spectra_colour(scale, val, lighten):
+    """Colour of a value as MultiQC picked it with spectra before the lookup tables"""
+    domain = list(np.linspace(scale.minval, scale.maxval, len(scale.colours)))
+    rgb = spectra.scale(scale.colours).domain(domain)(val).rgb
+    return spectra.rgb(*[max(0, min(1, 1 + ((v - 1) * lighten))) for v in rgb]).hexcode
+
+
+@pytest.mark.parametrize('name', ['GnBu', 'RdYlGn', 'Spectral', 'Set3', 'OrRd-rev'])
+@pytest.mark.parametrize('lighten', [0.3, 0.5, 1.0])
+def test_scale_stops_keep_spectra_colours(name, lighten):
+    scale = mqc_colour_scale(name, 0, 100)
+    size = scale.lookup_table_size
+    for k, val in enumerate(np.linspace(0, 100, len(scale.colours))):
+        if k * (size - 1) % (len(scale.colours) - 1):
+            continue  # stops between lookup table entries get an interpolated colour
+        assert scale.get_colour(val, lighten=lighten) == spectra_colour(scale, val, lighten), val
+    assert list(scale.get_colour_array([0, 100], lighten=lighten)) == [spectra_colour(scale, 0, lighten),
+                                                                      spectra_colour(scale, 100, lighten)]
+
+
+def test_qualitative_colours_keep_spectra_colours():
+    scale = mqc_colour_scale('Set3', 0, 100)
+    for val in ['Male', 'Female', 'chr1', 'chrX']:
+        colour = spectra.html(scale.colours[hash(val) % len(scale.colours)])
+        assert scale.get_colour(val) == spectra.rgb(*[1 + ((v - 1) * 0.3) for v in colour.rgb]).hexcode
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Aleksandra Kukawka.
+# Distributed under the terms of the Modified BSD License.
+
+import pytest
+
+from multiqc.utils import config, report
+
+
+@pytest.mark.parametrize('lint', [False, True])
+def test_duplicate_html_ids_get_numbers(monkeypatch, lint):
+    report.init()
+    monkeypatch.setattr(config, 'lint', lint)
+    ids = ['reads', 'reads', 'reads-2', 'reads', 'reads', ' 1st_', 'a b', 'mqc_1st', 'reads-1']
+    # reads-2 is skipped, as it was saved as it is
+    assert [report.save_htmlid(html_id) for html_id in ids] == ['reads', 'reads-1', 'reads-2', 'reads-3', 'reads-4',
+                                                                'mqc_1st', 'a_b', 'mqc_1st-1', 'reads-1-1']
+    assert report.save_htmlid('reads', skiplint=True) == 'reads-5'
+    if lint:
+        assert [e.split(' ## ')[0] for e in report.lint_errors] == [
+            'LINT: HTML ID was a duplicate (reads-1)',
+            'LINT: HTML ID was a duplicate (reads-3)',
+            'LINT: HTML ID was a duplicate (reads-4)',
+            "LINT: HTML ID was not clean (' 1st_' -> 'mqc_1st')",
+            "LINT: HTML ID was not clean ('a b' -> 'a_b')",
+            'LINT: HTML ID was a duplicate (mqc_1st-1)',
+            'LINT: HTML ID was a duplicate (reads-1-1)',
+        ]
+    else:
+        assert report.lint_errors == []
+
+
+@pytest.mark.parametrize('lint', [False, True])
+def test_html_ids_are_unique(monkeypatch, lint):
+    report.init()
+    monkeypatch.setattr(config, 'lint', lint)
+    # like the column IDs of many tables with the same columns, and IDs with numbers saved by modules
+    ids = [report.save_htmlid('column {}'.format(i % 20)) for i in range(300)]
+    ids += [report.save_htmlid('column_{}-{}'.format(i % 20, i % 7)) for i in range(100)]
+    assert len(set(ids)) == len(ids)
+    assert report.html_ids == set(ids)
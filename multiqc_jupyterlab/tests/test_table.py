@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Copyright (c) Aleksandra Kukawka.
+# Distributed under the terms of the Modified BSD License.
+
+import re
+from collections import OrderedDict
+
+from multiqc.plots import table, table_object
+from multiqc.utils import report
+
+COLUMNS = ['reads', 'pct', 'status', 'note', 'hid']
+
+
+def table_cells(html):
+    """Cells of the table body for every sample and column"""
+    body = html[html.index('<tbody>'):html.index('</tbody>')]
+    cells = dict()
+    for s_name, row in re.findall(r'<th class="rowheader" data-original-sn="([^"]*)">.*?</th>(.*?)</tr>', body):
+        for column, cell in zip(COLUMNS, re.findall(r'<td.*?</td>', row)):
+            cells[(s_name, column)] = cell
+    return cells
+
+
+def test_cells_of_scaled_formatted_and_coloured_columns():
+    report.init()
+    data = OrderedDict([
+        ('s1', {'reads': 2000000, 'pct': 75.5, 'status': 'pass', 'note': 'ok', 'hid': 1}),
+        ('s2', {'reads': 500000, 'pct': 5.25, 'status': 'fail', 'note': ''}),
+        ('s3', {'reads': 1000000, 'pct': 'n/a', 'status': 'warn'}),
+        ('s0', {'pct': 100}),
+    ])
+    headers = OrderedDict([
+        ('reads', {'title': 'Reads', 'modify': lambda x: x / 1000000, 'format': '{:,.1f}', 'suffix': ' M'}),
+        ('pct', {'title': 'Percent', 'min': 0, 'max': 100, 'suffix': '%', 'scale': 'RdYlGn',
+                 'cond_formatting_rules': {'pass': [{'gt': 50}], 'fail': [{'lt': 10}]},
+                 'cond_formatting_colours': [{'pass': '#5cb85c'}, {'fail': '#d9534f'}]}),
+        ('status', {'title': 'Status', 'bgcols': {'pass': '#dff0d8', 'fail': '#f2dede'}, 'scale': False}),
+        ('note', {'title': 'Note', 'scale': False}),
+        ('hid', {'title': 'Hidden', 'hidden': True}),
+    ])
+    dt = table_object.datatable(data, headers, {'id': 'test_table', 'namespace': 'Test'})
+    cells = table_cells(table.make_table(dt))
+
+    # the same cells as the table built value by value
+    bar = ('<td class="data-coloured {} "><div class="wrapper"><span class="bar" style="width:{}%;'
+           ' background-color:{} !important;"></span><span class="val">{}</span></div></td>')
+    badge = '<span class="badge" style="background-color:{}">{}</span>'
+    assert cells[('s1', 'reads')] == bar.format('reads', '100.0', '#b5c6d9', '2.0 M')
+    assert cells[('s2', 'reads')] == bar.format('reads', '25.0', '#f0f9ee', '0.5 M')
+    assert cells[('s3', 'reads')] == bar.format('reads', '50.0', '#d7f0ed', '1.0 M')
+    assert cells[('s0', 'reads')] == '<td class="data-coloured reads "></td>'
+    assert cells[('s1', 'pct')] == bar.format('pct', '75.5', '#daefd1', badge.format('#5cb85c', '75.5%'))
+    assert cells[('s2', 'pct')] == bar.format('pct', '5.25', '#ecbabe', badge.format('#d9534f', '5.2%'))
+    assert cells[('s0', 'pct')] == bar.format('pct', '100.0', '#b3d2c3', badge.format('#5cb85c', '100.0%'))
+    assert cells[('s3', 'pct')] == bar.format('pct', '0', '', 'n/a%')
+    assert cells[('s1', 'status')] == ('<td class="status " style="background-color:#dff0d8 !important;">'
+                                       + badge.format('#5cb85c', 'pass') + '</td>')
+    assert cells[('s3', 'status')] == '<td class="status ">' + badge.format('#f0ad4e', 'warn') + '</td>'
+    assert cells[('s1', 'note')] == '<td class="note ">ok</td>'
+    assert cells[('s2', 'note')] == '<td class="note "></td>'
+    assert cells[('s3', 'note')] == '<td class="data-coloured note "></td>'
+    assert cells[('s1', 'hid')] == bar.format('hid', '100.0', '#b5c6d9', '1.0').replace('hid ', 'hid hidden')
+    assert cells[('s2', 'hid')] == '<td class="data-coloured hid hidden"></td>'
+    assert dt.raw_vals['s1'] == {'Test_reads': 2000000, 'Test_pct': 75.5, 'Test_status': 'pass', 'Test_note': 'ok',
+                                 'Test_hid': 1}